@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Medicine, MedicineHistory, Patient, PatientMedicine, Place
+from .models import BackgroundJob, CustomUser, DailyStat, Medicine, MedicineHistory, Patient, PatientMedicine, Place, StockLot
 
 class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
@@ -21,3 +21,6 @@ admin.site.register(MedicineHistory)
 admin.site.register(Patient)
 admin.site.register(PatientMedicine)
 admin.site.register(Place)
+admin.site.register(DailyStat)
+admin.site.register(StockLot)
+admin.site.register(BackgroundJob)
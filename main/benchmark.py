@@ -0,0 +1,394 @@
+import asyncio
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min
+from django.test import AsyncClient, Client
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from main.models import (CustomUser, Invoice, Medicine, MedicineHistory, Patient, PatientMedicine, Place,
+                         StockLot, normalize_text, phone_key)
+from main.jobs import enqueue, run_job
+from main.middleware import capture_timing
+from main.stats import rebuild_daily_stats
+
+NAMES = ('Ali', 'Vali', 'Aziz', 'Dilshod', 'Zuhra', 'Malika', 'Sardor', 'Nodira', 'Jasur', 'Gulnora')
+SURNAMES = ('Karimov', 'Valiyev', 'Tursunov', 'Rahimova', 'Ergasheva', 'Qodirov', 'Sobirov', 'Aliyeva')
+MEDICINE_WORDS = ('Paracetamol', 'Analgin', 'Ibuprofen', 'Amoksitsillin', 'Sitramon', 'No-shpa', 'Vitamin C',
+                  'Aspirin', 'Loratadin', 'Omeprazol', 'Metformin', 'Ambroksol')
+BENCH_USERS = {'admin': 'bench_admin', 'staff': 'bench_staff', 'doctor': 'bench_doctor'}
+# WSGI va ASGI o‘tkazuvchanligi solishtiriladigan o‘qish sahifalari (view lar sinxron — ASGI da
+# o‘lchangan yutuq bo‘lmagani uchun; ASGI ularni thread pool da bajaradi)
+THROUGHPUT_VIEWS = ('dashboard_stats', 'doctor', 'employee', 'all_places_medicines', 'place_medicines',
+                    'list_invoices')
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _spread_dates(queryset, field, days, now):
+    """Ketma-ket id oraliqlarini oxirgi `days` kunga taqsimlaydi (auto_now_add ni bulk_create chetlab o‘tmaydi)"""
+    bounds = queryset.aggregate(lo=Min('pk'), hi=Max('pk'))
+    if bounds['lo'] is None:
+        return
+    step = max(1, -(-(bounds['hi'] - bounds['lo'] + 1) // days))
+    for day in range(days):
+        start = bounds['lo'] + day * step
+        queryset.filter(pk__gte=start, pk__lt=start + step).update(
+            **{field: now - timedelta(days=days - 1 - day, hours=day % 9)}
+        )
+
+
+def seed_dataset(places=50, medicines=5000, history=200000, patients=50000, invoices=None, days=365,
+                 seed=0, batch_size=5000, log=print):
+    """
+    Bo‘sh bazaga sintetik ma'lumot yozadi (bulk_create, bo‘laklab).
+    invoices berilmasa bemorlar sonining yarmi; har bir chekda 1–3 qator.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    invoices = patients // 2 if invoices is None else invoices
+
+    # Har beshinchi joy sklad (staff u yerdan boshqa joylariga ko‘chiradi)
+    place_objs = Place.objects.bulk_create(
+        Place(name=f"Joy {i}_sklad" if i % 5 == 0 else f"Joy {i}") for i in range(places)
+    )
+    users = {}
+    for role, username in BENCH_USERS.items():
+        user = CustomUser(username=username, role=role, first_name=role.title())
+        user.set_unusable_password()
+        user.save()
+        users[role] = user
+    users['staff'].place.set(place_objs[:10])
+    users['doctor'].place.set([place for place in place_objs[:10] if not place.name.endswith('_sklad')])
+    log(f"{len(place_objs)} ta joy, {len(users)} ta foydalanuvchi")
+
+    def medicine_rows():
+        for i in range(medicines):
+            name = f"{rng.choice(MEDICINE_WORDS)} {i}"
+            # ~5% umumiy skladda (place=None), qolgani joylarga
+            place = None if rng.random() < 0.05 else rng.choice(place_objs)
+            yield Medicine(
+                name=name, name_key=normalize_text(name), category=rng.choice(Medicine.CATEGORY_CHOICES)[0],
+                price=Decimal(rng.randrange(1000, 200000)), box_quantity=rng.choice((1, 10, 20, 30)),
+                quantity=rng.randrange(50, 1000), extra_units=0, place=place, owner=users['admin'],
+                expiry_date=(now + timedelta(days=rng.randrange(30, 900))).date(),
+            )
+
+    for batch in _batches(medicine_rows(), batch_size):
+        created = Medicine.objects.bulk_create(batch)
+        # Qoldiq ikki partiyaga bo‘lingan: eski (yaqin muddat) va yangi yetkazib berish
+        StockLot.objects.bulk_create(
+            StockLot(medicine=medicine, batch=f"S{medicine.pk}-{part}",
+                     expiry_date=medicine.expiry_date + timedelta(days=180 * part), units=units)
+            for medicine in created
+            for part, units in enumerate((medicine.total_units // 2, medicine.total_units - medicine.total_units // 2))
+        )
+    medicine_ids = list(Medicine.objects.values_list('pk', 'place_id'))
+    log(f"{len(medicine_ids)} ta dori")
+
+    def patient_rows():
+        for i in range(patients):
+            name, surname = rng.choice(NAMES), rng.choice(SURNAMES)
+            phone = f"+998 9{rng.randrange(10)} {i:07d}"
+            yield Patient(
+                name=name, surname=surname, phone=phone, address=f"Manzil {i}",
+                name_key=normalize_text(name), surname_key=normalize_text(surname), phone_digits=phone_key(phone),
+            )
+
+    for batch in _batches(patient_rows(), batch_size):
+        Patient.objects.bulk_create(batch)
+    _spread_dates(Patient.objects.all(), 'created_at', days, now)
+    patient_ids = list(Patient.objects.values_list('pk', flat=True))
+    log(f"{len(patient_ids)} ta bemor")
+
+    def history_rows():
+        for _ in range(history):
+            medicine_id, place_id = rng.choice(medicine_ids)
+            kind = rng.random()
+            entry = MedicineHistory(medicine_id=medicine_id, user=users['admin'], quantity=rng.randrange(1, 50))
+            if kind < 0.4:
+                entry.action = 'added'
+            elif kind < 0.8:
+                entry.action = 'Bemorga chiqarildi'
+                entry.to_patient_id = rng.choice(patient_ids)
+                entry.user = users['doctor']
+            else:
+                entry.action = f"{entry.quantity} dona ko‘chirildi"
+                entry.to_place = rng.choice(place_objs)
+                entry.user = users['staff']
+            yield entry
+
+    for batch in _batches(history_rows(), batch_size):
+        MedicineHistory.objects.bulk_create(batch)
+    _spread_dates(MedicineHistory.objects.all(), 'created_at', days, now)
+    log(f"{history} ta tarix yozuvi")
+
+    medicines_by_id = dict(Medicine.objects.values_list('pk', 'price'))
+
+    def invoice_rows():
+        for i in range(invoices):
+            yield Invoice(number=f"BENCH{i:07d}", patient_id=rng.choice(patient_ids), doctor=users['doctor'],
+                          place=rng.choice(place_objs))
+
+    for batch in _batches(invoice_rows(), batch_size):
+        created = Invoice.objects.bulk_create(batch)
+        lines = []
+        for invoice in created:
+            for medicine_id, _ in rng.sample(medicine_ids, rng.randrange(1, 4)):
+                boxes = rng.randrange(0, 3)
+                total = medicines_by_id[medicine_id] * (boxes or 1)
+                lines.append(PatientMedicine(
+                    invoice=invoice, patient_id=invoice.patient_id, medicine_id=medicine_id,
+                    boxes_given=boxes or 1, unit_price=medicines_by_id[medicine_id], total_price=total,
+                    prescribed_by=users['doctor'],
+                ))
+                invoice.subtotal += total
+        PatientMedicine.objects.bulk_create(lines)
+        Invoice.objects.bulk_update(created, ['subtotal'])
+    _spread_dates(Invoice.objects.all(), 'created_at', days, now)
+    _spread_dates(PatientMedicine.objects.all(), 'date', days, now)
+    log(f"{invoices} ta chek")
+
+    rebuild_daily_stats(batch_size=batch_size)
+    log("Kunlik statistika qayta qurildi")
+
+
+def dataset_counts():
+    return {
+        'places': Place.objects.count(),
+        'medicines': Medicine.objects.count(),
+        'history': MedicineHistory.objects.count(),
+        'patients': Patient.objects.count(),
+        'invoices': Invoice.objects.count(),
+    }
+
+
+def _fixtures():
+    """Benchmark holatlari uchun namunaviy obyektlar (seed qilingan bazadan)"""
+    users = {role: CustomUser.objects.get(username=username) for role, username in BENCH_USERS.items()}
+    doctor_place = users['doctor'].place.order_by('pk').first()
+    staff_sklad = users['staff'].place.filter(name__endswith='_sklad').order_by('pk').first()
+    staff_target = users['staff'].place.exclude(name__icontains='_sklad').order_by('pk').first()
+    invoice = Invoice.objects.order_by('-pk').first()
+    patient = (
+        Patient.objects.annotate(invoices_count=Count('invoices')).order_by('-invoices_count', 'pk').first()
+    )
+    # Tayyor hisobot (holat/yuklab olish sahifalari uchun) — sinxron bajariladi
+    job = enqueue('export', {'report': 'stock', 'filters': {'place': str(doctor_place.pk)}}, user=users['admin'])
+    run_job(job)
+    return {
+        'users': users,
+        'job': job,
+        'place': doctor_place,
+        'patient': patient,
+        'invoice': invoice,
+        'medicine': Medicine.objects.filter(place=doctor_place).order_by('-quantity').first(),
+        'transfer_medicine': Medicine.objects.filter(place=staff_sklad).order_by('-quantity').first(),
+        'picking_list': list(Medicine.objects.filter(place=staff_sklad).order_by('-quantity')[:20]),
+        'transfer_target': staff_target,
+    }
+
+
+def benchmark_cases(fx):
+    """
+    URL nomi -> [(rol, method, args, query/POST ma'lumotlari)].
+    None — ataylab o‘tkazib yuboriladi (sessiyani yoki ma'lumotni o‘chiradi).
+    """
+    place, patient, invoice = fx['place'], fx['patient'], fx['invoice']
+    invoice_minute = timezone.localtime(invoice.created_at).strftime('%Y-%m-%d_%H-%M')
+    return {
+        'login': [('anon', 'GET', (), {})],
+        'logout': None,
+        'delete_patient': None,
+        'dashboard_stats': [('admin', 'GET', (), {}), ('admin', 'GET', (), {'period': '365'})],
+        'doctor': [('doctor', 'GET', (), {})],
+        'addmedicine': [('admin', 'GET', (), {})],
+        'listmedicine': [('admin', 'GET', (), {})],
+        'import_medicines': [('admin', 'GET', (), {})],
+        'givemedicine': [
+            ('staff', 'GET', (), {}),
+            ('staff', 'POST', (), {'medicine': fx['transfer_medicine'].pk, 'sale_type': 'unit', 'quantity': 1,
+                                   'place': fx['transfer_target'].pk}),
+        ],
+        'bulk_transfer': [
+            ('staff', 'GET', (), {}),
+            ('staff', 'POST', (), {
+                'medicines': [medicine.pk for medicine in fx['picking_list']],
+                'sale_types': ['unit'] * len(fx['picking_list']),
+                'quantities': [1] * len(fx['picking_list']),
+                'places': [fx['transfer_target'].pk] * len(fx['picking_list']),
+            }),
+        ],
+        'medicine_search': [('staff', 'GET', (), {'q': 'para'})],
+        'api_place_stock': [('doctor', 'GET', (place.pk,), {})],
+        'api_patient_invoices': [('doctor', 'GET', (patient.pk,), {})],
+        'api_stats_chart': [
+            ('admin', 'GET', (), {}),
+            ('admin', 'GET', (), {'start_date': '2000-01-01', 'bucket': 'week', 'place': place.pk}),
+        ],
+        'medicine_update': [('admin', 'GET', (fx['medicine'].pk,), {})],
+        'add_staff': [('admin', 'GET', (), {})],
+        'employee_list': [('admin', 'GET', (), {})],
+        'employee': [('staff', 'GET', (), {})],
+        'place_medicines': [('admin', 'GET', (place.pk,), {})],
+        'addpatient': [('doctor', 'GET', (), {})],
+        'list_patients': [('doctor', 'GET', (), {}), ('doctor', 'GET', (), {'q': 'ali kar'})],
+        'patient_search': [('doctor', 'GET', (), {'q': 'mal'})],
+        'medicine_history': [('admin', 'GET', (), {}), ('admin', 'GET', (), {'action': 'patient'})],
+        'give_medicine_to_patient': [
+            ('doctor', 'GET', (), {}),
+            ('doctor', 'POST', (), {'patient': patient.pk, 'medicines': [fx['medicine'].pk], 'quantities': [1]}),
+        ],
+        'patient_invoice': [('doctor', 'GET', (patient.pk,), {})],
+        'medicine_by_place': [('admin', 'GET', (), {})],
+        'all_places_medicines': [('admin', 'GET', (), {})],
+        'list_invoices': [('doctor', 'GET', (patient.pk,), {})],
+        'patient_invoice_view_by_date': [('doctor', 'GET', (invoice.patient_id, invoice_minute), {})],
+        'invoice_detail': [('doctor', 'GET', (invoice.pk,), {})],
+        'export_history': [('admin', 'GET', (), {})],
+        'export_stock': [('admin', 'GET', (), {})],
+        'export_sales': [('admin', 'GET', (), {})],
+        'start_job': [('admin', 'POST', (), {'report': 'stock', 'format': 'csv'})],
+        'job_detail': [('admin', 'GET', (fx['job'].pk,), {})],
+        'job_status': [('admin', 'GET', (fx['job'].pk,), {})],
+        'job_download': [('admin', 'GET', (fx['job'].pk,), {})],
+    }
+
+
+def _measure(client, method, url, data):
+    # capture_timing boshqa threadlardagi so‘rovlarni ham sanaydi (ASGI da sync view lar executor threadda)
+    with capture_timing() as timing:
+        started = time.perf_counter()
+        response = client.post(url, data) if method == 'POST' else client.get(url, data)
+        if response.streaming:
+            # Eksportlar oqim: qatorlar (va so‘rovlar) kontent o‘qilganda ishlaydi
+            for _ in response.streaming_content:
+                pass
+        wall = time.perf_counter() - started
+    return response.status_code, wall * 1000, timing.queries, timing.db * 1000
+
+
+def run_benchmarks(repeat=5, only=None, log=print):
+    """
+    main/urls.py dagi har bir URL ni test client orqali `repeat` marta chaqiradi.
+    Birinchi chaqiruv (sovuq kesh) alohida, qolganlari median sifatida qaytariladi.
+    """
+    fx = _fixtures()
+    cases = benchmark_cases(fx)
+    clients = {'anon': Client()}
+    for role, user in fx['users'].items():
+        clients[role] = Client()
+        clients[role].force_login(user)
+
+    results = []
+    for pattern in get_resolver('main.urls').url_patterns:
+        if not isinstance(pattern, URLPattern) or (only and pattern.name not in only):
+            continue
+        if pattern.name not in cases:
+            results.append({'name': pattern.name, 'skipped': "benchmark holati yo‘q"})
+            continue
+        if cases[pattern.name] is None:
+            results.append({'name': pattern.name, 'skipped': "ataylab o‘tkazib yuborildi"})
+            continue
+        for role, method, args, data in cases[pattern.name]:
+            url = reverse(pattern.name, args=args)
+            runs = [_measure(clients[role], method, url, data) for _ in range(repeat)]
+            warm = runs[1:] or runs
+            result = {
+                'name': pattern.name,
+                'method': method,
+                'url': url,
+                'params': data if method == 'GET' else None,
+                'role': role,
+                'status': runs[-1][0],
+                'cold': {'wall_ms': round(runs[0][1], 2), 'queries': runs[0][2], 'sql_ms': round(runs[0][3], 2)},
+                'wall_ms': round(statistics.median(run[1] for run in warm), 2),
+                'wall_ms_min': round(min(run[1] for run in warm), 2),
+                'queries': statistics.median_low(run[2] for run in warm),
+                'sql_ms': round(statistics.median(run[3] for run in warm), 2),
+            }
+            results.append(result)
+            log(f"{method:4} {url:50} {result['status']} {result['wall_ms']:9.2f} ms "
+                f"{result['queries']:5} so‘rov {result['sql_ms']:9.2f} ms SQL")
+    return results
+
+
+def _wsgi_throughput(cookies, url, requests, concurrency):
+    local = threading.local()
+
+    def call(_):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+            local.client.cookies = cookies
+        return local.client.get(url).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(call, range(requests)))
+    return requests / (time.perf_counter() - started), statuses
+
+
+async def _asgi_throughput(cookies, url, requests, concurrency):
+    statuses = []
+
+    async def worker(count):
+        client = AsyncClient()
+        client.cookies = cookies
+        for _ in range(count):
+            statuses.append((await client.get(url)).status_code)
+
+    share, extra = divmod(requests, concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(share + (i < extra)) for i in range(concurrency)))
+    return requests / (time.perf_counter() - started), statuses
+
+
+def run_throughput(requests=200, concurrency=16, only=None, log=print):
+    """
+    O‘qish sahifalarini WSGI (sinxron handler, `concurrency` ta thread) va ASGI
+    (bitta event loop, `concurrency` ta parallel korutina) orqali chaqirib, so‘rov/soniya solishtiriladi.
+    """
+    fx = _fixtures()
+    cases = benchmark_cases(fx)
+    cookies = {}
+    for role, user in fx['users'].items():
+        client = Client()
+        client.force_login(user)
+        cookies[role] = client.cookies
+
+    results = []
+    for name in THROUGHPUT_VIEWS:
+        if only and name not in only:
+            continue
+        role, method, args, data = cases[name][0]
+        url = reverse(name, args=args)
+        wsgi_rps, wsgi_statuses = _wsgi_throughput(cookies[role], url, requests, concurrency)
+        asgi_rps, asgi_statuses = asyncio.run(_asgi_throughput(cookies[role], url, requests, concurrency))
+        result = {
+            'name': name,
+            'url': url,
+            'requests': requests,
+            'concurrency': concurrency,
+            'wsgi_rps': round(wsgi_rps, 1),
+            'asgi_rps': round(asgi_rps, 1),
+            'errors': sum(status != 200 for status in wsgi_statuses + asgi_statuses),
+        }
+        results.append(result)
+        log(f"{url:40} WSGI {result['wsgi_rps']:8.1f} so‘rov/s   ASGI {result['asgi_rps']:8.1f} so‘rov/s   "
+            f"xato: {result['errors']}")
+    return results
@@ -0,0 +1,219 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from main.models import Medicine, MedicineHistory, PatientMedicine
+
+EXPORT_CHUNK_SIZE = 2000
+
+HISTORY_HEADER = ['Sana', 'Dori nomi', 'Miqdori', 'Amal', 'Kim tomonidan', 'Joy', 'Bemor']
+STOCK_HEADER = ['Joy', 'Dori nomi', 'Kategoriya', 'Quti narxi', 'Qutidagi dona', 'Qutilar', 'Qo‘shimcha dona',
+                'Jami dona', 'Muddati']
+SALES_HEADER = ['Sana', 'Chek raqami', 'Bemor', 'Joy', 'Dori nomi', 'Quti', 'Dona', '1 dona narxi', 'Jami narx',
+                'Shifokor']
+
+
+class _Echo:
+    """csv.writer uchun bufersiz 'fayl': yozilgan qatorni o‘zini qaytaradi"""
+
+    def write(self, value):
+        return value
+
+
+def export_response(filename, header, rows):
+    """
+    Qatorlar iteratorini CSV oqimi sifatida qaytaradi (xotirada yig‘ilmaydi).
+    XLSX so‘rov ichida berilmaydi — u butun faylni yozib bo‘lgach yuboriladi, shuning uchun
+    fondagi 'export' vazifasi orqali tayyorlanadi (write_export).
+    """
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield '\ufeff'  # Excel UTF-8 ni to‘g‘ri ochishi uchun BOM
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def _write_xlsx(output, header, rows):
+    from openpyxl import Workbook
+
+    # write_only rejimi qatorlarni diskka yozib boradi — xotira qator soniga bog‘liq emas
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(output)
+
+
+def write_export(output, header, rows, fmt='csv'):
+    """
+    Qatorlarni ochiq binar faylga yozadi (fondagi vazifalar uchun).
+    (haqiqiy format, qatorlar soni) qaytaradi — openpyxl bo‘lmasa CSV yoziladi.
+    """
+    counted = {'rows': 0}
+
+    def counting():
+        for row in rows:
+            counted['rows'] += 1
+            yield row
+
+    if fmt == 'xlsx':
+        try:
+            _write_xlsx(output, header, counting())
+            return 'xlsx', counted['rows']
+        except ImportError:
+            pass
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(counting())
+    text.detach()  # fayl ochiq qoladi
+    return 'csv', counted['rows']
+
+
+def history_rows(history):
+    """MedicineHistory querysetidan (filtrlangan) qatorlar — faqat kerakli ustunlar, bo‘laklab"""
+    rows = history.order_by('-created_at', '-id').values_list(
+        'created_at', 'medicine__name', 'quantity', 'action', 'user__username',
+        'to_place__name', 'to_patient__name', 'to_patient__surname',
+    )
+    for created_at, name, quantity, action, username, place, patient_name, patient_surname in \
+            rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        patient = f"{patient_name} {patient_surname}" if patient_name else ''
+        yield [
+            timezone.localtime(created_at).strftime('%Y-%m-%d %H:%M'), name, quantity, action, username,
+            place or '', patient,
+        ]
+
+
+def stock_rows(place_id=None):
+    """Joylar bo‘yicha qoldiq; place_id berilsa faqat shu joy"""
+    medicines = Medicine.objects.order_by('place__name', 'name')
+    if place_id is not None:
+        medicines = medicines.filter(place_id=place_id)
+    rows = medicines.values_list(
+        'place__name', 'name', 'category', 'price', 'box_quantity', 'quantity', 'extra_units', 'expiry_date',
+    )
+    for place, name, category, price, box_quantity, quantity, extra_units, expiry_date in \
+            rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            place or 'Umumiy sklad', name, category, price, box_quantity, quantity, extra_units,
+            quantity * box_quantity + extra_units, expiry_date.isoformat() if expiry_date else '',
+        ]
+
+
+def sales_rows(start=None, end=None, place_id=None, patient_id=None):
+    """Bemorlarga chiqarilgan dorilar (PatientMedicine) — chiqarilgan paytdagi narxlar bilan"""
+    sales = PatientMedicine.objects.order_by('-date', '-id')
+    if start is not None:
+        sales = sales.filter(date__gte=start)
+    if end is not None:
+        sales = sales.filter(date__lt=end)
+    if place_id is not None:
+        sales = sales.filter(medicine__place_id=place_id)
+    if patient_id is not None:
+        sales = sales.filter(patient_id=patient_id)
+    rows = sales.values_list(
+        'date', 'invoice__number', 'patient__name', 'patient__surname', 'medicine__place__name',
+        'medicine__name', 'boxes_given', 'units_given', 'unit_price', 'total_price',
+        'prescribed_by__username',
+    )
+    for date, number, name, surname, place, medicine, boxes, units, unit_price, total, doctor in \
+            rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            timezone.localtime(date).strftime('%Y-%m-%d %H:%M'), number or '', f"{name} {surname}",
+            place or '', medicine, boxes, units, unit_price, total, doctor or '',
+        ]
+
+
+# Amal turi bo‘yicha filtrlar (transfer yozuvlarida action matni miqdorni ham o‘z ichiga oladi)
+HISTORY_ACTION_FILTERS = {
+    'added': Q(action='added'),
+    'transferred': Q(to_place__isnull=False),
+    'patient': Q(to_patient__isnull=False),
+    'adjusted': Q(action='adjusted'),
+}
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None
+
+
+def day_range(start_date, end_date):
+    """Sana oralig‘ini [boshlanish, tugash+1 kun) vaqt oralig‘iga aylantiradi (indeksdan foydalanish uchun)"""
+    start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+def filter_history(params):
+    """GET parametrlari bo‘yicha MedicineHistory querysetini filtrlaydi"""
+    history = MedicineHistory.objects.select_related(
+        'medicine', 'user', 'to_user', 'to_place', 'to_patient'
+    )
+    filters = {
+        'action': params.get('action') or '',
+        'place': params.get('place') or '',
+        'user': params.get('user') or '',
+        'patient': params.get('patient') or '',
+        'date_from': params.get('date_from') or '',
+        'date_to': params.get('date_to') or '',
+    }
+    if filters['action'] in HISTORY_ACTION_FILTERS:
+        history = history.filter(HISTORY_ACTION_FILTERS[filters['action']])
+    if filters['place'].isdigit():
+        place_id = int(filters['place'])
+        history = history.filter(Q(to_place_id=place_id) | Q(medicine__place_id=place_id))
+    if filters['user'].isdigit():
+        history = history.filter(user_id=int(filters['user']))
+    if filters['patient'].isdigit():
+        history = history.filter(to_patient_id=int(filters['patient']))
+    date_from = parse_date(filters['date_from'])
+    date_to = parse_date(filters['date_to'])
+    if date_from:
+        history = history.filter(created_at__gte=day_range(date_from, date_from)[0])
+    if date_to:
+        history = history.filter(created_at__lt=day_range(date_to, date_to)[1])
+    return history, filters
+
+
+def int_param(params, name):
+    value = params.get(name) or ''
+    return int(value) if value.isdigit() else None
+
+
+def export_rows(report, params):
+    """
+    Eksport turi ('history', 'stock', 'sales') va GET parametrlari bo‘yicha
+    (fayl nomi, sarlavha, qatorlar). Sahifadagi eksport va fondagi vazifa bir xil ishlatadi.
+    """
+    if report == 'history':
+        # Ekrandagi tarix sahifasi bilan bir xil filtrlar
+        history, _ = filter_history(params)
+        return 'dori_tarixi', HISTORY_HEADER, history_rows(history)
+    if report == 'stock':
+        return 'qoldiq', STOCK_HEADER, stock_rows(place_id=int_param(params, 'place'))
+    if report == 'sales':
+        date_from = parse_date(params.get('date_from'))
+        date_to = parse_date(params.get('date_to'))
+        rows = sales_rows(
+            start=day_range(date_from, date_from)[0] if date_from else None,
+            end=day_range(date_to, date_to)[1] if date_to else None,
+            place_id=int_param(params, 'place'),
+            patient_id=int_param(params, 'patient'),
+        )
+        return 'sotuvlar', SALES_HEADER, rows
+    raise ValueError(f"Noma'lum eksport turi: {report}")
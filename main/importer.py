@@ -0,0 +1,297 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Sum, Value
+
+from main.models import Medicine, MedicineHistory, StockLot, normalize_text
+from main.reconciliation import ADJUSTED
+from main.services import TOTAL_UNITS, add_lots, apply_stock_deltas, refresh_expiry
+from main.stats import record_history
+from main.stock_cache import bump_places
+
+# Ustun sarlavhalari (yetkazib beruvchi jadvallari ruscha, qo‘lda tuzilganlari o‘zbekcha/inglizcha)
+HEADER_ALIASES = {
+    'name': ('наименование', 'name', 'nomi'),
+    'price': ('цена продажная', 'price', 'narx', 'quti narxi'),
+    'quantity': ('кол-во', 'quantity', 'soni', 'miqdori'),
+    'box_quantity': ('кол-во лекарства в одной упаковке', 'box_quantity', 'qutidagi dona soni'),
+    'expiry_date': ('срок годности', 'expiry_date', 'muddati'),
+    'generic_name': ('generic_name',),
+    'weight': ('weight',),
+    'category': ('category', 'kategoriya'),
+    'batch': ('серия', 'batch', 'seriya'),
+}
+REQUIRED_COLUMNS = ('name', 'price', 'quantity')
+HEADER_SCAN_ROWS = 20
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class StockImportError(Exception):
+    """Faylni umuman o‘qib bo‘lmadi (format yoki sarlavha xato)"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.rows = 0
+        self.errors = []  # [(qator raqami, xabar)]
+
+    @property
+    def imported(self):
+        return self.rows - len(self.errors)
+
+
+def _header_map(row):
+    cells = [normalize_text(cell) for cell in row]
+    columns = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for index, cell in enumerate(cells):
+            if cell in aliases:
+                columns[field] = index
+                break
+    if all(field in columns for field in REQUIRED_COLUMNS):
+        return columns
+    return None
+
+
+def _iter_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise StockImportError("Excel fayllar uchun openpyxl o‘rnatilmagan (pip install openpyxl).")
+    # read_only rejimi qatorlarni oqim sifatida o‘qiydi — butun fayl xotiraga yuklanmaydi
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def iter_sheet_rows(file, filename):
+    """
+    Binar fayl obyektidan (qator raqami, {maydon: qiymat}) juftliklarini oqim sifatida qaytaradi.
+    Sarlavha qatori birinchi HEADER_SCAN_ROWS qator ichidan qidiriladi.
+    """
+    name = str(filename).lower()
+    if name.endswith(('.xlsx', '.xlsm')):
+        rows = _iter_xlsx(file)
+    elif name.endswith(('.csv', '.txt')):
+        rows = _iter_csv(file)
+    else:
+        raise StockImportError("Faqat .xlsx yoki .csv fayllar qabul qilinadi.")
+
+    columns = None
+    for number, row in enumerate(rows, start=1):
+        if columns is None:
+            columns = _header_map(row)
+            if columns is None and number >= HEADER_SCAN_ROWS:
+                raise StockImportError("Sarlavha qatori topilmadi (nomi, narx, soni ustunlari kerak).")
+            continue
+        values = {field: row[index] if index < len(row) else None for field, index in columns.items()}
+        if values['name'] is None or not str(values['name']).strip():
+            continue  # bo‘sh yoki yakuniy (jami) qatorlar
+        yield number, values
+    if columns is None:
+        raise StockImportError("Sarlavha qatori topilmadi (nomi, narx, soni ustunlari kerak).")
+
+
+def _to_int(value, field):
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value).strip().replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"{field}: son emas ({value})")
+    if number != number.to_integral_value() or number < 0:
+        raise ValueError(f"{field}: butun musbat son bo‘lishi kerak ({value})")
+    return int(number)
+
+
+def _to_decimal(value, field):
+    try:
+        number = Decimal(str(value).strip().replace(' ', '').replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise ValueError(f"{field}: son emas ({value})")
+    if number < 0:
+        raise ValueError(f"{field}: manfiy bo‘lishi mumkin emas ({value})")
+    return number.quantize(Decimal('0.01'))
+
+
+def _to_date(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)) or str(value).strip().isdigit():
+        # Excel sana seriya raqami
+        return date(1899, 12, 30) + timedelta(days=int(float(value)))
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"muddati: sana formati noto‘g‘ri ({value})")
+
+
+def validate_row(values):
+    """Qatorni tekshiradi va Medicine maydonlariga aylantiradi (xato bo‘lsa ValueError)"""
+    quantity = _to_int(values['quantity'], 'soni')
+    if quantity is None:
+        raise ValueError("soni: bo‘sh")
+    box_quantity = _to_int(values.get('box_quantity'), 'qutidagi dona soni') or 1
+    category = values.get('category')
+    if category not in dict(Medicine.CATEGORY_CHOICES):
+        category = '---'
+    return {
+        'name': ' '.join(str(values['name']).split()),
+        'price': _to_decimal(values['price'], 'narx'),
+        'quantity': quantity,
+        'box_quantity': box_quantity,
+        'expiry_date': _to_date(values.get('expiry_date')),
+        'generic_name': values.get('generic_name') or None,
+        'weight': values.get('weight') or None,
+        'category': category,
+        'batch': str(values.get('batch') or '').strip()[:50],
+    }
+
+
+class _ChunkWriter:
+    """Bir bo‘lak qatorlarni bulk_create / bulk_update bilan yozadi"""
+
+    def __init__(self, user, place, result):
+        self.user = user
+        self.place = place
+        self.result = result
+        # Joydagi mavjud dorilar: normallashtirilgan nom -> (id, narx, dona soni)
+        self.existing = {
+            name_key: (pk, price, box_quantity)
+            for pk, name_key, price, box_quantity in Medicine.objects.filter(place=place)
+            .values_list('pk', 'name_key', 'price', 'box_quantity').iterator()
+        }
+
+    def write(self, rows):
+        new, imported, prices, resized, lots = {}, defaultdict(int), {}, {}, []
+        for data in rows:
+            key = normalize_text(data['name'])
+            batch = data.pop('batch')
+            units = data['quantity'] * data['box_quantity']
+            # Har bir qator alohida partiya (bir xil seriya/muddatlilari add_lots da birlashadi)
+            lots.append((key, batch, data['expiry_date'], units))
+            # Qoldiq donada yig‘iladi — qatorlarda qutidagi dona soni har xil bo‘lishi mumkin
+            imported[key] += units
+            if key not in self.existing:
+                # bulk_create save() ni chaqirmaydi — name_key shu yerda to‘ldiriladi
+                new.setdefault(key, Medicine(place=self.place, owner=self.user, name_key=key, **data))
+                continue
+            pk, price, box_quantity = self.existing[key]
+            if data['box_quantity'] != box_quantity:
+                # Bazadagi (bo‘lak boshidagi) quti hajmi — mavjud qoldiq shundan yangisiga o‘tkaziladi
+                resized.setdefault(pk, box_quantity)
+            if (data['price'], data['box_quantity']) != (price, box_quantity):
+                prices[pk] = data['price']
+                self.existing[key] = (pk, data['price'], data['box_quantity'])
+
+        for key, medicine in new.items():
+            medicine.quantity, medicine.extra_units = divmod(imported[key], medicine.box_quantity)
+        created = Medicine.objects.bulk_create(new.values())
+        for medicine in created:
+            self.existing[medicine.name_key] = (medicine.pk, medicine.price, medicine.box_quantity)
+        boxes = {self.existing[key][0]: self.existing[key][2] for key in imported}
+        added = {self.existing[key][0]: units for key, units in imported.items() if key not in new}
+
+        # Quti hajmi o‘zgarsa mavjud donalar yangi hajmga o‘tkaziladi (jami dona saqlanadi)
+        for pk in resized:
+            Medicine.objects.filter(pk=pk).update(
+                price=prices.pop(pk),
+                box_quantity=boxes[pk],
+                quantity=TOTAL_UNITS / Value(boxes[pk]),
+                extra_units=TOTAL_UNITS % Value(boxes[pk]),
+            )
+        # Faqat haqiqatan o‘zgargan narxlar bulk_update ga tushadi
+        Medicine.objects.bulk_update([Medicine(pk=pk, price=price) for pk, price in prices.items()], ['price'])
+        # Donalar bitta shartli UPDATE bilan qo‘shiladi (qutiga to‘lganlari qutiga o‘tadi)
+        apply_stock_deltas(added)
+
+        add_lots([
+            StockLot(medicine_id=self.existing[key][0], batch=batch, expiry_date=expiry_date, units=units)
+            for key, batch, expiry_date, units in lots
+        ])
+        # Muddati — partiyalarning eng yaqini (yangi yetkazib berish eskisini bosib ketmaydi)
+        refresh_expiry(boxes)
+
+        history = self._history(boxes, imported, resized)
+        MedicineHistory.objects.bulk_create(history)
+        record_history(history)
+        self.result.created += len(created)
+        self.result.updated += len(added)
+
+    def _history(self, boxes, imported, resized):
+        """
+        'added' yozuvi qutida (joriy quti hajmida), qutiga to‘lmagan donalar 'adjusted' bilan.
+        Quti hajmi o‘zgargan dorilarning oldingi 'added' qutilari endi yangi hajmda
+        hisoblanadi — farqi ham 'adjusted' bilan yopiladi (solishtirish mos kelishi uchun).
+        """
+        earlier = dict(
+            MedicineHistory.objects.filter(medicine_id__in=resized, action='added')
+            .order_by().values('medicine_id').annotate(boxes=Sum('quantity'))
+            .values_list('medicine_id', 'boxes')
+        )
+        history = []
+        for key, units in imported.items():
+            pk = self.existing[key][0]
+            medicine = Medicine(pk=pk, place=self.place)
+            added_boxes, adjusted = divmod(units, boxes[pk])
+            if pk in resized:
+                adjusted += (earlier.get(pk) or 0) * (resized[pk] - boxes[pk])
+            if added_boxes:
+                history.append(MedicineHistory(medicine=medicine, user=self.user, quantity=added_boxes, action='added'))
+            if adjusted:
+                history.append(MedicineHistory(medicine=medicine, user=self.user, quantity=adjusted, action=ADJUSTED))
+        return history
+
+
+def import_medicines(file, filename, user, place=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yetkazib beruvchi jadvalidan (xlsx/csv, binar fayl obyekti) dorilarni import qiladi.
+    Qatorlar bo‘laklab o‘qiladi va (normallashtirilgan nom, joy) bo‘yicha upsert qilinadi:
+    mavjud dorining qoldig‘iga (donada) qo‘shiladi, narxi yangilanadi, yangilari yaratiladi.
+    Quti hajmi o‘zgargan bo‘lsa mavjud qoldiq yangi hajmga o‘tkaziladi.
+    Har bir qator seriya/muddati bilan partiya (StockLot) sifatida yoziladi.
+    Har bir import uchun 'added' tarix yozuvlari ham bulk_create bilan yoziladi.
+    """
+    result = ImportResult()
+    with transaction.atomic():
+        writer = _ChunkWriter(user, place, result)
+        chunk = []
+        for number, values in iter_sheet_rows(file, filename):
+            result.rows += 1
+            try:
+                chunk.append(validate_row(values))
+            except ValueError as exc:
+                result.errors.append((number, str(exc)))
+                continue
+            if len(chunk) >= chunk_size:
+                writer.write(chunk)
+                chunk = []
+        if chunk:
+            writer.write(chunk)
+        bump_places([place.pk if place else None])
+    return result
@@ -0,0 +1,124 @@
+import logging
+import tempfile
+import traceback
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from main.models import BackgroundJob
+
+logger = logging.getLogger('main.jobs')
+
+RETRY_DELAY = 30  # soniya; har keyingi urinishda ikki barobar
+STALE_AFTER = timedelta(hours=1)  # shundan uzoq 'running' qolgan vazifa — worker to‘xtab qolgan
+
+# Vazifa turi -> (nomi, bajaruvchi funksiya)
+JOB_HANDLERS = {}
+
+
+def job(kind, title):
+    """Vazifa turini ro‘yxatdan o‘tkazadi; funksiya BackgroundJob oladi va qisqa natija dict qaytaradi"""
+    def register(func):
+        JOB_HANDLERS[kind] = (title, func)
+        return func
+    return register
+
+
+def job_title(kind):
+    return JOB_HANDLERS[kind][0] if kind in JOB_HANDLERS else kind
+
+
+def enqueue(kind, params=None, user=None, max_attempts=3):
+    """Vazifani navbatga qo‘yadi (so‘rov ichida faqat bitta INSERT)"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Noma'lum vazifa turi: {kind}")
+    return BackgroundJob.objects.create(kind=kind, params=params or {}, created_by=user, max_attempts=max_attempts)
+
+
+def claim_next():
+    """
+    Navbatdagi vazifani oladi. Shartli UPDATE (status='queued' bo‘lsa) tufayli
+    bir nechta worker bir vazifani ikki marta ololmaydi.
+    """
+    now = timezone.now()
+    candidates = list(
+        BackgroundJob.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id').values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        if _claim(pk, now):
+            return BackgroundJob.objects.get(pk=pk)
+    return None
+
+
+def _claim(pk, now):
+    """Vazifa hali 'queued' bo‘lsa uni shu worker ga oladi; boshqasi ulgurgan bo‘lsa False"""
+    return BackgroundJob.objects.filter(pk=pk, status='queued').update(
+        status='running', started_at=now, attempts=F('attempts') + 1,
+    ) == 1
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """To‘xtab qolgan worker vazifalarini navbatga qaytaradi (urinishlar tugagan bo‘lsa — xato)"""
+    stale = BackgroundJob.objects.filter(status='running', started_at__lt=timezone.now() - older_than)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), error="Worker vazifani tugatmadi",
+    )
+    return stale.update(status='queued') + failed
+
+
+def run_job(job):
+    try:
+        handler = JOB_HANDLERS[job.kind][1]
+        result = handler(job) or {}
+    except Exception:
+        _failed(job, traceback.format_exc())
+        return
+    job.status = 'done'
+    job.result = result
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'result_file', 'error', 'finished_at'])
+
+
+def _failed(job, error):
+    logger.warning("Vazifa #%s (%s) xato bilan tugadi, urinish %s/%s\n%s",
+                   job.pk, job.kind, job.attempts, job.max_attempts, error)
+    job.error = error
+    if job.attempts < job.max_attempts:
+        job.status = 'queued'
+        job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = 'failed'
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+
+
+def run_job_by_id(pk):
+    """Worker pool (thread yoki process) ichida bajariladi; ulanish shu yerda yopiladi"""
+    try:
+        run_job(BackgroundJob.objects.get(pk=pk))
+    finally:
+        connections.close_all()
+
+
+@job('export', "Hisobot eksporti")
+def export_job(job):
+    from main.exports import export_rows, write_export
+
+    filename, header, rows = export_rows(job.params['report'], job.params.get('filters', {}))
+    with tempfile.TemporaryFile() as output:
+        fmt, count = write_export(output, header, rows, job.params.get('format', 'csv'))
+        output.seek(0)
+        job.result_file.save(f'{filename}.{fmt}', File(output), save=False)
+    return {'rows': count, 'format': fmt}
+
+
+@job('rebuild_daily_stats', "Kunlik statistikani qayta qurish")
+def rebuild_daily_stats_job(job):
+    from main.stats import rebuild_daily_stats
+
+    return {'created': rebuild_daily_stats()}
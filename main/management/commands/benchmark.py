@@ -0,0 +1,110 @@
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from main.benchmark import dataset_counts, run_benchmarks, run_throughput, seed_dataset
+from main.models import BackgroundJob, Place
+
+# Benchmark real keshni ifloslamasligi (va undan eski bo‘laklarni olmasligi) uchun
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Alohida test bazasiga sintetik ma'lumot yozadi va main/urls.py dagi har bir URL uchun "
+        "vaqt, SQL so‘rovlar soni va SQL vaqtini o‘lchaydi (JSON natija)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', type=int, default=50)
+        parser.add_argument('--medicines', type=int, default=5000)
+        parser.add_argument('--history', type=int, default=200000)
+        parser.add_argument('--patients', type=int, default=50000)
+        parser.add_argument('--invoices', type=int, default=None, help="Standart: bemorlar sonining yarmi")
+        parser.add_argument('--seed', type=int, default=0, help="Tasodifiy generator boshlang‘ich qiymati")
+        parser.add_argument('--repeat', type=int, default=5, help="Har bir URL necha marta chaqiriladi")
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help="Faqat shu URL nomlari")
+        parser.add_argument('--output', help="JSON natija fayli (berilmasa stdout ga)")
+        parser.add_argument('--throughput', action='store_true',
+                            help="O‘qish sahifalarining WSGI va ASGI o‘tkazuvchanligini ham solishtirish")
+        parser.add_argument('--requests', type=int, default=200, help="--throughput: har bir sahifaga so‘rovlar")
+        parser.add_argument('--concurrency', type=int, default=16, help="--throughput: parallel so‘rovlar")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Benchmark bazasini (SQLite: loyiha ildizidagi benchmark.sqlite3) saqlab qolish "
+                                 "va keyingi ishga tushirishda qayta ishlatish")
+
+    def handle(self, *args, **options):
+        log = self.stderr.write if not options['output'] else self.stdout.write
+        test_settings = connection.settings_dict['TEST']
+        scratch_dir = None
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # Xotiradagi baza emas, haqiqiy fayl — ishlab chiqarishdagi kabi disk bilan o‘lchanadi.
+            # --keepdb bo‘lmasa vaqtinchalik papkada: WAL rejimidagi -wal/-shm fayllari ham u bilan o‘chadi
+            if options['keepdb']:
+                directory = Path(settings.BASE_DIR)
+            else:
+                directory = scratch_dir = Path(tempfile.mkdtemp(prefix='benchmark-'))
+            test_settings['NAME'] = str(directory / 'benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                           keepdb=options['keepdb'])
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                if not Place.objects.exists():
+                    log("Ma'lumot yozilmoqda...")
+                    seed_dataset(
+                        places=options['places'], medicines=options['medicines'], history=options['history'],
+                        patients=options['patients'], invoices=options['invoices'], seed=options['seed'], log=log,
+                    )
+                report = {
+                    'revision': _git_revision(),
+                    'started_at': timezone.now().isoformat(),
+                    'django': django.get_version(),
+                    'python': platform.python_version(),
+                    'database': connection.vendor,
+                    'repeat': options['repeat'],
+                    'dataset': dataset_counts(),
+                    'results': run_benchmarks(repeat=options['repeat'], only=options['only'], log=log),
+                }
+                if options['throughput']:
+                    report['throughput'] = run_throughput(
+                        requests=options['requests'], concurrency=options['concurrency'], only=options['only'],
+                        log=log,
+                    )
+        finally:
+            # Fondagi vazifa natija fayllari (yopiq xotirada) benchmark bazasi bilan birga o‘chiriladi
+            for job in BackgroundJob.objects.exclude(result_file=''):
+                job.result_file.delete(save=False)
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            if scratch_dir is not None:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output, encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Natija yozildi: {options['output']}"))
+        else:
+            self.stdout.write(output)
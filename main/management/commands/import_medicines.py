@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importer import DEFAULT_CHUNK_SIZE, StockImportError, import_medicines
+from main.models import CustomUser, Place
+
+
+class Command(BaseCommand):
+    help = "Yetkazib beruvchi jadvalidan (xlsx/csv) dorilarni omborga import qiladi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fayl yo‘li (.xlsx yoki .csv)")
+        parser.add_argument('--user', required=True, help="Tarixga yoziladigan foydalanuvchi (username)")
+        parser.add_argument('--place', help="Joy id yoki nomi; ko‘rsatilmasa umumiy sklad")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"Foydalanuvchi topilmadi: {options['user']}")
+        place = None
+        if options['place']:
+            lookup = {'pk': options['place']} if options['place'].isdigit() else {'name': options['place']}
+            place = Place.objects.filter(**lookup).first()
+            if place is None:
+                raise CommandError(f"Joy topilmadi: {options['place']}")
+
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_medicines(file, options['path'], user, place, chunk_size=options['chunk_size'])
+        except (OSError, StockImportError) as exc:
+            raise CommandError(str(exc))
+
+        for number, message in result.errors:
+            self.stderr.write(f"{number}-qator: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.imported}/{result.rows} qator import qilindi: "
+            f"{result.created} ta yangi, {result.updated} ta yangilandi, {len(result.errors)} ta xato."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Kunlik statistika (DailyStat) jadvalini MedicineHistory va Patient jadvallaridan qaytadan quradi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = rebuild_daily_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{created} ta statistika qatori yaratildi."))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import CustomUser, Place
+from main.reconciliation import DEFAULT_BATCH_SIZE, reconcile_stock, write_corrections
+
+
+class Command(BaseCommand):
+    help = ("Dorilar qoldig‘ini harakatlar tarixi (MedicineHistory) va chek qatorlari (PatientMedicine) "
+            "bilan solishtiradi; --fix bilan farqlar uchun tuzatish yozuvlari qo‘shiladi")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', action='append',
+                            help="Joy id yoki nomi (bir necha marta berish mumkin); 'sklad' — umumiy sklad")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--fix', action='store_true', help="Farqlarni tarixga 'adjusted' yozuvi bilan yopish")
+        parser.add_argument('--user', help="--fix: tarixga yoziladigan foydalanuvchi (username)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['fix']:
+            if not options['user']:
+                raise CommandError("--fix uchun --user kerak.")
+            try:
+                user = CustomUser.objects.get(username=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"Foydalanuvchi topilmadi: {options['user']}")
+        place_ids = self._place_ids(options['place']) if options['place'] else None
+        names = dict(Place.objects.values_list('pk', 'name'))
+
+        found = total = fixed = invoice_mismatches = 0
+        pending = []
+        for item in reconcile_stock(place_ids, batch_size=options['batch_size']):
+            found += 1
+            total += abs(item.difference)
+            place = names.get(item.place_id, 'Umumiy sklad')
+            if item.difference:
+                self.stdout.write(
+                    f"{place} / {item.name} (#{item.medicine_id}): qoldiq {item.stock}, "
+                    f"kutilgan {item.expected}, farq {item.difference:+d} dona"
+                )
+            if item.invoiced != item.dispensed:
+                invoice_mismatches += 1
+                self.stderr.write(
+                    f"{place} / {item.name} (#{item.medicine_id}): bemorlarga chiqarilgan tarix bo‘yicha "
+                    f"{item.dispensed}, cheklar bo‘yicha {item.invoiced} dona"
+                )
+            if user is not None:
+                pending.append(item)
+                if len(pending) >= options['batch_size']:
+                    fixed += write_corrections(user, pending)
+                    pending = []
+        if user is not None:
+            fixed += write_corrections(user, pending)
+
+        summary = f"{found} ta mos kelmaslik, jami farq {total} dona, {invoice_mismatches} tasida cheklar tarixdan farq qiladi."
+        self.stdout.write(self.style.SUCCESS(summary) if not found else self.style.WARNING(summary))
+        if user is not None:
+            self.stdout.write(self.style.SUCCESS(f"{fixed} ta tuzatish yozuvi qo‘shildi."))
+
+    def _place_ids(self, values):
+        place_ids = []
+        for value in values:
+            if value.lower() == 'sklad':
+                place_ids.append(None)
+                continue
+            lookup = {'pk': value} if value.isdigit() else {'name': value}
+            place = Place.objects.filter(**lookup).first()
+            if place is None:
+                raise CommandError(f"Joy topilmadi: {value}")
+            place_ids.append(place.pk)
+        return place_ids
@@ -0,0 +1,59 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main.jobs import claim_next, requeue_stale, run_job_by_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Fondagi vazifalar worker i: navbatdagi BackgroundJob larni thread yoki process pool da bajaradi "
+        "(tashqi broker kerak emas)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Bir vaqtda bajariladigan vazifalar")
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help="process — og‘ir (CPU) vazifalar uchun, har biri alohida jarayonda")
+        parser.add_argument('--poll', type=float, default=2.0, help="Navbat bo‘sh bo‘lsa kutish (soniya)")
+        parser.add_argument('--once', action='store_true', help="Hozir bajarilishi kerak bo‘lganlarni tugatib chiqish")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['pool'] == 'process':
+            # spawn: jarayonlar ota jarayonning ochiq baza ulanishini meros olmaydi;
+            # Django har bir jarayonda vazifa funksiyasi yuklanishidan oldin sozlanadi
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        self.stdout.write(f"Worker ishga tushdi: {workers} ta {options['pool']}")
+        running = {}
+        try:
+            with executor:
+                while True:
+                    requeue_stale()
+                    while len(running) < workers:
+                        job = claim_next()
+                        if job is None:
+                            break
+                        running[executor.submit(run_job_by_id, job.pk)] = job
+                        self.stdout.write(f"#{job.pk} {job.kind} boshlandi (urinish {job.attempts})")
+                    connections.close_all()
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = running.pop(future)
+                        job.refresh_from_db(fields=['status'])
+                        self.stdout.write(f"#{job.pk} {job.kind}: {job.get_status_display()}")
+        except KeyboardInterrupt:
+            # Bajarilayotganlar tugaydi (with executor); tugamaganlari requeue_stale bilan qaytadi
+            self.stdout.write("To‘xtatildi.")
@@ -0,0 +1,134 @@
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Django SQLite standartlari: 5 s timeout, DEFERRED tranzaksiya, pragmalarsiz
+DEFAULT_OPTIONS = {'timeout': 5, 'transaction_mode': None, 'init_command': ''}
+
+SCHEMA = """
+CREATE TABLE stock (id INTEGER PRIMARY KEY, quantity INTEGER NOT NULL);
+CREATE TABLE history (id INTEGER PRIMARY KEY, stock_id INTEGER NOT NULL, quantity INTEGER NOT NULL,
+                      created_at REAL NOT NULL);
+CREATE INDEX history_stock_idx ON history (stock_id);
+"""
+
+
+def _connect(path, options):
+    conn = sqlite3.connect(path, timeout=options.get('timeout', 5), isolation_level=None, check_same_thread=False)
+    for command in options.get('init_command', '').split(';'):
+        if command.strip():
+            conn.execute(command)
+    return conn
+
+
+def _prepare(path, rows):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(SCHEMA)
+    conn.execute('BEGIN')
+    conn.executemany('INSERT INTO stock (id, quantity) VALUES (?, ?)', ((i, 10 ** 6) for i in range(rows)))
+    conn.executemany(
+        'INSERT INTO history (stock_id, quantity, created_at) VALUES (?, 1, ?)',
+        ((i % rows, time.time()) for i in range(rows * 10)),
+    )
+    conn.execute('COMMIT')
+    conn.close()
+
+
+def _writer(path, options, rows, deadline, stats):
+    """Dori chiqarishga o‘xshash: qoldiqni o‘qish, kamaytirish, tarix yozish — bitta tranzaksiyada"""
+    conn = _connect(path, options)
+    begin = f"BEGIN {options.get('transaction_mode') or 'DEFERRED'}"
+    number = threading.get_ident()
+    while time.monotonic() < deadline:
+        stock_id = number % rows
+        number += 7
+        started = time.perf_counter()
+        try:
+            conn.execute(begin)
+            conn.execute('SELECT quantity FROM stock WHERE id = ?', (stock_id,)).fetchone()
+            conn.execute('UPDATE stock SET quantity = quantity - 1 WHERE id = ?', (stock_id,))
+            conn.execute('INSERT INTO history (stock_id, quantity, created_at) VALUES (?, 1, ?)',
+                         (stock_id, time.time()))
+            conn.execute('COMMIT')
+            stats['writes'].append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            stats['errors'] += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+
+
+def _reader(path, options, deadline, stats):
+    """Statistika sahifasiga o‘xshash o‘qish: tarix bo‘yicha agregat"""
+    conn = _connect(path, options)
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.execute(
+                'SELECT s.id, SUM(h.quantity) FROM history h JOIN stock s ON s.id = h.stock_id '
+                'WHERE s.id < 200 GROUP BY s.id'
+            ).fetchall()
+            stats['reads'].append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            stats['errors'] += 1
+    conn.close()
+
+
+def run_profile(options, writers, readers, seconds, rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / 'stress.sqlite3')
+        _prepare(path, rows)
+        stats = {'writes': [], 'reads': [], 'errors': 0}
+        deadline = time.monotonic() + seconds
+        threads = [threading.Thread(target=_writer, args=(path, options, rows, deadline, stats))
+                   for _ in range(writers)]
+        threads += [threading.Thread(target=_reader, args=(path, options, deadline, stats))
+                    for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def p95(values):
+        return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) > 1 else 0.0
+
+    return {
+        'writes_per_s': len(stats['writes']) / seconds,
+        'reads_per_s': len(stats['reads']) / seconds,
+        'write_p95_ms': p95(stats['writes']),
+        'read_p95_ms': p95(stats['reads']),
+        'locked_errors': stats['errors'],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "SQLite parallel o‘qish/yozish stress testi: Django standart sozlamalari va "
+        "settings.DATABASES dagi profil (WAL, busy timeout, BEGIN IMMEDIATE) solishtiriladi"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES[options['database']]
+        if 'sqlite3' not in database['ENGINE']:
+            raise CommandError("Bu buyruq faqat SQLite bazalar uchun.")
+        profiles = {'standart': DEFAULT_OPTIONS, 'sozlangan': database.get('OPTIONS', {})}
+        for name, profile in profiles.items():
+            result = run_profile(profile, options['writers'], options['readers'], options['seconds'], options['rows'])
+            self.stdout.write(
+                f"{name:10} yozish {result['writes_per_s']:8.1f}/s (p95 {result['write_p95_ms']:7.1f} ms)  "
+                f"o‘qish {result['reads_per_s']:8.1f}/s (p95 {result['read_p95_ms']:7.1f} ms)  "
+                f"locked xatolar: {result['locked_errors']}"
+            )
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from main.static_assets import brotli, compress_variants, is_compressible, page_assets
+
+
+def _kb(size):
+    return f"{size / 1024:,.1f} KB"
+
+
+class Command(BaseCommand):
+    help = ("Har bir sahifa yuklaydigan statik fayllar hajmi: siqilmagan (oldin) va "
+            "tayyor gzip/brotli nusxa (keyin), qayta kirishda qayta so‘raladigan fayllar soni")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', action='store_true', help="Har bir fayl hajmini ham ko‘rsatish")
+
+    def handle(self, *args, **options):
+        sizes = {}
+        pages = {}
+        for template_dir in settings.TEMPLATES[0]['DIRS']:
+            pages.update(page_assets(template_dir))
+        for name in {asset for assets in pages.values() for asset in assets}:
+            sizes[name] = self._sizes(name)
+
+        encoding = 'br' if brotli is not None else 'gzip'
+        self.stdout.write(f"{'sahifa':<40} {'fayl':>4} {'oldin':>12} {'gzip':>12} {'brotli':>12} "
+                          f"{'qayta kirish (oldin/keyin)':>28}")
+        for page, assets in pages.items():
+            found = [sizes[name] for name in assets if sizes[name]]
+            raw = sum(item['raw'] for item in found)
+            gz = sum(item['.gz'] for item in found)
+            br = sum(item['.br'] for item in found) if brotli is not None else None
+            self.stdout.write(
+                f"{page:<40} {len(found):>4} {_kb(raw):>12} {_kb(gz):>12} "
+                f"{_kb(br) if br is not None else '-':>12} {f'{len(found)} so‘rov / 0':>28}"
+            )
+            if options['files']:
+                for name in assets:
+                    item = sizes[name]
+                    if item:
+                        self.stdout.write(f"    {name:<36} {_kb(item['raw']):>12} {_kb(item['.gz']):>12}")
+                    else:
+                        self.stdout.write(self.style.WARNING(f"    {name}: topilmadi"))
+        self.stdout.write(
+            f"\nOldin: fayllar siqilmagan, xeshsiz nom bilan — har kirishda qayta tekshiriladi.\n"
+            f"Keyin: collectstatic tayyorlagan {encoding} nusxa, xeshli nom va immutable kesh — "
+            f"qayta kirishda so‘rov yo‘q."
+        )
+
+    def _sizes(self, name):
+        path = finders.find(name)
+        if not path:
+            return None
+        content = Path(path).read_bytes()
+        item = {'raw': len(content), '.gz': len(content), '.br': len(content)}
+        if is_compressible(name, len(content)):
+            item.update({suffix: len(data) for suffix, data in compress_variants(content).items()})
+        return item
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.stock_cache import fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    help = "Joylar dorilar jadvali keshining hit/miss hisoblagichlarini ko‘rsatadi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Hisoblagichlarni nolga tushirish")
+
+    def handle(self, *args, **options):
+        stats = fragment_stats()
+        self.stdout.write(f"hit: {stats['hits']}, miss: {stats['misses']}, hit ulushi: {stats['ratio']:.1%}")
+        if options['reset']:
+            reset_fragment_stats()
+            self.stdout.write(self.style.SUCCESS("Hisoblagichlar tozalandi."))
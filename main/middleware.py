@@ -0,0 +1,167 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger('main.timing')
+
+# Joriy so‘rov o‘lchovlari (thread/async xavfsiz)
+_current = ContextVar('request_timing', default=None)
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.rendering = False
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+            # Parametrlar alohida keladi; faqat IN (%s, %s, ...) uzunligini bir xil qilamiz
+            self.shapes[_IN_LIST.sub('(...)', sql)] += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    # Ulanish qaysi threadda bo‘lmasin (ASGI da view executor threadda ishlaydi), joriy so‘rovga yoziladi
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def _install_query_timer(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install_query_timers():
+    """Har bir (yangi) ulanishga bir marta ulanadi; o‘lchov faqat RequestTiming konteksti ichida"""
+    connection_created.connect(_install_query_timer, dispatch_uid='request_timing')
+    for connection in connections.all(initialized_only=True):
+        _install_query_timer(connection)
+
+
+@contextmanager
+def capture_timing():
+    """Blok ichidagi SQL so‘rovlarini (boshqa threadlardagilarini ham) o‘lchaydi"""
+    install_query_timers()
+    timing = RequestTiming()
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+class TimedTemplate(django_backend.Template):
+    """Render vaqti joriy RequestTiming ga qo‘shiladi (o‘lchov bo‘lmasa oddiy render)"""
+
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None or timing.rendering:
+            # Ichma-ich render (shablon ichidan render_to_string) tashqisining vaqtiga kiradi
+            return super().render(context, request)
+        timing.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.rendering = False
+            timing.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(django_backend.DjangoTemplates):
+    """
+    DjangoTemplates, lekin shablonlar TimedTemplate bo‘lib qaytadi — Template.render ni
+    global almashtirmasdan (monkeypatch siz) shablon vaqtini o‘lchash uchun TEMPLATES BACKEND.
+    include lar engine darajasida render qilinadi va tashqi shablon vaqtiga kiradi.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class RequestTimingMiddleware:
+    """
+    So‘rov bo‘yicha SQL soni/vaqti, shablon render vaqti va umumiy vaqtni o‘lchaydi.
+    Natija Server-Timing sarlavhasida; REQUEST_TIMING_SLOW_MS dan sekin so‘rovlar
+    eng ko‘p takrorlangan SQL shakllari bilan logga yoziladi (N+1 ni topish uchun).
+    REQUEST_TIMING_ENABLED = True bo‘lmasa middleware umuman ulanmaydi.
+    Shablon vaqti TEMPLATES da TimedDjangoTemplates backend i bo‘lsa o‘lchanadi.
+    WSGI va ASGI da bir xil ishlaydi.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        self.top_queries = getattr(settings, 'REQUEST_TIMING_TOP_QUERIES', 5)
+        install_query_timers()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timing, started)
+
+    def _finish(self, request, response, timing, started):
+        total = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = (
+            f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries", '
+            f'tpl;dur={timing.template * 1000:.1f}, total;dur={total:.1f}'
+        )
+        if total >= self.slow_ms:
+            self._log_slow(request, response, timing, total)
+        return response
+
+    def _log_slow(self, request, response, timing, total):
+        repeated = [(count, sql) for sql, count in timing.shapes.most_common(self.top_queries) if count > 1]
+        logger.warning(
+            "Sekin so‘rov %s %s -> %s: %.1f ms, %d SQL (%.1f ms), shablon %.1f ms%s",
+            request.method, request.get_full_path(), response.status_code, total,
+            timing.queries, timing.db * 1000, timing.template * 1000,
+            ''.join(f"\n  {count}x {sql}" for count, sql in repeated),
+        )
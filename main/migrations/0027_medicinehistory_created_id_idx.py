@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_delete_staffplace'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicinehistory',
+            index=models.Index(fields=['created_at', 'id'], name='history_created_id_idx'),
+        ),
+    ]
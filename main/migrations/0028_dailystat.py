@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+BATCH_SIZE = 1000
+
+
+def backfill_daily_stats(apps, schema_editor):
+    # Mavjud tarix va bemorlar bo‘yicha yig‘ma jadvalni birdaniga to‘ldiradi
+    # (main.stats.rebuild_daily_stats bilan bir xil guruhlash, lekin shu holatdagi modellar bilan)
+    DailyStat = apps.get_model('main', 'DailyStat')
+    MedicineHistory = apps.get_model('main', 'MedicineHistory')
+    Patient = apps.get_model('main', 'Patient')
+    history = (
+        MedicineHistory.objects.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'medicine_id', place_id=F('medicine__place_id'))
+        .annotate(
+            incoming=Coalesce(Sum('quantity', filter=Q(action='added')), 0),
+            used=Coalesce(Sum('quantity', filter=Q(to_patient__isnull=False) & ~Q(action='added')), 0),
+            transferred=Coalesce(
+                Sum('quantity', filter=Q(to_place__isnull=False, to_patient__isnull=True) & ~Q(action='added')), 0
+            ),
+        )
+    )
+    patients = (
+        Patient.objects.order_by()
+        .filter(created_at__isnull=False)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(new_patients=Count('id'))
+    )
+    batch = []
+    for rows in (history, patients):
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(DailyStat(**row))
+            if len(batch) >= BATCH_SIZE:
+                DailyStat.objects.bulk_create(batch)
+                batch = []
+    DailyStat.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_medicinehistory_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('incoming', models.IntegerField(default=0)),
+                ('used', models.IntegerField(default=0)),
+                ('transferred', models.IntegerField(default=0)),
+                ('new_patients', models.IntegerField(default=0)),
+                ('medicine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.medicine')),
+                ('place', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.place')),
+            ],
+            options={
+                'verbose_name': 'Kunlik statistika',
+                'verbose_name_plural': 'Kunlik statistika',
+                'indexes': [models.Index(fields=['day', 'place', 'medicine'], name='dailystat_day_place_med_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
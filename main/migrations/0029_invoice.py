@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:27
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_invoices(apps, schema_editor):
+    """Mavjud cheklarni (bemor, daqiqa) bo‘yicha Invoice ga guruhlaydi va narxlarni muzlatadi"""
+    Invoice = apps.get_model('main', 'Invoice')
+    PatientMedicine = apps.get_model('main', 'PatientMedicine')
+
+    def flush(group):
+        if not group:
+            return
+        first = group[0]
+        invoice = Invoice.objects.create(
+            patient_id=first.patient_id,
+            doctor_id=first.prescribed_by_id,
+            place_id=first.medicine.place_id,
+            subtotal=sum(line.total_price for line in group),
+        )
+        Invoice.objects.filter(pk=invoice.pk).update(number=f"INV{invoice.pk:06d}", created_at=first.date)
+        for line in group:
+            line.invoice_id = invoice.pk
+        PatientMedicine.objects.bulk_update(group, ['invoice', 'unit_price', 'total_price'])
+
+    lines = PatientMedicine.objects.select_related('medicine').order_by('patient_id', 'date', 'id')
+    group, group_key = [], None
+    for line in lines.iterator(chunk_size=2000):
+        medicine = line.medicine
+        box_quantity = medicine.box_quantity or 1
+        line.unit_price = (medicine.price / Decimal(box_quantity)).quantize(Decimal('0.0001'))
+        line.total_price = (
+            medicine.price * line.boxes_given + medicine.price * line.units_given / Decimal(box_quantity)
+        ).quantize(Decimal('0.01'))
+        key = (line.patient_id, timezone.localtime(line.date).replace(second=0, microsecond=0))
+        if key != group_key:
+            flush(group)
+            group, group_key = [], key
+        group.append(line)
+    flush(group)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_dailystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientmedicine',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='patientmedicine',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(blank=True, max_length=20, null=True, unique=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to='main.patient')),
+                ('place', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.place')),
+            ],
+            options={
+                'verbose_name': 'Hisob-faktura',
+                'verbose_name_plural': 'Hisob-fakturalar',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='patientmedicine',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='main.invoice'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['patient', '-created_at'], name='invoice_patient_created_idx'),
+        ),
+        migrations.RunPython(backfill_invoices, migrations.RunPython.noop),
+    ]
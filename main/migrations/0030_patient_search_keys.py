@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+from main.models import normalize_text, phone_key
+
+
+def fill_search_keys(apps, schema_editor):
+    Patient = apps.get_model('main', 'Patient')
+    batch = []
+    for patient in Patient.objects.only('name', 'surname', 'phone').iterator(chunk_size=2000):
+        patient.name_key = normalize_text(patient.name)
+        patient.surname_key = normalize_text(patient.surname)
+        patient.phone_digits = phone_key(patient.phone)
+        batch.append(patient)
+        if len(batch) >= 2000:
+            Patient.objects.bulk_update(batch, ['name_key', 'surname_key', 'phone_digits'])
+            batch = []
+    Patient.objects.bulk_update(batch, ['name_key', 'surname_key', 'phone_digits'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_invoice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='surname_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+    ]
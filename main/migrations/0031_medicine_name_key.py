@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+from main.models import normalize_text
+
+
+def fill_name_keys(apps, schema_editor):
+    Medicine = apps.get_model('main', 'Medicine')
+    batch = []
+    for medicine in Medicine.objects.only('name').iterator(chunk_size=2000):
+        medicine.name_key = normalize_text(medicine.name)
+        batch.append(medicine)
+        if len(batch) >= 2000:
+            Medicine.objects.bulk_update(batch, ['name_key'])
+            batch = []
+    Medicine.objects.bulk_update(batch, ['name_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0030_patient_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['place', 'name_key'], name='medicine_place_namekey_idx'),
+        ),
+    ]
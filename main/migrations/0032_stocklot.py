@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_initial_lots(apps, schema_editor):
+    # Mavjud qoldiq har bir dori uchun bitta partiya bo‘ladi (dorining muddati bilan)
+    Medicine = apps.get_model('main', 'Medicine')
+    StockLot = apps.get_model('main', 'StockLot')
+    batch = []
+    rows = Medicine.objects.values_list('pk', 'quantity', 'box_quantity', 'extra_units', 'expiry_date')
+    for pk, quantity, box_quantity, extra_units, expiry_date in rows.iterator(chunk_size=2000):
+        units = quantity * box_quantity + extra_units
+        if units > 0:
+            batch.append(StockLot(medicine_id=pk, expiry_date=expiry_date, units=units))
+        if len(batch) >= 2000:
+            StockLot.objects.bulk_create(batch)
+            batch = []
+    StockLot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0031_medicine_name_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.CharField(blank=True, default='', max_length=50)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='main.medicine')),
+            ],
+            options={
+                'verbose_name': 'Partiya',
+                'verbose_name_plural': 'Partiyalar',
+                'indexes': [models.Index(fields=['medicine', 'expiry_date', 'id'], name='stocklot_fefo_idx')],
+            },
+        ),
+        migrations.RunPython(create_initial_lots, migrations.RunPython.noop),
+    ]
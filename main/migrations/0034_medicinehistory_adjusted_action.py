@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0033_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicinehistory',
+            name='action',
+            field=models.CharField(choices=[('added', 'Qo‘shildi'), ('transferred', 'Chiqarildi'), ('adjusted', 'Tuzatish')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+import main.models
+from django.core.files.storage import default_storage, storages
+from django.db import migrations, models
+
+
+def move_result_files(apps, schema_editor):
+    """Oldin MEDIA_ROOT ga (ochiq URL bilan) yozilgan natija fayllari yopiq xotiraga ko‘chiriladi"""
+    BackgroundJob = apps.get_model('main', 'BackgroundJob')
+    private = storages['private']
+    for job in BackgroundJob.objects.exclude(result_file='').iterator():
+        name = job.result_file.name
+        if not default_storage.exists(name):
+            continue
+        with default_storage.open(name, 'rb') as source:
+            new_name = private.save(main.models.job_result_path(job, name.rsplit('/', 1)[-1]), source)
+        default_storage.delete(name)
+        BackgroundJob.objects.filter(pk=job.pk).update(result_file=new_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0034_medicinehistory_adjusted_action'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='result_file',
+            field=models.FileField(blank=True, storage=main.models.private_storage, upload_to=main.models.job_result_path),
+        ),
+        migrations.RunPython(move_result_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:27
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+STAT_FIELDS = ('incoming', 'used', 'transferred', 'new_patients')
+
+
+def merge_duplicates(apps, schema_editor):
+    # Poyga tufayli ikki marta yaratilgan (kun, dori, joy) qatorlari birinchisiga qo‘shiladi
+    DailyStat = apps.get_model('main', 'DailyStat')
+    duplicates = (
+        DailyStat.objects.filter(medicine__isnull=False).order_by()
+        .values('day', 'medicine_id', 'place_id').annotate(rows=Count('id'), keep=Min('id'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = DailyStat.objects.filter(day=group['day'], medicine_id=group['medicine_id'], place_id=group['place_id'])
+        totals = {field: sum(getattr(row, field) for row in rows) for field in STAT_FIELDS}
+        rows.filter(pk=group['keep']).update(**totals)
+        rows.exclude(pk=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0035_backgroundjob_private_result_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailystat',
+            constraint=models.UniqueConstraint(models.F('day'), models.F('medicine'), django.db.models.functions.comparison.Coalesce('place', models.Value(0)), condition=models.Q(('medicine__isnull', False)), name='dailystat_day_med_place_uniq'),
+        ),
+    ]
@@ -1,7 +1,57 @@
+import re
+import uuid
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth.models import AbstractUser
+from django.core.files.storage import storages
 from django.db import models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Min, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
 from decimal import Decimal
 
+
+def normalize_text(value):
+    """Qidiruv/solishtirish uchun: ortiqcha bo‘shliqlarsiz, kichik harflarda"""
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def prefix_q(field, value):
+    """
+    `field` qiymati `value` bilan boshlanadi — LIKE o‘rniga oraliq sharti.
+    SQLite LIKE katta-kichik harfni farqlamagani uchun oddiy indeksdan foydalanmaydi,
+    oraliq esa B-tree indeks bo‘yicha o‘qiladi (ustun oldindan normallashtirilgan).
+    """
+    return Q(**{f'{field}__gte': value, f'{field}__lt': value + '\U0010ffff'})
+
+# SQL da hisoblangan narxlar (with_pricing) shu aniqlikda Decimal ga o‘giriladi
+PRICE_FIELD = DecimalField(max_digits=14, decimal_places=4)
+
+
+class annotated_property:
+    """
+    Oddiy xususiyat, lekin querysetda shu nomli annotatsiya bo‘lsa (with_stock()/with_pricing())
+    bazada hisoblangan qiymat qaytariladi — render paytida qatorma-qator hisob yo‘q.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.name in obj.__dict__:
+            return obj.__dict__[self.name]
+        return self.func(obj)
+
+    def __set__(self, obj, value):
+        # Django annotatsiya qiymatini setattr bilan qo‘yadi
+        obj.__dict__[self.name] = value
+
+
 class Place(models.Model):
     name = models.CharField(max_length=100)
 
@@ -31,6 +81,83 @@ class CustomUser(AbstractUser):
         verbose_name_plural = "Foydalanuvchilar"
 
 
+class MedicineQuerySet(models.QuerySet):
+    def grouped_by_place(self, places):
+        """
+        Berilgan joylarning dorilari bitta so‘rovda, joy bo‘yicha guruhlangan.
+        Natija: [{'place': place, 'medicines': [...]}, ...] — joylar tartibi saqlanadi.
+        """
+        places = list(places)
+        buckets = {place.pk: [] for place in places}
+        for medicine in self.filter(place_id__in=buckets):
+            buckets[medicine.place_id].append(medicine)
+        return [{'place': place, 'medicines': buckets[place.pk]} for place in places]
+
+    def with_stock(self):
+        """
+        total_units, full_boxes va loose_units SQL da hisoblanadi (shu nomdagi xususiyatlar
+        o‘rniga) — ular bo‘yicha filtrlash, saralash va yig‘ish mumkin.
+        """
+        box_quantity = NullIf('box_quantity', 0)  # 0 ga bo‘lish o‘rniga NULL
+        return self.annotate(
+            total_units=F('quantity') * F('box_quantity') + F('extra_units'),
+        ).annotate(
+            loose_units=Coalesce(F('total_units') % box_quantity, 'total_units', output_field=IntegerField()),
+        ).annotate(
+            full_boxes=Coalesce(
+                (F('total_units') - F('loose_units')) / box_quantity, 0, output_field=IntegerField(),
+            ),
+        )
+
+    def with_pricing(self):
+        """with_stock() + unit_price (1 dona narxi) va stock_value (qoldiq qiymati) SQL da"""
+        price = Cast('price', FloatField())  # SQLite da butun sonli bo‘lish bo‘lmasligi uchun
+        return self.with_stock().annotate(
+            unit_price=Coalesce(price / NullIf('box_quantity', 0), price, output_field=PRICE_FIELD),
+        ).annotate(
+            stock_value=ExpressionWrapper(
+                F('quantity') * price + F('extra_units') * F('unit_price'), output_field=PRICE_FIELD,
+            ),
+        )
+
+    def place_summaries(self, places, expiring_before):
+        """
+        Joylar bo‘yicha yig‘ma qatorlar bitta guruhlangan so‘rovda:
+        {place_id: {'skus', 'total_units', 'stock_value', 'expiring'}}.
+        Qoldiq qiymati quti narxidan: qutilar * narx + ortiqcha donalar * (narx / qutidagi dona).
+        """
+        price = Cast('price', FloatField())  # SQLite da butun sonli bo‘lish bo‘lmasligi uchun
+        rows = self.filter(place__in=places).order_by().values('place_id').annotate(
+            skus=Count('id'),
+            total_units=Sum(F('quantity') * F('box_quantity') + F('extra_units')),
+            stock_value=Sum(
+                F('quantity') * price + Coalesce(F('extra_units') * price / NullIf('box_quantity', 0), 0.0)
+            ),
+            expiring=Count('id', filter=Q(expiry_date__lt=expiring_before)),
+        )
+        return {row.pop('place_id'): row for row in rows}
+
+    def totals_by_place(self):
+        """
+        (joy, nom, kategoriya) bo‘yicha yig‘ilgan qoldiq — bitta guruhlangan so‘rov.
+        Bir joydagi bir xil dori (bir necha qator/egasi bo‘lsa ham) bitta qatorda.
+        """
+        price = Cast('price', FloatField())
+        return self.filter(place__isnull=False).order_by().values('place_id', 'name_key', 'category').annotate(
+            title=Min('name'),
+            boxes=Sum('quantity'),
+            units=Sum(F('quantity') * F('box_quantity') + F('extra_units')),
+            value=Sum(F('quantity') * price + Coalesce(F('extra_units') * price / NullIf('box_quantity', 0), 0.0)),
+        ).order_by('place_id', 'name_key')
+
+    def search(self, term):
+        """Nomi boshlanishi bo‘yicha indeksli qidiruv (name_key)"""
+        term = normalize_text(term)
+        if not term:
+            return self.none()
+        return self.filter(prefix_q('name_key', term))
+
+
 class Medicine(models.Model):
     CATEGORY_CHOICES = [
         ('---', '---'),
@@ -41,6 +168,7 @@ class Medicine(models.Model):
     ]
     
     name = models.CharField(max_length=100)
+    name_key = models.CharField(max_length=100, default='', editable=False)  # normalize_text(name)
     generic_name = models.CharField(max_length=100, blank=True, null=True)
     weight = models.CharField(max_length=50, blank=True, null=True)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='---',blank=True,null=True)
@@ -55,21 +183,37 @@ class Medicine(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     place = models.ForeignKey("Place", on_delete=models.CASCADE, null=True, blank=True)
 
+    objects = MedicineQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_text(self.name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
-    @property
+    @annotated_property
     def unit_price(self):
         """1 dona narxi"""
         if self.box_quantity > 0:
             return self.price / Decimal(self.box_quantity)
         return self.price
 
-    @property
+    @annotated_property
     def total_units(self):
         """Jami dona: qutilar * dona_per_quti + extra_units"""
         return self.quantity * self.box_quantity + (self.extra_units or 0)
 
+    @annotated_property
+    def full_boxes(self):
+        """Jami donadan butun qutilar"""
+        return self.total_units // self.box_quantity if self.box_quantity > 0 else 0
+
+    @annotated_property
+    def loose_units(self):
+        """Butun qutilardan ortgan donalar"""
+        return self.total_units % self.box_quantity if self.box_quantity > 0 else self.total_units
+
     @property
     def total_boxes(self):
         """Butun qutilar soni (quantity maydoni)"""
@@ -93,7 +237,7 @@ class Medicine(models.Model):
         if self.box_quantity == 1:
             return f"{self.total_units} quti"
 
-        full_boxes, remainder = divmod(self.total_units, self.box_quantity)
+        full_boxes, remainder = self.full_boxes, self.loose_units
 
         if full_boxes and remainder:
             return f"{full_boxes} quti ({remainder} dona)"
@@ -105,7 +249,88 @@ class Medicine(models.Model):
         ordering = ['-created_at']
         verbose_name = "Dori"
         verbose_name_plural = "Dorilar"
+        indexes = [
+            # Joy ichida nom bo‘yicha qidiruv/moslashtirish (transfer, import, typeahead)
+            models.Index(fields=['place', 'name_key'], name='medicine_place_namekey_idx'),
+        ]
+
+
+class StockLot(models.Model):
+    """
+    Dori partiyasi: seriya raqami, muddati va qolgan donalar.
+    Medicine.quantity/extra_units jami qoldiq bo‘lib qoladi; partiyalar uning FEFO
+    (birinchi muddati tugaydigan birinchi chiqadi) taqsimoti uchun.
+    """
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='lots')
+    batch = models.CharField(max_length=50, blank=True, default='')
+    expiry_date = models.DateField(blank=True, null=True)
+    units = models.PositiveIntegerField(default=0)  # partiyada qolgan dona
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.medicine} — {self.batch or '-'} ({self.expiry_date or '-'}): {self.units} dona"
+
+    class Meta:
+        verbose_name = "Partiya"
+        verbose_name_plural = "Partiyalar"
+        indexes = [
+            # FEFO: dori bo‘yicha muddati eng yaqin partiyalar tartibida
+            models.Index(fields=['medicine', 'expiry_date', 'id'], name='stocklot_fefo_idx'),
+        ]
     
+def phone_key(phone):
+    """Telefon raqamidan faqat raqamlar, +998 kodisiz (901234567 kabi)"""
+    digits = ''.join(ch for ch in str(phone or '') if ch.isdigit())
+    if len(digits) > 9 and digits.startswith('998'):
+        digits = digits[3:]
+    return digits
+
+
+# Qidiruvda telefon bo‘lagi: raqamlar va telefon belgilari ('+998', '90-123', '(90)')
+PHONE_TOKEN = re.compile(r'^\+?[\d()-]*\d[\d()-]*$')
+COUNTRY_CODE = '998'
+
+
+def phone_prefixes(digits, international=False):
+    """
+    Qidiruvdagi telefon boshlanishi uchun phone_digits prefikslari.
+    998 bilan boshlansa mamlakat kodi ham bo‘lishi mumkin (qisqa '998901' ham) — ikkala variant
+    qidiriladi; '+' bilan yozilgan bo‘lsa faqat kodsiz varianti.
+    """
+    if len(digits) < 3:
+        return []
+    prefixes = [] if international and digits.startswith(COUNTRY_CODE) else [digits]
+    if len(digits) > len(COUNTRY_CODE) and digits.startswith(COUNTRY_CODE):
+        prefixes.append(digits[len(COUNTRY_CODE):])
+    return prefixes
+
+
+class PatientQuerySet(models.QuerySet):
+    def search(self, term):
+        """Ism, familiya yoki telefon boshlanishi bo‘yicha indeksli qidiruv"""
+        tokens = normalize_text(term).split()
+        words = [token for token in tokens if not PHONE_TOKEN.match(token)]
+        phone = [token for token in tokens if PHONE_TOKEN.match(token)]
+        digits = ''.join(ch for token in phone for ch in token if ch.isdigit())
+        prefixes = phone_prefixes(digits, international=bool(phone) and phone[0].startswith('+'))
+        condition = Q(pk__in=[])
+        if words:
+            first, second = words[0], words[1] if len(words) > 1 else None
+            if second is None:
+                condition = prefix_q('name_key', first) | prefix_q('surname_key', first)
+            else:
+                condition = (
+                    (prefix_q('name_key', first) & prefix_q('surname_key', second))
+                    | (prefix_q('surname_key', first) & prefix_q('name_key', second))
+                )
+            if prefixes:
+                # "Ali 90-123": ism va telefon birga
+                condition &= reduce(or_, (prefix_q('phone_digits', prefix) for prefix in prefixes))
+        elif prefixes:
+            condition = reduce(or_, (prefix_q('phone_digits', prefix) for prefix in prefixes))
+        return self.filter(condition)
+
+
 class Patient(models.Model):
     name = models.CharField(max_length=100)
     surname = models.CharField(max_length=100)
@@ -113,6 +338,19 @@ class Patient(models.Model):
     address = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True,blank=True, null=True)
 
+    # Qidiruv uchun normallashtirilgan, indekslangan ustunlar (save() da to‘ldiriladi)
+    name_key = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
+    surname_key = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
+    phone_digits = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+
+    objects = PatientQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_text(self.name)
+        self.surname_key = normalize_text(self.surname)
+        self.phone_digits = phone_key(self.phone)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} {self.surname}"
     
@@ -125,6 +363,7 @@ class MedicineHistory(models.Model):
     ACTION_CHOICES = (
         ('added', 'Qo‘shildi'),
         ('transferred', 'Chiqarildi'),
+        ('adjusted', 'Tuzatish'),  # solishtirish (reconcile_stock) yozadi, quantity — ishorali dona
     )
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)  # kim amalga oshirgan
@@ -142,19 +381,65 @@ class MedicineHistory(models.Model):
         ordering = ['-created_at']
         verbose_name = "Dori tarixi"
         verbose_name_plural = "Dori tarixi"
+        indexes = [
+            # Kursorli sahifalash (created_at, id) bo‘yicha
+            models.Index(fields=['created_at', 'id'], name='history_created_id_idx'),
+        ]
+
+class Invoice(models.Model):
+    """Chek sarlavhasi: raqami, shifokor, joy va chiqarilgan paytdagi jami summa saqlanadi"""
+    number = models.CharField(max_length=20, unique=True, blank=True, null=True)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='invoices')
+    doctor = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    place = models.ForeignKey(Place, on_delete=models.SET_NULL, null=True, blank=True)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if not self.number:
+            # Raqam id asosida beriladi: INV000123
+            self.number = f"INV{self.pk:06d}"
+            Invoice.objects.filter(pk=self.pk).update(number=self.number)
+
+    def __str__(self):
+        return f"{self.number} — {self.patient}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Hisob-faktura"
+        verbose_name_plural = "Hisob-fakturalar"
+        indexes = [
+            models.Index(fields=['patient', '-created_at'], name='invoice_patient_created_idx'),
+        ]
+
+class PatientMedicineQuerySet(models.QuerySet):
+    def with_pricing(self):
+        """Dori bilan birga (select_related) va jami dona (quantity) SQL da — chek qatorlarida N+1 yo‘q"""
+        return self.select_related('medicine').annotate(
+            quantity=F('boxes_given') * F('medicine__box_quantity') + F('units_given'),
+        )
+
 
 class PatientMedicine(models.Model):
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, null=True, blank=True, related_name='lines')
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
     
     # Quti va dona alohida saqlanadi
     boxes_given = models.PositiveIntegerField(default=0)
     units_given = models.PositiveIntegerField(default=0)
+
+    # Chiqarilgan paytdagi narxlar (keyin dori narxi o‘zgarsa ham chek o‘zgarmaydi)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=4, default=0)  # 1 dona narxi
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
     prescribed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     date = models.DateTimeField(auto_now_add=True)
 
-    @property
+    objects = PatientMedicineQuerySet.as_manager()
+
+    @annotated_property
     def quantity(self):
         # jami dona
         return self.boxes_given * self.medicine.box_quantity + self.units_given
@@ -166,17 +451,6 @@ class PatientMedicine(models.Model):
             return f"{self.boxes_given} quti + {self.units_given} dona"
         return f"{self.units_given} dona"
 
-    @property
-    def unit_price(self):
-        # 1 dona narxi
-        return self.medicine.price / self.medicine.box_quantity
-
-    @property
-    def total_price(self):
-        if self.boxes_given > 0:
-            return self.medicine.price * self.boxes_given + self.units_given * self.unit_price
-        return self.units_given * self.unit_price
-
     def __str__(self):
         return f"{self.patient.name} — {self.medicine.name}"
     
@@ -184,3 +458,85 @@ class PatientMedicine(models.Model):
         ordering = ['-date']
         verbose_name = "Chek"
         verbose_name_plural = "Cheklar"
+
+
+class DailyStat(models.Model):
+    """
+    Kunlik yig‘ma statistika: (kun, joy, dori) bo‘yicha oldindan hisoblangan jami qiymatlar.
+    Dashboard davr uchun shu qatorlarni yig‘adi, xom jadvallarni skanerlamaydi.
+    Yangi bemorlar soni joy va dorisiz (None) qatorda saqlanadi.
+    """
+    day = models.DateField()
+    place = models.ForeignKey(Place, on_delete=models.SET_NULL, null=True, blank=True)
+    medicine = models.ForeignKey(Medicine, on_delete=models.SET_NULL, null=True, blank=True)
+    incoming = models.IntegerField(default=0)      # qo‘shilgan qutilar
+    used = models.IntegerField(default=0)          # bemorlarga chiqarilgan donalar
+    transferred = models.IntegerField(default=0)   # joylarga ko‘chirilgan donalar
+    new_patients = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} — {self.place or '-'} — {self.medicine or '-'}"
+
+    class Meta:
+        verbose_name = "Kunlik statistika"
+        verbose_name_plural = "Kunlik statistika"
+        indexes = [
+            models.Index(fields=['day', 'place', 'medicine'], name='dailystat_day_place_med_idx'),
+        ]
+        constraints = [
+            # Dori bo‘yicha kunlik qator bitta; dorisiz qatorlar (bemorlar, SET_NULL bilan o‘chirilgan
+            # dorilar izi) cheklanmaydi — ular faqat yig‘iladi
+            models.UniqueConstraint(
+                F('day'), F('medicine'), Coalesce('place', Value(0)),
+                condition=Q(medicine__isnull=False), name='dailystat_day_med_place_uniq',
+            ),
+        ]
+
+
+def private_storage():
+    return storages['private']
+
+
+def job_result_path(instance, filename):
+    # Tasodifiy papka — nomini taxmin qilib bo‘lmaydi; fayl nomi yuklab olishda o‘zgarmaydi
+    return f'jobs/{timezone.now():%Y/%m}/{uuid.uuid4().hex}/{filename}'
+
+
+class BackgroundJob(models.Model):
+    """
+    Fondagi vazifa (katta eksport, statistikani qayta qurish va h.k.).
+    So‘rov faqat navbatga qo‘yadi; `manage.py run_jobs` worker i bajaradi,
+    natija fayli yopiq 'private' xotiraga yoziladi (faqat job_download orqali beriladi).
+    Turlar main.jobs da ro‘yxatdan o‘tadi.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Navbatda'),
+        ('running', 'Bajarilmoqda'),
+        ('done', 'Tayyor'),
+        ('failed', 'Xato'),
+    )
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # qayta urinish shu vaqtdan keyin
+    result = models.JSONField(default=dict, blank=True)  # qisqa natija (qatorlar soni va h.k.)
+    result_file = models.FileField(upload_to=job_result_path, storage=private_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Fondagi vazifa"
+        verbose_name_plural = "Fondagi vazifalar"
+        indexes = [
+            # Worker navbatni (status, run_after) bo‘yicha o‘qiydi
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
@@ -0,0 +1,83 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj, field='created_at'):
+    """Qator uchun kursor: (vaqt, id) juftligi base64 ko‘rinishida"""
+    raw = f"{getattr(obj, field).isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value):
+    """Kursorni (vaqt, id) ga qaytaradi, noto‘g‘ri bo‘lsa None"""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value.encode()).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        pk = int(pk)
+        moment = parse_datetime(stamp)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+    if moment is None:
+        return None
+    return moment, pk
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(queryset, after=None, before=None, per_page=50, field='created_at'):
+    """
+    (field, id) bo‘yicha kamayish tartibida kursorli sahifalash.
+    OFFSET ishlatilmaydi, shuning uchun har bir sahifa narxi jadval
+    hajmiga bog‘liq emas — (field, id) indeksi bo‘ylab per_page + 1 qator o‘qiladi.
+    - after: joriy sahifaning oxirgi qatori (keyingi sahifa)
+    - before: joriy sahifaning birinchi qatori (oldingi sahifa)
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key:
+        moment, pk = before_key
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:per_page + 1]
+        )
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next, has_prev = True, has_more
+    else:
+        if after_key:
+            moment, pk = after_key
+            queryset = queryset.filter(Q(**{f'{field}__lt': moment}) | Q(**{field: moment, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:per_page + 1])
+        items = rows[:per_page]
+        has_next, has_prev = len(rows) > per_page, after_key is not None
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1], field) if items and has_next else None,
+        prev_cursor=encode_cursor(items[0], field) if items and has_prev else None,
+    )
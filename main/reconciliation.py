@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from main.models import Medicine, MedicineHistory, PatientMedicine
+from main.services import DESTINATION_ORDER
+from main.stats import TRANSFER_Q
+
+DEFAULT_BATCH_SIZE = 2000
+# Tuzatish yozuvi: quantity — ishorali dona (qoldiq - kutilgan)
+ADJUSTED = 'adjusted'
+
+
+class Discrepancy:
+    """Dori qoldig‘i harakatlar tarixidan kutilgan qiymatga mos kelmaydi (hammasi donada)"""
+
+    def __init__(self, row, expected, dispensed, invoiced):
+        self.medicine_id = row['pk']
+        self.place_id = row['place_id']
+        self.name = row['name']
+        self.stock = row['total_units']
+        self.expected = expected
+        self.dispensed = dispensed  # tarix bo‘yicha bemorlarga chiqarilgan
+        self.invoiced = invoiced    # PatientMedicine (chek qatorlari) bo‘yicha
+
+    @property
+    def difference(self):
+        return self.stock - self.expected
+
+
+def _sums(queryset, key, **fields):
+    return {
+        row.pop(key): row
+        for row in queryset.order_by().values(key).annotate(**{
+            name: Coalesce(expression, Value(0)) for name, expression in fields.items()
+        })
+    }
+
+
+def _check_batch(rows):
+    """
+    Bir bo‘lak dorilar uchun kutilgan qoldiq: kirim (quti) * dona_per_quti + tuzatishlar
+    + joyga kelgan - joydan ketgan - bemorlarga chiqarilgan. Yig‘indilar SQL da (GROUP BY).
+    Joyga kelgan transfer tarixda manba dori bilan yoziladi — u shu joydagi bir xil nomli
+    (name_key) dorilarning DESTINATION_ORDER bo‘yicha birinchisiga tegishli
+    (transfer ham qabul qiluvchini services.find_destinations da shu tartibda tanlaydi).
+    """
+    ids = [row['pk'] for row in rows]
+    history = _sums(
+        MedicineHistory.objects.filter(medicine_id__in=ids), 'medicine_id',
+        added=Sum('quantity', filter=Q(action='added')),
+        adjusted=Sum('quantity', filter=Q(action=ADJUSTED)),
+        dispensed=Sum('quantity', filter=Q(to_patient__isnull=False) & ~Q(action='added')),
+        sent=Sum('quantity', filter=TRANSFER_Q),
+    )
+    invoiced = _sums(
+        PatientMedicine.objects.filter(medicine_id__in=ids), 'medicine_id',
+        units=Sum(F('boxes_given') * F('medicine__box_quantity') + F('units_given')),
+    )
+    owners = {(row['place_id'], row['name_key']): row['pk'] for row in rows if row['owner']}
+    received = {}
+    incoming = (
+        MedicineHistory.objects.filter(
+            TRANSFER_Q,
+            to_place_id__in={place_id for place_id, _ in owners},
+            medicine__name_key__in={name_key for _, name_key in owners},
+        )
+        .order_by().values('to_place_id', name_key=F('medicine__name_key'))
+        .annotate(units=Sum('quantity'))
+    )
+    for row in incoming:
+        owner = owners.get((row['to_place_id'], row['name_key']))
+        if owner is not None:
+            received[owner] = row['units']
+
+    found = []
+    empty = {'added': 0, 'adjusted': 0, 'dispensed': 0, 'sent': 0}
+    for row in rows:
+        moved = history.get(row['pk'], empty)
+        expected = (
+            moved['added'] * row['box_quantity'] + moved['adjusted']
+            + received.get(row['pk'], 0) - moved['sent'] - moved['dispensed']
+        )
+        by_invoices = invoiced.get(row['pk'], {'units': 0})['units']
+        if expected != row['total_units'] or by_invoices != moved['dispensed']:
+            found.append(Discrepancy(row, expected, moved['dispensed'], by_invoices))
+    return found
+
+
+def reconcile_stock(place_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Qoldiqni harakatlar tarixi bilan solishtiradi va mos kelmaganlarini (Discrepancy) qaytaradi (generator).
+    Dorilar (joy, name_key, DESTINATION_ORDER) tartibida .iterator() bilan oqimda o‘qiladi va bo‘laklab
+    tekshiriladi — xotira dorilar yoki tarix qatorlari soniga emas, bo‘lak hajmiga bog‘liq.
+    place_ids: faqat shu joylar (None — umumiy sklad uchun ham ishlatiladi).
+    """
+    medicines = Medicine.objects.with_stock().order_by('place_id', 'name_key', *DESTINATION_ORDER)
+    if place_ids is not None:
+        condition = Q(place_id__in=[pk for pk in place_ids if pk is not None])
+        if None in place_ids:
+            condition |= Q(place__isnull=True)
+        medicines = medicines.filter(condition)
+    rows = medicines.values('pk', 'place_id', 'name_key', 'name', 'box_quantity', 'total_units')
+    batch, last_key = [], None
+    for row in rows.iterator(chunk_size=batch_size):
+        key = (row['place_id'], row['name_key'])
+        row['owner'] = key != last_key
+        last_key = key
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from _check_batch(batch)
+            batch = []
+    if batch:
+        yield from _check_batch(batch)
+
+
+def write_corrections(user, discrepancies):
+    """
+    Qoldiqni o‘zgartirmasdan, tarixga farq miqdorida 'adjusted' yozuvlari qo‘shadi —
+    keyingi solishtirishda shu dorilar mos keladi. Kunlik statistikaga ta'sir qilmaydi.
+    """
+    entries = [
+        MedicineHistory(medicine_id=item.medicine_id, user=user, quantity=item.difference, action=ADJUSTED)
+        for item in discrepancies if item.difference
+    ]
+    with transaction.atomic():
+        MedicineHistory.objects.bulk_create(entries)
+    return len(entries)
@@ -0,0 +1,389 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+
+from main.models import Invoice, Medicine, MedicineHistory, PatientMedicine, StockLot
+from main.stats import record_history
+from main.stock_cache import bump_places
+
+
+class StockError(Exception):
+    """Qoldiq yetarli emas yoki qator parallel so‘rov tomonidan o‘zgartirilgan"""
+
+    def __init__(self, message="Qoldiq yetarli emas.", rejected=()):
+        super().__init__(message)
+        # Yetmagan qatorlar: [(dori yoki topilmagan id, so‘ralgan dona)]
+        self.rejected = list(rejected)
+
+
+# Jami dona: qutilar * dona_per_quti + extra_units (bazada hisoblanadi)
+TOTAL_UNITS = F('quantity') * F('box_quantity') + F('extra_units')
+
+
+def apply_stock_deltas(deltas):
+    """
+    {medicine_id: +/-dona} o‘zgarishlarini bitta UPDATE bilan qo‘llaydi.
+    Yangi quti/dona qiymatlari F() orqali bazada hisoblanadi, ayirishda esa
+    yetarli qoldiq sharti WHERE ichida tekshiriladi. Biror qator shartdan
+    o‘tmasa StockError ko‘tariladi va tranzaksiya butunlay bekor qilinadi.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Bir xil o‘zgarishli qatorlar bitta WHEN pk IN (...) ga tushadi (import kabi katta ro‘yxatlarda
+    # ifoda daraxti chuqurlashib ketmaydi); qo‘shishda shart yo‘q — ular ham bitta IN
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    condition = Q(pk__in=[pk for pk, delta in deltas.items() if delta > 0])
+    for delta, pks in by_delta.items():
+        if delta < 0:
+            condition |= Q(pk__in=pks) & GreaterThanOrEqual(TOTAL_UNITS, -delta)
+    whens = [When(pk__in=pks, then=Value(delta)) for delta, pks in by_delta.items()]
+    new_total = TOTAL_UNITS + Case(*whens, default=Value(0), output_field=IntegerField())
+    updated = Medicine.objects.filter(condition, box_quantity__gt=0).update(
+        quantity=new_total / F('box_quantity'),
+        extra_units=new_total % F('box_quantity'),
+    )
+    if updated != len(deltas):
+        raise StockError("Qoldiq yetarli emas yoki dori o‘zgartirilgan.")
+
+
+def allocate_fefo(deductions):
+    """
+    {medicine_id: dona} ayirishlarni partiyalarga FEFO bo‘yicha taqsimlaydi.
+    Barcha dorilarning partiyalari bitta tartiblangan so‘rovda (stocklot_fefo_idx) olinadi,
+    kamaytirilganlari bitta bulk_update bilan yoziladi, bo‘shaganlari o‘chiriladi.
+    Muddati noma'lum (eski) partiyalar birinchi chiqadi.
+    Natija: {medicine_id: [(partiya, dona), ...]}; partiyalar yetmagan qism taqsimlanmaydi.
+    """
+    remaining = {pk: units for pk, units in deductions.items() if units > 0}
+    allocations = defaultdict(list)
+    if not remaining:
+        return allocations
+    lots = (
+        StockLot.objects.select_for_update()
+        .filter(medicine_id__in=remaining, units__gt=0)
+        .order_by('medicine_id', 'expiry_date', 'id')
+    )
+    changed = []
+    for lot in lots:
+        taken = min(remaining[lot.medicine_id], lot.units)
+        if not taken:
+            continue
+        lot.units -= taken
+        remaining[lot.medicine_id] -= taken
+        allocations[lot.medicine_id].append((lot, taken))
+        changed.append(lot)
+    StockLot.objects.bulk_update(changed, ['units'])
+    emptied = [lot.pk for lot in changed if not lot.units]
+    if emptied:
+        StockLot.objects.filter(pk__in=emptied).delete()
+    return allocations
+
+
+def add_lots(lots):
+    """
+    Yangi (saqlanmagan) StockLot larni qo‘shadi: shu dori, seriya va muddatdagi partiya
+    bo‘lsa unga qo‘shiladi (bitta so‘rovda topiladi), qolganlari bulk_create bilan yaratiladi.
+    """
+    lots = [lot for lot in lots if lot.units > 0]
+    if not lots:
+        return
+    existing = {
+        (lot.medicine_id, lot.batch, lot.expiry_date): lot
+        for lot in StockLot.objects.select_for_update().filter(medicine_id__in={lot.medicine_id for lot in lots})
+    }
+    changed, new = {}, {}
+    for lot in lots:
+        key = (lot.medicine_id, lot.batch, lot.expiry_date)
+        if key in existing:
+            existing[key].units += lot.units
+            changed[key] = existing[key]
+        elif key in new:
+            new[key].units += lot.units
+        else:
+            new[key] = lot
+    StockLot.objects.bulk_update(changed.values(), ['units'])
+    StockLot.objects.bulk_create(new.values())
+
+
+def refresh_expiry(medicine_ids):
+    """Medicine.expiry_date — qoldig‘i bor partiyalarning eng yaqin muddati (bitta UPDATE)"""
+    nearest = (
+        StockLot.objects.filter(medicine=OuterRef('pk'), units__gt=0, expiry_date__isnull=False)
+        .order_by('expiry_date').values('expiry_date')[:1]
+    )
+    Medicine.objects.filter(pk__in=medicine_ids).update(expiry_date=Coalesce(Subquery(nearest), F('expiry_date')))
+
+
+def sync_lots(medicine):
+    """Qoldiq qo‘lda tahrirlangandan keyin partiyalar jami donaga tenglashtiriladi"""
+    with transaction.atomic():
+        lotted = medicine.lots.aggregate(total=Sum('units'))['total'] or 0
+        difference = medicine.total_units - lotted
+        if difference > 0:
+            add_lots([StockLot(medicine=medicine, expiry_date=medicine.expiry_date, units=difference)])
+        elif difference < 0:
+            allocate_fefo({medicine.pk: -difference})
+
+
+# Qabul qiluvchi joyda bir xil nomli (name_key) dorilar bir nechta bo‘lsa, transfer shu tartibdagi
+# birinchisiga (eng eskisiga) qo‘shiladi. Solishtirish (reconciliation) ham shu qoidaga tayanadi.
+DESTINATION_ORDER = ('pk',)
+
+
+def find_destinations(keys, exclude=()):
+    """
+    {(place_id, name_key), ...} uchun qabul qiluvchi dorilar: {kalit: Medicine}.
+    Hammasi bitta so‘rovda qulflab olinadi; joyda yo‘q kalitlar natijada bo‘lmaydi.
+    """
+    found = {}
+    if not keys:
+        return found
+    candidates = (
+        Medicine.objects.select_for_update()
+        .filter(place_id__in={place_id for place_id, _ in keys}, name_key__in={name for _, name in keys})
+        .exclude(pk__in=exclude)
+        .order_by(*DESTINATION_ORDER)
+    )
+    for medicine in candidates:
+        key = (medicine.place_id, medicine.name_key)
+        if key in keys:
+            found.setdefault(key, medicine)
+    return found
+
+
+def split_units(units, box_quantity, boxes_available):
+    """Donalarni (quti, dona) ga ajratadi, qutilar soni mavjud qutilardan oshmaydi"""
+    boxes, remainder = divmod(units, box_quantity)
+    if boxes > boxes_available:
+        boxes = boxes_available
+        remainder = units - boxes * box_quantity
+    return boxes, remainder
+
+
+def line_prices(medicine, boxes, units):
+    """Chiqarilayotgan paytdagi (1 dona narxi, jami narx)"""
+    unit_price = medicine.price / Decimal(medicine.box_quantity)
+    total = medicine.price * boxes + unit_price * units
+    return unit_price.quantize(Decimal('0.0001')), total.quantize(Decimal('0.01'))
+
+
+def dispense_to_patient(user, patient, place, lines):
+    """
+    Bemorga retsept bo‘yicha dori chiqarish.
+    lines: [(medicine_id, dona), ...]
+    Dorilar bitta so‘rovda qulflanadi, ombor bitta UPDATE bilan kamaytiriladi,
+    Invoice yaratiladi, PatientMedicine va MedicineHistory yozuvlari bulk_create bilan yoziladi.
+    Natija: (Invoice yoki hech narsa chiqarilmagan bo‘lsa None, rad etilgan [(medicine yoki id, dona)])
+    Joy berilmasa StockError (place=None umumiy skladni bildiradi, undan bemorga chiqarilmaydi).
+    """
+    if place is None:
+        raise StockError("Dori chiqariladigan joy tanlanmagan.")
+    with transaction.atomic():
+        medicines = Medicine.objects.select_for_update().filter(place=place).in_bulk(
+            {med_id for med_id, _ in lines}
+        )
+        available = {pk: med.total_units for pk, med in medicines.items()}
+        deltas = defaultdict(int)
+        prescriptions, history, rejected = [], [], []
+        for med_id, units in lines:
+            medicine = medicines.get(med_id)
+            if medicine is None or medicine.box_quantity <= 0 or available[med_id] < units:
+                rejected.append((medicine or med_id, units))
+                continue
+            boxes, remainder = split_units(
+                units, medicine.box_quantity, available[med_id] // medicine.box_quantity
+            )
+            available[med_id] -= units
+            deltas[med_id] -= units
+            unit_price, total_price = line_prices(medicine, boxes, remainder)
+            prescriptions.append(PatientMedicine(
+                patient=patient,
+                medicine=medicine,
+                boxes_given=boxes,
+                units_given=remainder,
+                unit_price=unit_price,
+                total_price=total_price,
+                prescribed_by=user,
+            ))
+            history.append(MedicineHistory(
+                medicine=medicine,
+                user=user,
+                to_patient=patient,
+                quantity=units,
+                action='Bemorga chiqarildi',
+            ))
+        if not prescriptions:
+            return None, rejected
+        apply_stock_deltas(deltas)
+        allocate_fefo({pk: -delta for pk, delta in deltas.items()})
+        refresh_expiry(deltas)
+        invoice = Invoice.objects.create(
+            patient=patient,
+            doctor=user,
+            place=place,
+            subtotal=sum(line.total_price for line in prescriptions),
+        )
+        for line in prescriptions:
+            line.invoice = invoice
+        PatientMedicine.objects.bulk_create(prescriptions)
+        MedicineHistory.objects.bulk_create(history)
+        record_history(history)
+        # bulk_create/update() signal yubormaydi — joy keshi qo‘lda yangilanadi
+        bump_places([place.pk])
+    return invoice, rejected
+
+
+def transfer_stock(user, source, destination, units, action):
+    """
+    Manba doridan boshqa joyga `units` dona ko‘chirish.
+    Qabul qiluvchi joyda shu nomdagi dori bo‘lsa unga qo‘shiladi, aks holda yangisi yaratiladi.
+    Manba partiyalari FEFO bo‘yicha olinadi va qabul qiluvchiga o‘sha seriya/muddat bilan o‘tadi.
+    Ikkala joyning kesh versiyasi tranzaksiyadan keyin bir marta yangilanadi.
+    """
+    with transaction.atomic():
+        key = (destination.pk, source.name_key)
+        dest = find_destinations({key}, exclude=[source.pk]).get(key)
+        deltas = {source.pk: -units}
+        if dest:
+            deltas[dest.pk] = units
+        apply_stock_deltas(deltas)
+        if dest is None:
+            dest_qty, dest_extra = divmod(units, source.box_quantity)
+            dest = Medicine.objects.create(
+                name=source.name,
+                category=source.category,
+                generic_name=source.generic_name,
+                weight=source.weight,
+                price=source.price,
+                quantity=dest_qty,
+                extra_units=dest_extra,
+                box_quantity=source.box_quantity,
+                expiry_date=source.expiry_date,
+                place=destination,
+            )
+        moved = [
+            StockLot(medicine=dest, batch=lot.batch, expiry_date=lot.expiry_date, units=taken)
+            for lot, taken in allocate_fefo({source.pk: units})[source.pk]
+        ]
+        unlotted = units - sum(lot.units for lot in moved)
+        if unlotted:
+            # Partiyasiz eski qoldiq — dorining o‘z muddati bilan
+            moved.append(StockLot(medicine=dest, expiry_date=source.expiry_date, units=unlotted))
+        add_lots(moved)
+        refresh_expiry([source.pk, dest.pk])
+        MedicineHistory.objects.create(
+            medicine=source,
+            user=user,
+            to_place=destination,
+            quantity=units,
+            action=action,
+        )
+        # update() signal yubormaydi — joy keshi qo‘lda yangilanadi
+        bump_places([source.place_id, destination.pk])
+
+
+def transfer_units(medicine, quantity, sale_type):
+    """Formadagi miqdor (quti yoki dona) -> dona"""
+    return quantity * medicine.box_quantity if sale_type == 'box' else quantity
+
+
+def transfer_action(quantity, sale_type):
+    return f"{quantity} {'quti' if sale_type == 'box' else 'dona'} ko‘chirildi"
+
+
+def bulk_transfer(user, sources, lines):
+    """
+    Terma ro‘yxat bo‘yicha ko‘chirish: lines = [(medicine_id, qabul qiluvchi Place, miqdor, 'box'|'unit'), ...].
+    Hammasi bitta tranzaksiyada: manba dorilar (`sources` ichidan) bitta so‘rovda qulflanib
+    qoldig‘i oldindan tekshiriladi, qabul qiluvchi dorilar bitta so‘rovda topiladi (yo‘qlari
+    bulk_create), qoldiq bitta UPDATE bilan, partiyalar va tarix bulk_update/bulk_create bilan yoziladi.
+    Biror qatorga qoldiq yetmasa hech narsa ko‘chirilmaydi — StockError.rejected da shu qatorlar.
+    Natija: yozilgan MedicineHistory ro‘yxati.
+    """
+    with transaction.atomic():
+        medicines = sources.select_for_update().in_bulk({med_id for med_id, *_ in lines})
+        requested = defaultdict(int)
+        for med_id, _place, quantity, sale_type in lines:
+            medicine = medicines.get(med_id)
+            requested[med_id] += transfer_units(medicine, quantity, sale_type) if medicine else quantity
+        rejected = [
+            (medicines.get(med_id, med_id), units) for med_id, units in requested.items()
+            if med_id not in medicines or medicines[med_id].box_quantity <= 0
+            or medicines[med_id].total_units < units
+        ]
+        if rejected:
+            raise StockError("Qoldiq yetarli emas.", rejected)
+
+        keys = {(place.pk, medicines[med_id].name_key) for med_id, place, *_ in lines}
+        targets = find_destinations(keys, exclude=medicines)
+
+        deltas = defaultdict(int)
+        new = {}
+        moves = []
+        for med_id, place, quantity, sale_type in lines:
+            source = medicines[med_id]
+            units = transfer_units(source, quantity, sale_type)
+            key = (place.pk, source.name_key)
+            deltas[source.pk] -= units
+            if key in targets:
+                deltas[targets[key].pk] += units
+            else:
+                if key not in new:
+                    new[key] = Medicine(
+                        name=source.name,
+                        name_key=source.name_key,  # bulk_create save() ni chaqirmaydi
+                        category=source.category,
+                        generic_name=source.generic_name,
+                        weight=source.weight,
+                        price=source.price,
+                        box_quantity=source.box_quantity,
+                        expiry_date=source.expiry_date,
+                        place=place,
+                    )
+                dest = new[key]
+                dest.quantity, dest.extra_units = divmod(dest.total_units + units, dest.box_quantity)
+            moves.append((source, place, key, units, transfer_action(quantity, sale_type)))
+        apply_stock_deltas(deltas)
+        Medicine.objects.bulk_create(new.values())
+        targets.update(new)
+
+        # Manba partiyalari FEFO bo‘yicha qatorlar tartibida taqsimlanadi
+        allocations = allocate_fefo(requested)
+        queues = {pk: iter(allocations[pk]) for pk in medicines}
+        pending = {}
+        moved, history = [], []
+        for source, place, key, units, action in moves:
+            dest = targets[key]
+            left = units
+            while left:
+                lot, available = pending.pop(source.pk, None) or next(queues[source.pk], (None, 0))
+                if lot is None:
+                    # Partiyasiz eski qoldiq — dorining o‘z muddati bilan
+                    moved.append(StockLot(medicine=dest, expiry_date=source.expiry_date, units=left))
+                    break
+                taken = min(left, available)
+                moved.append(StockLot(medicine=dest, batch=lot.batch, expiry_date=lot.expiry_date, units=taken))
+                left -= taken
+                if available > taken:
+                    pending[source.pk] = (lot, available - taken)
+            history.append(MedicineHistory(
+                medicine=source,
+                user=user,
+                to_place=place,
+                quantity=units,
+                action=action,
+            ))
+        add_lots(moved)
+        refresh_expiry([*medicines, *(dest.pk for dest in targets.values())])
+        MedicineHistory.objects.bulk_create(history)
+        record_history(history)
+        # bulk_create/update() signal yubormaydi — joy keshi qo‘lda yangilanadi
+        bump_places({source.place_id for source in medicines.values()} | {place_id for place_id, _ in keys})
+    return history
@@ -0,0 +1,60 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from main.models import CustomUser, Medicine, MedicineHistory, Patient, Place
+from main.stats import forget_patients_count, record_history, record_patients
+from main.stock_cache import bump_places
+from main.user_context import forget_users
+
+
+# bulk_create signal yubormaydi — u yerda record_history() to‘g‘ridan-to‘g‘ri chaqiriladi.
+# Joy keshi bu yerda yangilanmaydi: qoldiqni Medicine.save() (quyidagi signal) yoki
+# servislar o‘zgartiradi va ular joylarni o‘zi yangilaydi
+@receiver(post_save, sender=MedicineHistory)
+def history_created(sender, instance, created, **kwargs):
+    if created:
+        record_history([instance])
+
+
+@receiver(post_save, sender=Medicine)
+@receiver(post_delete, sender=Medicine)
+def medicine_changed(sender, instance, **kwargs):
+    bump_places([instance.place_id])
+
+
+@receiver(post_save, sender=Patient)
+def patient_created(sender, instance, created, **kwargs):
+    if created:
+        record_patients([instance])
+        forget_patients_count()
+
+
+@receiver(post_delete, sender=Patient)
+def patient_deleted(sender, instance, **kwargs):
+    forget_patients_count()
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+@receiver(m2m_changed, sender=CustomUser.place.through)
+def user_places_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        forget_users([instance.pk])
+    elif action == 'pre_clear':
+        forget_users(instance.customuser_set.values_list('pk', flat=True))
+    else:
+        forget_users(pk_set)
+
+
+# Joy nomi (_sklad) o‘zgarsa yoki joy o‘chirilsa (M2M qatorlari signalsiz o‘chadi)
+@receiver(post_save, sender=Place)
+@receiver(pre_delete, sender=Place)
+def place_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        forget_users(instance.customuser_set.values_list('pk', flat=True))
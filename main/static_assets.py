@@ -0,0 +1,140 @@
+import gzip
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # brotli o‘rnatilmagan bo‘lsa faqat gzip tayyorlanadi
+    brotli = None
+
+# Matnli (yaxshi siqiladigan) fayllar; woff/woff2, png, jpg allaqachon siqilgan
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ttf', '.eot')
+MIN_SIZE = 1024
+# Kamida shuncha foiz kichraymasa siqilgan nusxa yozilmaydi
+MIN_SAVING = 0.05
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Accept-Encoding bo‘yicha afzallik tartibi: (kodlash, fayl qo‘shimchasi)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def compress_variants(content):
+    """Fayl tarkibining siqilgan nusxalari: {'.gz': bytes, '.br': bytes} (foydasizlari tashlanadi)"""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {suffix: data for suffix, data in variants.items()
+            if len(data) <= len(content) * (1 - MIN_SAVING)}
+
+
+def is_compressible(name, size):
+    return size >= MIN_SIZE and name.lower().endswith(COMPRESSIBLE)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic da fayl nomiga kontent xeshi qo‘shiladi (dashlite.3f2a….css) va
+    matnli fayllarning .gz (brotli bo‘lsa .br) nusxalari yoniga yoziladi —
+    server har so‘rovda siqmaydi, xeshli fayllar esa muddatsiz keshlanadi.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if isinstance(hashed_name, str):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(hashed):
+            self._write_variants(name)
+
+    def _write_variants(self, name):
+        path = Path(self.path(name))
+        if not is_compressible(name, path.stat().st_size):
+            return
+        for suffix, data in compress_variants(path.read_bytes()).items():
+            Path(f'{path}{suffix}').write_bytes(data)
+
+
+def _cache_control(path):
+    if HASHED_NAME.search(path):
+        # Tarkib o‘zgarsa nom ham o‘zgaradi — brauzer qayta so‘ramaydi
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return 'public, max-age=0, must-revalidate'
+
+
+def _accepted(request):
+    header = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip().lower() for part in header.split(',')}
+
+
+def serve_static(request, path):
+    """
+    STATIC_ROOT dagi fayllarni beradi (oldida nginx bo‘lmagan joylashuvlar uchun):
+    brauzer qabul qilsa tayyor .br/.gz nusxa, xeshli nomlarga immutable kesh sarlavhasi.
+    """
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except ValueError:
+        raise Http404
+    if not fullpath.is_file() or fullpath.suffix in ('.gz', '.br'):
+        raise Http404
+    stat = fullpath.stat()
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(fullpath.name)
+    served, encoding = fullpath, None
+    accepted = _accepted(request)
+    for candidate, suffix in ENCODINGS:
+        variant = Path(f'{fullpath}{suffix}')
+        if candidate in accepted and variant.is_file():
+            served, encoding = variant, candidate
+            break
+    response = FileResponse(served.open('rb'), content_type=content_type or 'application/octet-stream')
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = _cache_control(path)
+    if is_compressible(fullpath.name, stat.st_size):
+        response['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def page_assets(template_dir):
+    """
+    Sahifa shablonlari va ular ulaydigan statik fayllar: {shablon: [fayl, ...]}.
+    {% extends %} zanjiri bo‘yicha ota shablon fayllari ham qo‘shiladi.
+    """
+    static_ref = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]\s*%}""")
+    extends_ref = re.compile(r"""{%\s*extends\s+['"]([^'"]+)['"]\s*%}""")
+    sources = {}
+    for root, _dirs, files in os.walk(template_dir):
+        for filename in files:
+            if filename.endswith('.html'):
+                full = os.path.join(root, filename)
+                sources[os.path.relpath(full, template_dir)] = Path(full).read_text(encoding='utf-8')
+
+    def assets(name, seen=()):
+        source = sources.get(name, '')
+        found = []
+        parent = extends_ref.search(source)
+        if parent and parent.group(1) not in seen:
+            found.extend(assets(parent.group(1), seen + (name,)))
+        found.extend(ref for ref in static_ref.findall(source) if ref not in found)
+        return found
+
+    pages = {}
+    for name, source in sorted(sources.items()):
+        if '<html' in source or extends_ref.search(source):
+            pages[name] = assets(name)
+    return pages
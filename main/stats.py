@@ -0,0 +1,216 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, IntegerField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from main.models import DailyStat, MedicineHistory, Patient, PatientMedicine
+
+STAT_FIELDS = ('incoming', 'used', 'transferred', 'new_patients')
+
+# Bemorlar ro‘yxati sarlavhasidagi umumiy son: COUNT(*) butun jadvalni o‘qiydi, shuning uchun keshlanadi
+PATIENTS_COUNT_KEY = 'patients:count'
+PATIENTS_COUNT_TIMEOUT = 60 * 60
+
+CHART_BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+CHART_FIELDS = ('incoming', 'incoming_amount', 'dispensed', 'dispensed_amount', 'transferred', 'transferred_amount')
+# Joylarga o‘tkazish yozuvlari (rebuild_daily_stats dagi 'transferred' bilan bir xil shart)
+TRANSFER_Q = Q(to_place__isnull=False, to_patient__isnull=True) & ~Q(action='added')
+
+
+def history_stat_field(entry):
+    """Tarix yozuvi qaysi statistika ustuniga tushishini aniqlaydi"""
+    if entry.action == 'added':
+        return 'incoming'
+    if entry.to_patient_id:
+        return 'used'
+    if entry.to_place_id:
+        return 'transferred'
+    return None
+
+
+def _apply(deltas, retry=True):
+    """
+    {(kun, place_id, medicine_id): {ustun: qiymat}} ni yig‘ma jadvalga qo‘shadi.
+    Mavjud qatorlar bitta so‘rovda topiladi va bir xil o‘zgarishga ega qatorlar bitta
+    UPDATE ... SET x = x + n bilan oshiriladi; yo‘qlari bitta bulk_create bilan yaratiladi.
+    Parallel tranzaksiya shu qatorni oldinroq yaratgan bo‘lsa (dailystat_day_med_place_uniq),
+    savepoint bekor qilinadi va bir marta qaytadan — endi UPDATE bilan — qo‘shiladi.
+    """
+    if not deltas:
+        return
+    try:
+        _write_deltas(deltas)
+    except IntegrityError:
+        if not retry:
+            raise
+        _apply(deltas, retry=False)
+
+
+def _write_deltas(deltas):
+    medicine_ids = {medicine_id for _, _, medicine_id in deltas if medicine_id is not None}
+    rows = DailyStat.objects.filter(day__in={day for day, _, _ in deltas}).filter(
+        Q(medicine_id__in=medicine_ids) | Q(medicine__isnull=True)
+    ).values_list('pk', 'day', 'place_id', 'medicine_id')
+    with transaction.atomic():
+        existing = {}
+        for pk, day, place_id, medicine_id in rows:
+            existing.setdefault((day, place_id, medicine_id), pk)
+        increments, missing = defaultdict(list), []
+        for key, values in deltas.items():
+            pk = existing.get(key)
+            if pk is None:
+                day, place_id, medicine_id = key
+                missing.append(DailyStat(day=day, place_id=place_id, medicine_id=medicine_id, **values))
+            else:
+                increments[tuple(sorted(values.items()))].append(pk)
+        for values, pks in increments.items():
+            DailyStat.objects.filter(pk__in=pks).update(**{field: F(field) + value for field, value in values})
+        DailyStat.objects.bulk_create(missing)
+
+
+def record_history(entries):
+    """Yangi MedicineHistory yozuvlarini kunlik statistikaga qo‘shadi"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for entry in entries:
+        field = history_stat_field(entry)
+        if field is None:
+            continue
+        key = (timezone.localdate(entry.created_at), entry.medicine.place_id, entry.medicine_id)
+        deltas[key][field] += entry.quantity
+    _apply(deltas)
+
+
+def record_patients(patients):
+    """Yangi bemorlarni kunlik statistikaga qo‘shadi"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for patient in patients:
+        created = patient.created_at or timezone.now()
+        deltas[(timezone.localdate(created), None, None)]['new_patients'] += 1
+    _apply(deltas)
+
+
+def patients_count():
+    return cache.get_or_set(PATIENTS_COUNT_KEY, Patient.objects.count, PATIENTS_COUNT_TIMEOUT)
+
+
+def forget_patients_count():
+    transaction.on_commit(lambda: cache.delete(PATIENTS_COUNT_KEY))
+
+
+def period_totals(start_date, end_date):
+    """[start_date, end_date] oralig‘i uchun jami qiymatlar (bitta so‘rov)"""
+    return DailyStat.objects.filter(day__range=(start_date, end_date)).aggregate(**{
+        field: Coalesce(Sum(field), Value(0), output_field=IntegerField()) for field in STAT_FIELDS
+    })
+
+
+def rebuild_daily_stats(batch_size=1000):
+    """
+    Yig‘ma jadvalni MedicineHistory va Patient jadvallaridan qaytadan quradi.
+    Guruhlash SQL tomonida bajariladi, natija partiyalab yoziladi.
+    """
+    history = (
+        MedicineHistory.objects.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'medicine_id', place_id=F('medicine__place_id'))
+        .annotate(
+            incoming=Coalesce(Sum('quantity', filter=Q(action='added')), 0),
+            used=Coalesce(Sum('quantity', filter=Q(to_patient__isnull=False) & ~Q(action='added')), 0),
+            transferred=Coalesce(
+                Sum('quantity', filter=Q(to_place__isnull=False, to_patient__isnull=True) & ~Q(action='added')), 0
+            ),
+        )
+    )
+    patients = (
+        Patient.objects.order_by()
+        .filter(created_at__isnull=False)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(new_patients=Count('id'))
+    )
+    created = 0
+    with transaction.atomic():
+        DailyStat.objects.all().delete()
+        batch = []
+        for row in history.iterator(chunk_size=batch_size):
+            batch.append(DailyStat(**row))
+            if len(batch) >= batch_size:
+                created += len(DailyStat.objects.bulk_create(batch))
+                batch = []
+        for row in patients.iterator(chunk_size=batch_size):
+            batch.append(DailyStat(**row))
+        created += len(DailyStat.objects.bulk_create(batch, batch_size=batch_size))
+    return created
+
+
+def chart_bucket(start_date, end_date):
+    """Oraliq uzunligiga qarab nuqtalar soni ixcham qoladigan davr turi"""
+    days = (end_date - start_date).days
+    if days <= 62:
+        return 'day'
+    return 'week' if days <= 366 else 'month'
+
+
+def _bucket_starts(start_date, end_date, bucket):
+    if bucket == 'week':
+        current = start_date - timedelta(days=start_date.weekday())
+    elif bucket == 'month':
+        current = start_date.replace(day=1)
+    else:
+        current = start_date
+    while current <= end_date:
+        yield current
+        if bucket == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=7 if bucket == 'week' else 1)
+
+
+def chart_series(start_date, end_date, bucket='day', place_id=None, medicine_id=None):
+    """
+    [start_date, end_date] uchun davr (kun/hafta/oy) bo‘yicha kelgan, bemorlarga chiqarilgan va
+    joylarga o‘tkazilgan donalar hamda summalar. Guruhlash SQL da: ikki so‘rov, natija qatorlari
+    davrlar soniga teng; bo‘sh davrlar nol bilan to‘ldiriladi.
+    Kelgan/o‘tkazilgan summa dorining joriy narxidan, chiqarilgani chekdagi saqlangan summadan.
+    Joy bo‘yicha filtr DailyStat dagi kabi dori turgan joyga qaraydi (o‘tkazish manba joyda).
+    """
+    trunc = CHART_BUCKETS[bucket]
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    history = MedicineHistory.objects.filter(created_at__gte=start, created_at__lt=end)
+    sales = PatientMedicine.objects.filter(date__gte=start, date__lt=end)
+    if place_id is not None:
+        history = history.filter(medicine__place_id=place_id)
+        sales = sales.filter(medicine__place_id=place_id)
+    if medicine_id is not None:
+        history = history.filter(medicine_id=medicine_id)
+        sales = sales.filter(medicine_id=medicine_id)
+
+    # Butun sonli bo‘lishdan qochish uchun (SQLite) narx REAL ga o‘tkaziladi
+    box_price = Cast('medicine__price', FloatField())
+    added = Q(action='added')  # 'added' yozuvlarida miqdor — qutilar
+    movements = (
+        history.order_by().annotate(period=trunc('created_at')).values('period').annotate(
+            incoming=Sum(F('quantity') * F('medicine__box_quantity'), filter=added),
+            incoming_amount=Sum(F('quantity') * box_price, filter=added),
+            transferred=Sum('quantity', filter=TRANSFER_Q),
+            transferred_amount=Sum(F('quantity') * box_price / F('medicine__box_quantity'), filter=TRANSFER_Q),
+        )
+    )
+    dispensed = (
+        sales.order_by().annotate(period=trunc('date')).values('period').annotate(
+            dispensed=Sum(F('boxes_given') * F('medicine__box_quantity') + F('units_given')),
+            dispensed_amount=Sum(Cast('total_price', FloatField())),
+        )
+    )
+    buckets = {day: dict.fromkeys(CHART_FIELDS, 0) for day in _bucket_starts(start_date, end_date, bucket)}
+    for rows in (movements, dispensed):
+        for row in rows:
+            values = buckets.setdefault(timezone.localtime(row.pop('period')).date(), dict.fromkeys(CHART_FIELDS, 0))
+            for field, value in row.items():
+                values[field] = round(value or 0, 2) if field.endswith('_amount') else value or 0
+    return [{'period': day.isoformat(), **values} for day, values in sorted(buckets.items())]
@@ -0,0 +1,83 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from main.models import Medicine
+
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+HITS_KEY = 'stock_fragment:hits'
+MISSES_KEY = 'stock_fragment:misses'
+# Qoldiq jadvallari (partials/stock_*.html) ishlatadigan ustunlar — qolganlari yuklanmaydi
+STOCK_COLUMNS = ('id', 'place_id', 'name', 'weight', 'category', 'price', 'box_quantity', 'quantity',
+                 'extra_units', 'expiry_date')
+
+
+def _version_key(place_id):
+    return f'stock_version:{place_id if place_id is not None else "sklad"}'
+
+
+def bump_places(place_ids):
+    """
+    Joylar qoldig‘i o‘zgardi — ularning kesh versiyasini yangilaydi (tranzaksiya tugagach).
+    Versiya vaqt belgisidan olinadi: incr kabi o‘qib-yozish poygasi bo‘lmaydi.
+    """
+    keys = {_version_key(place_id) for place_id in place_ids}
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), None))
+
+
+def _versions(place_ids):
+    keys = {place_id: _version_key(place_id) for place_id in place_ids}
+    stored = cache.get_many(keys.values())
+    missing = {key: time.time_ns() for key in keys.values() if key not in stored}
+    if missing:
+        cache.set_many(missing, None)
+        stored.update(missing)
+    return {place_id: stored[key] for place_id, key in keys.items()}
+
+
+def place_version(place_id):
+    """Joy qoldig‘ining joriy versiyasi (ETag va kesh kalitlari uchun)"""
+    return _versions([place_id])[place_id]
+
+
+def place_stock_fragments(places, template_name):
+    """
+    Har bir joy uchun dorilar jadvali HTML bo‘lagi: [{'place', 'html'}], joylar tartibida.
+    Bo‘laklar joy versiyasi bilan keshlanadi; faqat topilmaganlar uchun dorilar
+    bitta so‘rovda olinadi va qayta render qilinadi.
+    """
+    places = list(places)
+    versions = _versions([place.pk for place in places])
+    keys = {place.pk: f'stock_fragment:{template_name}:{place.pk}:{versions[place.pk]}' for place in places}
+    cached = cache.get_many(keys.values())
+    missed = [place for place in places if keys[place.pk] not in cached]
+    if missed:
+        fresh = {}
+        for block in Medicine.objects.only(*STOCK_COLUMNS).with_pricing().grouped_by_place(missed):
+            fresh[keys[block['place'].pk]] = render_to_string(template_name, block)
+        cache.set_many(fresh, FRAGMENT_TIMEOUT)
+        cached.update(fresh)
+    _count(len(places) - len(missed), len(missed))
+    return [{'place': place, 'html': cached[keys[place.pk]]} for place in places]
+
+
+def _count(hits, misses):
+    for key, amount in ((HITS_KEY, hits), (MISSES_KEY, misses)):
+        if amount:
+            cache.add(key, 0, None)
+            cache.incr(key, amount)
+
+
+def fragment_stats():
+    """Kesh statistikasi: {'hits', 'misses', 'ratio'}"""
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = stats.get(HITS_KEY, 0), stats.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'ratio': hits / total if total else 0.0}
+
+
+def reset_fragment_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
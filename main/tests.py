@@ -1,3 +1,912 @@
-from django.test import TestCase
+import csv
+import io
+import re
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main import jobs
+from main.importer import import_medicines
+from main.middleware import RequestTimingMiddleware
+from main.models import BackgroundJob, CustomUser, DailyStat, Invoice, Medicine, MedicineHistory, Patient, PatientMedicine, Place, StockLot
+from main.pagination import keyset_paginate
+from main.reconciliation import reconcile_stock, write_corrections
+from main.services import StockError, allocate_fefo, apply_stock_deltas, bulk_transfer, dispense_to_patient, transfer_stock
+from main.stats import STAT_FIELDS, rebuild_daily_stats
+from main.stock_cache import fragment_stats, place_stock_fragments, place_version, reset_fragment_stats
+from main.user_context import USER_CACHE_FIELDS, CachedModelBackend
+
+# Testlar loyiha ildizidagi fayl keshiga yozmasligi va collectstatic manifestini talab qilmasligi uchun
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+TEST_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+class StockTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='admin', password='x', role='admin')
+        cls.place = Place.objects.create(name='Xona 1')
+        cls.patient = Patient.objects.create(name='Ali', surname='Valiyev', phone='+998901234567', address='-')
+
+    def setUp(self):
+        # locmem kesh testlar orasida saqlanib qoladi (joy versiyalari, foydalanuvchi konteksti)
+        cache.clear()
+
+    def stock(self, name, units, box_quantity=10, place=None, lots=(), warehouse=False):
+        """Kirim tarixi va partiyalari bilan dori (qoldiq — `units` dona; warehouse — umumiy sklad)"""
+        place = None if warehouse else place or self.place
+        boxes, extra = divmod(units, box_quantity)
+        medicine = Medicine.objects.create(
+            name=name, price=100, box_quantity=box_quantity, quantity=boxes, extra_units=extra, place=place,
+        )
+        MedicineHistory.objects.create(medicine=medicine, user=self.user, quantity=boxes, action='added')
+        if extra:
+            MedicineHistory.objects.create(medicine=medicine, user=self.user, quantity=extra, action='adjusted')
+        lots = list(lots) or [(None, units)]
+        StockLot.objects.bulk_create(
+            StockLot(medicine=medicine, expiry_date=expiry, units=lot_units) for expiry, lot_units in lots
+        )
+        return medicine
+
+    def total_units(self, medicine):
+        medicine.refresh_from_db()
+        return medicine.total_units
+
+    def login(self, role='admin', places=()):
+        """Shu roldagi foydalanuvchi bilan kiradi (admin — setUpTestData dagisi)"""
+        user = self.user
+        if role != 'admin':
+            user = CustomUser.objects.create_user(username=role, password='x', role=role)
+            user.place.set(places)
+        self.client.force_login(user)
+        return user
+
+
+class KeysetPaginationTests(StockTestCase):
+    def test_pages_cover_every_row_once_including_equal_timestamps(self):
+        medicine = self.stock('Paratsetamol', 10)
+        MedicineHistory.objects.all().delete()
+        moment = timezone.now()
+        entries = MedicineHistory.objects.bulk_create(
+            MedicineHistory(medicine=medicine, user=self.user, quantity=i, action='added') for i in range(7)
+        )
+        # Uchtasi bir xil vaqtda — tartib id bo‘yicha davom etadi
+        for entry, minutes in zip(entries, (5, 4, 3, 3, 3, 2, 1)):
+            MedicineHistory.objects.filter(pk=entry.pk).update(created_at=moment - timedelta(minutes=minutes))
+        queryset = MedicineHistory.objects.all()
+        expected = list(queryset.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+        pages, cursor = [], None
+        while True:
+            page = keyset_paginate(queryset, after=cursor, per_page=3)
+            pages.append([entry.pk for entry in page])
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        second = keyset_paginate(queryset, after=keyset_paginate(queryset, per_page=3).next_cursor, per_page=3)
+        back = keyset_paginate(queryset, before=second.prev_cursor, per_page=3)
+        self.assertEqual([entry.pk for entry in back], pages[0])
+        self.assertFalse(back.has_previous)
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        self.stock('Paratsetamol', 10)
+        page = keyset_paginate(MedicineHistory.objects.all(), after='not-a-cursor', per_page=10)
+        self.assertEqual(len(page), MedicineHistory.objects.count())
+        self.assertFalse(page.has_previous)
+
+
+class MedicineHistoryViewTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_cursor_links_walk_filtered_history(self):
+        medicine = self.stock('Paratsetamol', 40)
+        for units in (1, 2, 3):
+            MedicineHistory.objects.create(
+                medicine=medicine, user=self.user, to_patient=self.patient, quantity=units, action='Bemorga chiqarildi',
+            )
+        url = reverse('medicine_history')
+        seen, params = [], {'action': 'patient'}
+        with mock.patch('main.views.HISTORY_PAGE_SIZE', 2):
+            while True:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                page = response.context['history']
+                seen += [entry.quantity for entry in page]
+                if not page.has_next:
+                    break
+                params['after'] = page.next_cursor
+        self.assertEqual(seen, [3, 2, 1])
+        self.assertEqual(response.context['filters']['action'], 'patient')
+
+    def test_place_and_date_filters(self):
+        other = Place.objects.create(name='Xona 2')
+        self.stock('Paratsetamol', 10)
+        elsewhere = self.stock('Ibuprofen', 10, place=other)
+        today = timezone.localdate().isoformat()
+        response = self.client.get(reverse('medicine_history'), {
+            'place': other.pk, 'date_from': today, 'date_to': today,
+        })
+        self.assertEqual([entry.medicine_id for entry in response.context['history']], [elsewhere.pk])
+        response = self.client.get(reverse('medicine_history'), {'date_to': '2000-01-01'})
+        self.assertEqual(len(response.context['history']), 0)
+
+
+class ApplyStockDeltasTests(StockTestCase):
+    def test_deduction_and_addition_carry_between_boxes_and_units(self):
+        first = self.stock('Paratsetamol', 15)
+        second = self.stock('Ibuprofen', 8)
+        apply_stock_deltas({first.pk: -7, second.pk: 12})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.quantity, first.extra_units), (0, 8))
+        self.assertEqual((second.quantity, second.extra_units), (2, 0))
+
+    def test_insufficient_row_rejects_whole_update(self):
+        short = self.stock('Paratsetamol', 15)
+        enough = self.stock('Ibuprofen', 30)
+        with self.assertRaises(StockError):
+            with transaction.atomic():
+                apply_stock_deltas({short.pk: -16, enough.pk: -5})
+        self.assertEqual(self.total_units(short), 15)
+        self.assertEqual(self.total_units(enough), 30)
+
+    def test_guard_uses_current_database_value(self):
+        medicine = self.stock('Paratsetamol', 10)
+        # Parallel so‘rov qoldiqni kamaytirgan — eskirgan obyekt emas, bazadagi qiymat tekshiriladi
+        Medicine.objects.filter(pk=medicine.pk).update(quantity=0, extra_units=4)
+        with self.assertRaises(StockError):
+            with transaction.atomic():
+                apply_stock_deltas({medicine.pk: -medicine.total_units})
+        self.assertEqual(self.total_units(medicine), 4)
+
+
+class DispenseToPatientTests(StockTestCase):
+    def test_rejected_lines_do_not_touch_stock(self):
+        medicine = self.stock('Paratsetamol', 5)
+        elsewhere = self.stock('Ibuprofen', 50, place=Place.objects.create(name='Xona 2'))
+        invoice, rejected = dispense_to_patient(
+            self.user, self.patient, self.place, [(medicine.pk, 6), (elsewhere.pk, 1), (999999, 1)],
+        )
+        self.assertIsNone(invoice)
+        self.assertEqual([(getattr(item, 'pk', item), units) for item, units in rejected],
+                         [(medicine.pk, 6), (elsewhere.pk, 1), (999999, 1)])
+        self.assertEqual(self.total_units(medicine), 5)
+        self.assertEqual(self.total_units(elsewhere), 50)
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(MedicineHistory.objects.filter(to_patient=self.patient).exists())
+
+    def test_accepted_lines_are_dispensed_when_others_are_rejected(self):
+        medicine = self.stock('Paratsetamol', 25)
+        short = self.stock('Ibuprofen', 2)
+        invoice, rejected = dispense_to_patient(
+            self.user, self.patient, self.place, [(medicine.pk, 12), (short.pk, 3)],
+        )
+        self.assertEqual([(item.pk, units) for item, units in rejected], [(short.pk, 3)])
+        line = PatientMedicine.objects.get(invoice=invoice)
+        self.assertEqual((line.medicine_id, line.boxes_given, line.units_given), (medicine.pk, 1, 2))
+        self.assertEqual(invoice.subtotal, line.total_price)
+        self.assertEqual(self.total_units(medicine), 13)
+        self.assertEqual(self.total_units(short), 2)
+
+    def test_same_medicine_on_two_lines_cannot_exceed_stock(self):
+        medicine = self.stock('Paratsetamol', 10)
+        invoice, rejected = dispense_to_patient(
+            self.user, self.patient, self.place, [(medicine.pk, 7), (medicine.pk, 7)],
+        )
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(PatientMedicine.objects.get(invoice=invoice).units_given, 7)
+        self.assertEqual(self.total_units(medicine), 3)
+
+
+class GiveMedicineToPatientViewTests(StockTestCase):
+    url = reverse('give_medicine_to_patient')
+
+    def test_form_lists_only_the_doctors_place(self):
+        medicine = self.stock('Paratsetamol', 10)
+        self.stock('Ibuprofen', 10, place=Place.objects.create(name='Xona 2'))
+        self.login('doctor', [self.place])
+        response = self.client.get(self.url)
+        self.assertEqual(list(response.context['medicines']), [medicine])
+
+    def test_prescription_creates_invoice_and_reports_rejected_lines(self):
+        medicine = self.stock('Paratsetamol', 25)
+        short = self.stock('Ibuprofen', 2)
+        self.login('doctor', [self.place])
+        response = self.client.post(self.url, {
+            'patient': self.patient.pk,
+            'medicines': [medicine.pk, short.pk, 'x'],
+            'quantities': [12, 3, 1],
+        })
+        invoice = Invoice.objects.get()
+        self.assertRedirects(response, reverse('invoice_detail', args=[invoice.pk]))
+        self.assertEqual(self.total_units(medicine), 13)
+        self.assertEqual(self.total_units(short), 2)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ["Ibuprofen uchun yetarli miqdor mavjud emas."])
+
+    def test_nothing_dispensed_goes_back_to_patient_invoices(self):
+        medicine = self.stock('Paratsetamol', 5)
+        self.login('doctor', [self.place])
+        response = self.client.post(self.url, {
+            'patient': self.patient.pk, 'medicines': [medicine.pk], 'quantities': [6],
+        })
+        self.assertRedirects(response, reverse('list_invoices', args=[self.patient.pk]))
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_only_doctors_can_dispense(self):
+        medicine = self.stock('Paratsetamol', 5)
+        self.login()
+        response = self.client.post(self.url, {
+            'patient': self.patient.pk, 'medicines': [medicine.pk], 'quantities': [1],
+        })
+        self.assertRedirects(response, reverse('listmedicine'), fetch_redirect_response=False)
+        self.assertEqual(self.total_units(medicine), 5)
+
+
+class DailyStatRollupTests(StockTestCase):
+    def rollup(self):
+        return {
+            (row.day, row.place_id, row.medicine_id): tuple(getattr(row, field) for field in STAT_FIELDS)
+            for row in DailyStat.objects.all()
+            if any(getattr(row, field) for field in STAT_FIELDS)
+        }
+
+    def test_incremental_rollup_matches_rebuild(self):
+        other = Place.objects.create(name='Xona 2')
+        # Kecha yarim tundan keyin (mahalliy vaqt; UTC da hali undan oldingi kun) —
+        # kun chegarasi ikkala yo‘lda bir xil bo‘lishi kerak
+        early = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=1), time(0, 30)))
+        with mock.patch('django.utils.timezone.now', return_value=early):
+            warehouse = self.stock('Paratsetamol', 45, warehouse=True)
+            Patient.objects.create(name='Vali', surname='Aliyev', phone='+998911112233', address='-')
+        medicine = self.stock('Ibuprofen', 25)
+        transfer_stock(self.user, warehouse, self.place, 15, '15 dona ko‘chirildi')
+        bulk_transfer(self.user, Medicine.objects.filter(place=None), [(warehouse.pk, other, 1, 'box')])
+        dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 7), (medicine.pk, 3)])
+
+        incremental = self.rollup()
+        self.assertEqual(len({day for day, _, _ in incremental}), 2)
+        rebuild_daily_stats(batch_size=2)
+        self.assertEqual(self.rollup(), incremental)
+
+
+class FrozenInvoicePriceTests(StockTestCase):
+    def test_price_change_does_not_touch_issued_invoices(self):
+        medicine = self.stock('Paratsetamol', 30)
+        invoice, _ = dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 15)])
+        medicine.refresh_from_db()
+        medicine.price = 300
+        medicine.save()
+
+        line = PatientMedicine.objects.get(invoice=invoice)
+        self.assertEqual((line.unit_price, line.total_price), (Decimal('10.0000'), Decimal('150.00')))
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.subtotal, Decimal('150.00'))
+        self.login()
+        response = self.client.get(reverse('invoice_detail', args=[invoice.pk]))
+        self.assertEqual(response.context['subtotal'], '150.00')
+        self.assertEqual([item.total_price for item in response.context['prescriptions']], [Decimal('150.00')])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class InvoiceBackfillMigrationTests(TransactionTestCase):
+    """0029: eski PatientMedicine qatorlari (bemor, daqiqa) bo‘yicha Invoice ga yig‘iladi, narxlar muzlatiladi"""
+    before = [('main', '0028_dailystat')]
+    after = [('main', '0029_invoice')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_lines_are_grouped_by_patient_and_minute_with_frozen_prices(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('main', 'CustomUser').objects.create(username='doc', role='doctor')
+        place = apps.get_model('main', 'Place').objects.create(name='Xona 1')
+        Patient = apps.get_model('main', 'Patient')
+        ali = Patient.objects.create(name='Ali', surname='Valiyev', phone='1', address='-')
+        vali = Patient.objects.create(name='Vali', surname='Aliyev', phone='2', address='-')
+        medicine = apps.get_model('main', 'Medicine').objects.create(
+            name='Paratsetamol', price=100, box_quantity=8, quantity=10, place=place,
+        )
+        PatientMedicine = apps.get_model('main', 'PatientMedicine')
+        moment = timezone.make_aware(datetime(2026, 3, 1, 10, 15, 5))
+        for patient, boxes, units, seconds in [
+            (ali, 1, 4, 0), (ali, 0, 3, 40), (ali, 2, 0, 70), (vali, 0, 1, 10),
+        ]:
+            line = PatientMedicine.objects.create(
+                patient=patient, medicine=medicine, boxes_given=boxes, units_given=units, prescribed_by=user,
+            )
+            PatientMedicine.objects.filter(pk=line.pk).update(date=moment + timedelta(seconds=seconds))
+
+        apps = self.migrate(self.after)
+        Invoice = apps.get_model('main', 'Invoice')
+        invoices = [
+            (invoice.patient_id, invoice.place_id, invoice.doctor_id, invoice.subtotal, invoice.created_at,
+             sorted(invoice.lines.values_list('boxes_given', 'units_given', 'unit_price', 'total_price')))
+            for invoice in Invoice.objects.order_by('patient_id', 'created_at')
+        ]
+        self.assertEqual(invoices, [
+            (ali.pk, place.pk, user.pk, Decimal('187.50'), moment,
+             [(0, 3, Decimal('12.5000'), Decimal('37.50')), (1, 4, Decimal('12.5000'), Decimal('150.00'))]),
+            (ali.pk, place.pk, user.pk, Decimal('200.00'), moment + timedelta(seconds=70),
+             [(2, 0, Decimal('12.5000'), Decimal('200.00'))]),
+            (vali.pk, place.pk, user.pk, Decimal('12.50'), moment + timedelta(seconds=10),
+             [(0, 1, Decimal('12.5000'), Decimal('12.50'))]),
+        ])
+        self.assertEqual(
+            sorted(Invoice.objects.values_list('number', flat=True)),
+            sorted(f"INV{pk:06d}" for pk in Invoice.objects.values_list('pk', flat=True)),
+        )
+        self.assertFalse(apps.get_model('main', 'PatientMedicine').objects.filter(invoice__isnull=True).exists())
+
+
+class ImporterTests(StockTestCase):
+    def import_csv(self, text):
+        return import_medicines(io.BytesIO(text.encode()), 'stock.csv', self.user)
+
+    def test_existing_units_are_kept_when_box_size_changes(self):
+        self.import_csv("name,price,quantity,box_quantity\nPara,10,5,10\nIbu,5,3,10\nIbu,5,1,4\n")
+        result = self.import_csv("name,price,quantity,box_quantity\nPara,12,1,20\n")
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+        para = Medicine.objects.get(name='Para')
+        ibu = Medicine.objects.get(name='Ibu')
+        self.assertEqual((para.price, para.box_quantity, para.total_units), (12, 20, 70))
+        self.assertEqual(ibu.total_units, 34)
+        for medicine in (para, ibu):
+            self.assertEqual(sum(medicine.lots.values_list('units', flat=True)), medicine.total_units)
+        self.assertEqual(list(reconcile_stock()), [])
+
+    def test_invalid_rows_are_reported_and_blank_rows_skipped(self):
+        result = self.import_csv("name,price,quantity\nPara,10,2\nIbu,abc,1\nAspirin,5,-1\n,,\n")
+        self.assertEqual((result.rows, result.imported), (3, 1))
+        self.assertEqual([number for number, _ in result.errors], [3, 4])
+        self.assertEqual(Medicine.objects.get().name, 'Para')
+
+
+class DoctorWithoutPlaceTests(StockTestCase):
+    def test_service_refuses_to_dispense_without_place(self):
+        warehouse = self.stock('Paratsetamol', 10, warehouse=True)
+        with self.assertRaises(StockError):
+            dispense_to_patient(self.user, self.patient, None, [(warehouse.pk, 1)])
+        self.assertEqual(self.total_units(warehouse), 10)
+
+    def test_view_shows_error_instead_of_warehouse_stock(self):
+        warehouse = self.stock('Paratsetamol', 10, warehouse=True)
+        self.login('doctor')
+        url = reverse('give_medicine_to_patient')
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['medicines']), [])
+        self.assertContains(response, "Sizga joy biriktirilmagan")
+        response = self.client.post(url, {
+            'patient': self.patient.pk, 'medicines': [warehouse.pk], 'quantities': [1],
+        })
+        self.assertContains(response, "Sizga joy biriktirilmagan")
+        self.assertFalse(Invoice.objects.exists())
+        self.assertEqual(self.total_units(warehouse), 10)
+
+
+class ExportViewTests(StockTestCase):
+    def csv_rows(self, response):
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(text)))
+
+    def test_stock_export_streams_csv_for_one_place(self):
+        self.stock('Paratsetamol', 25)
+        self.stock('Ibuprofen', 10, place=Place.objects.create(name='Xona 2'))
+        self.login()
+        response = self.client.get(reverse('export_stock'), {'place': self.place.pk})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="qoldiq.csv"')
+        header, *rows = self.csv_rows(response)
+        self.assertEqual(header[:2], ['Joy', 'Dori nomi'])
+        self.assertEqual([(row[0], row[1], row[7]) for row in rows], [('Xona 1', 'Paratsetamol', '25')])
+
+    def test_history_export_uses_page_filters_and_stays_csv(self):
+        medicine = self.stock('Paratsetamol', 25)
+        dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 4)])
+        self.login()
+        response = self.client.get(reverse('export_history'), {'action': 'patient', 'format': 'xlsx'})
+        _, *rows = self.csv_rows(response)
+        self.assertEqual([(row[1], row[2], row[6]) for row in rows], [('Paratsetamol', '4', 'Ali Valiyev')])
+
+    def test_exports_are_admin_only(self):
+        self.login('staff', [self.place])
+        self.assertEqual(self.client.get(reverse('export_stock')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export_history')).status_code, 403)
+
+    def test_excel_export_is_queued_with_the_filters(self):
+        self.login()
+        response = self.client.post(reverse('start_job'), {
+            'report': 'history', 'format': 'xlsx', 'action': 'patient', 'place': str(self.place.pk),
+        })
+        job = BackgroundJob.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]))
+        self.assertEqual((job.kind, job.status), ('export', 'queued'))
+        self.assertEqual(job.params, {
+            'report': 'history', 'format': 'xlsx', 'filters': {'action': 'patient', 'place': str(self.place.pk)},
+        })
+
+
+class PatientSearchTests(StockTestCase):
+    def test_phone_shaped_terms_search_by_phone_without_country_code(self):
+        other = Patient.objects.create(name='Vali', surname='Aliyev', phone='99 812 34 56', address='-')
+        for term, expected in [
+            ('+998 90 123', [self.patient]), ('90-123', [self.patient]), ('998901', [self.patient]),
+            ('(90) 123', [self.patient]), ('99812', [other]), ('ali 90-123', [self.patient]), ('12', []),
+        ]:
+            with self.subTest(term=term):
+                self.assertEqual(list(Patient.objects.search(term)), expected)
+
+    def test_typeahead_and_cached_patient_count(self):
+        self.login()
+        response = self.client.get(reverse('patient_search'), {'q': 'valiy'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.patient.pk])
+        self.assertEqual(self.client.get(reverse('list_patients')).context['patients_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Patient.objects.create(name='Vali', surname='Aliyev', phone='+998911112233', address='-')
+        self.assertEqual(self.client.get(reverse('list_patients')).context['patients_count'], 2)
+
+
+class StockFragmentCacheTests(StockTestCase):
+    template = 'partials/stock_doctor.html'
+
+    def render(self, place=None):
+        [block] = place_stock_fragments([place or self.place], self.template)
+        return block['html']
+
+    def test_second_render_is_a_cache_hit(self):
+        self.stock('Paratsetamol', 10)
+        reset_fragment_stats()
+        first = self.render()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(), first)
+        self.assertEqual(fragment_stats(), {'hits': 1, 'misses': 1, 'ratio': 0.5})
+
+    def assertBumpedAfterCommit(self, place_ids, change):
+        before = {place_id: place_version(place_id) for place_id in place_ids}
+        with self.captureOnCommitCallbacks() as callbacks:
+            change()
+        # Tranzaksiya tugamaguncha eski versiya (o‘zgarish hali boshqalarga ko‘rinmaydi)
+        self.assertEqual({place_id: place_version(place_id) for place_id in place_ids}, before)
+        for callback in callbacks:
+            callback()
+        for place_id in place_ids:
+            self.assertNotEqual(place_version(place_id), before[place_id], place_id)
+
+    def test_stock_services_bump_place_versions_after_commit(self):
+        other = Place.objects.create(name='Xona 2')
+        warehouse = self.stock('Paratsetamol', 50, warehouse=True)
+        medicine = self.stock('Ibuprofen', 20)
+        self.assertBumpedAfterCommit([None, self.place.pk], lambda: transfer_stock(
+            self.user, warehouse, self.place, 5, '5 dona ko‘chirildi',
+        ))
+        self.assertBumpedAfterCommit([None, other.pk], lambda: bulk_transfer(
+            self.user, Medicine.objects.filter(place=None), [(warehouse.pk, other, 1, 'box')],
+        ))
+        self.assertBumpedAfterCommit([self.place.pk], lambda: dispense_to_patient(
+            self.user, self.patient, self.place, [(medicine.pk, 3)],
+        ))
+        self.assertBumpedAfterCommit([None], lambda: import_medicines(
+            io.BytesIO(b"name,price,quantity\nParatsetamol,100,2\n"), 'stock.csv', self.user,
+        ))
+
+    def test_edited_medicine_is_not_served_stale(self):
+        medicine = self.stock('Paratsetamol', 10)
+        self.assertIn('Paratsetamol', self.render())
+        self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('medicine_update', args=[medicine.pk]), {
+                'name': 'Paratsetamol forte', 'category': medicine.category, 'price': '150',
+                'box_quantity': '10', 'quantity': '1', 'expiry_date': '',
+            })
+        html = self.render()
+        self.assertIn('Paratsetamol forte', html)
+        self.assertIn("150 so'm", html)
+
+
+class ConditionalApiTests(StockTestCase):
+    def test_place_stock_etag_revalidates_until_stock_changes(self):
+        medicine = self.stock('Paratsetamol', 25)
+        self.login('doctor', [self.place])
+        url = reverse('api_place_stock', args=[self.place.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['id'], row['total_units']) for row in response.json()['results']], [(medicine.pk, 25)])
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 5)])
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['total_units'], 20)
+
+    def test_place_stock_is_limited_to_own_places(self):
+        self.login('doctor', [self.place])
+        other = Place.objects.create(name='Xona 2')
+        self.assertEqual(self.client.get(reverse('api_place_stock', args=[other.pk])).status_code, 403)
+
+    def test_patient_invoices_etag_and_last_modified(self):
+        medicine = self.stock('Paratsetamol', 25)
+        invoice, _ = dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 5)])
+        self.login()
+        url = reverse('api_patient_invoices', args=[self.patient.pk])
+        response = self.client.get(url)
+        self.assertEqual([row['id'] for row in response.json()['results']], [invoice.pk])
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={'if-modified-since': last_modified}).status_code, 304)
+
+        dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 1)])
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class RequestTimingTests(StockTestCase):
+    SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+), total;dur=([\d.]+)')
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_SLOW_MS=0)
+    def test_server_timing_has_db_and_template_parts(self):
+        self.stock('Paratsetamol', 10)
+        self.login()
+        with self.assertLogs('main.timing', 'WARNING') as logs:
+            response = self.client.get(reverse('medicine_history'))
+        match = self.SERVER_TIMING.fullmatch(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        db, queries, template, total = match.groups()
+        self.assertGreater(int(queries), 0)
+        self.assertGreater(float(template), 0)
+        self.assertGreaterEqual(float(total), float(db))
+        self.assertIn(f"{queries} SQL", logs.output[0])
+
+    def test_middleware_is_not_used_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestTimingMiddleware(lambda request: None)
+        self.login()
+        self.assertNotIn('Server-Timing', self.client.get(reverse('medicine_history')))
+
+
+class FefoTests(StockTestCase):
+    def test_nearest_expiry_goes_first_and_empty_lots_are_removed(self):
+        soon, later = date(2026, 12, 1), date(2027, 6, 1)
+        medicine = self.stock('Paratsetamol', 12, lots=[(later, 5), (None, 2), (soon, 5)])
+        allocations = allocate_fefo({medicine.pk: 8})
+        self.assertEqual([(lot.expiry_date, taken) for lot, taken in allocations[medicine.pk]],
+                         [(None, 2), (soon, 5), (later, 1)])
+        self.assertEqual(list(medicine.lots.values_list('expiry_date', 'units')), [(later, 4)])
+
+    def test_dispense_moves_expiry_to_next_lot(self):
+        soon, later = date(2026, 12, 1), date(2027, 6, 1)
+        medicine = self.stock('Paratsetamol', 10, lots=[(soon, 4), (later, 6)])
+        dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 5)])
+        medicine.refresh_from_db()
+        self.assertEqual(medicine.expiry_date, later)
+        self.assertEqual(list(medicine.lots.values_list('expiry_date', 'units')), [(later, 5)])
+
+
+class MedicineUpdateViewTests(StockTestCase):
+    def post(self, medicine, **data):
+        return self.client.post(reverse('medicine_update', args=[medicine.pk]), {
+            'name': medicine.name, 'category': medicine.category, 'price': '100',
+            'box_quantity': '10', 'quantity': '2', **data,
+        })
+
+    def test_added_stock_becomes_a_lot_with_the_parsed_expiry(self):
+        medicine = self.stock('Paratsetamol', 10, lots=[(date(2026, 12, 1), 10)])
+        self.login()
+        response = self.post(medicine, expiry_date='2027-03-15')
+        self.assertRedirects(response, reverse('listmedicine'), fetch_redirect_response=False)
+        medicine.refresh_from_db()
+        self.assertEqual(medicine.expiry_date, date(2027, 3, 15))
+        self.assertEqual(sorted(medicine.lots.values_list('expiry_date', 'units')),
+                         [(date(2026, 12, 1), 10), (date(2027, 3, 15), 10)])
+
+    def test_invalid_expiry_is_rejected_before_saving(self):
+        medicine = self.stock('Paratsetamol', 10)
+        self.login()
+        response = self.post(medicine, expiry_date='15.03.2027', name='Boshqa nom')
+        self.assertContains(response, "Yaroqlilik muddati noto‘g‘ri kiritildi.")
+        medicine.refresh_from_db()
+        self.assertEqual((medicine.name, medicine.total_units), ('Paratsetamol', 10))
+        self.assertEqual(list(medicine.lots.values_list('units', flat=True)), [10])
+
+
+class JobQueueTests(StockTestCase):
+    def failing(self, job):
+        raise RuntimeError("baza band")
+
+    def test_only_one_claimant_wins_a_job(self):
+        taken = jobs.enqueue('rebuild_daily_stats')
+        free = jobs.enqueue('rebuild_daily_stats')
+        now = timezone.now()
+        self.assertTrue(jobs._claim(taken.pk, now))
+        self.assertFalse(jobs._claim(taken.pk, now))
+
+        # Ikkinchi worker birinchi nomzodni shu orada olib qo‘ygan — navbatdagisiga o‘tiladi
+        rival = jobs.enqueue('rebuild_daily_stats')
+        claim = jobs._claim
+
+        def raced(pk, now):
+            if pk == free.pk:
+                claim(pk, now)
+            return claim(pk, now)
+
+        with mock.patch('main.jobs._claim', raced):
+            self.assertEqual(jobs.claim_next().pk, rival.pk)
+        self.assertEqual(
+            list(BackgroundJob.objects.order_by('pk').values_list('status', 'attempts')),
+            [('running', 1), ('running', 1), ('running', 1)],
+        )
+        self.assertIsNone(jobs.claim_next())
+
+    def test_failed_job_is_retried_with_exponential_backoff(self):
+        with mock.patch.dict(jobs.JOB_HANDLERS, {'flaky': ("Sinov", self.failing)}):
+            job = jobs.enqueue('flaky', max_attempts=3)
+            start = job.run_after
+            delays = []
+            for attempt in range(3):
+                moment = start + timedelta(hours=attempt)
+                with mock.patch('django.utils.timezone.now', return_value=moment), \
+                        self.assertLogs('main.jobs', 'WARNING'):
+                    claimed = jobs.claim_next()
+                    self.assertEqual(claimed.pk, job.pk)
+                    jobs.run_job(claimed)
+                job.refresh_from_db()
+                if job.status == 'queued':
+                    delays.append(job.run_after - moment)
+                    with mock.patch('django.utils.timezone.now', return_value=job.run_after - timedelta(seconds=1)):
+                        self.assertIsNone(jobs.claim_next())
+        self.assertEqual(delays, [timedelta(seconds=jobs.RETRY_DELAY), timedelta(seconds=jobs.RETRY_DELAY * 2)])
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn("baza band", job.error)
+
+    def test_stale_running_jobs_are_requeued_or_failed(self):
+        long_ago = timezone.now() - jobs.STALE_AFTER - timedelta(minutes=1)
+        stale = jobs.enqueue('rebuild_daily_stats')
+        exhausted = jobs.enqueue('rebuild_daily_stats', max_attempts=1)
+        fresh = jobs.enqueue('rebuild_daily_stats')
+        BackgroundJob.objects.filter(pk__in=[stale.pk, exhausted.pk]).update(
+            status='running', started_at=long_ago, attempts=1,
+        )
+        BackgroundJob.objects.filter(pk=fresh.pk).update(status='running', started_at=timezone.now(), attempts=1)
+        self.assertEqual(jobs.requeue_stale(), 2)
+        self.assertEqual(
+            list(BackgroundJob.objects.order_by('pk').values_list('status', flat=True)),
+            ['queued', 'failed', 'running'],
+        )
+
+
+class JobViewTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Natija fayllari loyiha ichidagi private/ ga emas, vaqtinchalik papkaga yoziladi
+        field = BackgroundJob._meta.get_field('result_file')
+        patcher = mock.patch.object(field, 'storage', FileSystemStorage(location=directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_export_job_from_queue_to_download(self):
+        self.stock('Paratsetamol', 25)
+        self.login()
+        self.client.post(reverse('start_job'), {'report': 'stock', 'format': 'csv'})
+        job = BackgroundJob.objects.get()
+        status_url = reverse('job_status', args=[job.pk])
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+        response = self.client.get(reverse('job_detail', args=[job.pk]))
+        self.assertContains(response, f"Vazifa #{job.pk}")
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.pk])).status_code, 404)
+
+        jobs.run_job(jobs.claim_next())
+        payload = self.client.get(status_url).json()
+        self.assertEqual((payload['status'], payload['result']), ('done', {'rows': 1, 'format': 'csv'}))
+        response = self.client.get(payload['download_url'])
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('Paratsetamol', content)
+        response.close()
+
+    def test_job_pages_are_admin_only(self):
+        job = jobs.enqueue('rebuild_daily_stats', user=self.user)
+        self.login('staff', [self.place])
+        for name in ('job_detail', 'job_status', 'job_download'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name, args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('start_job'), {'report': 'stock'}).status_code, 403)
+
+
+class CachedUserTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Place.objects.create(name='Xona 2')
+        self.doctor = self.login('doctor', [self.place])
+        self.keys = [f'user_context:{self.doctor.pk}', f'auth_user:{self.doctor.pk}']
+
+    def place_status(self, place):
+        return self.client.get(reverse('api_place_stock', args=[place.pk])).status_code
+
+    def test_cache_holds_only_listed_fields_and_still_authenticates(self):
+        self.assertEqual(self.place_status(self.place), 200)
+        row = cache.get(f'auth_user:{self.doctor.pk}')
+        self.assertEqual(set(row), {*USER_CACHE_FIELDS, 'session_hash'})
+        self.assertEqual(row['role'], 'doctor')
+        user = CachedModelBackend().get_user(self.doctor.pk)
+        self.assertEqual((user.pk, user.username, user.role, user.is_active), (self.doctor.pk, 'doctor', 'doctor', True))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.place_status(self.place), 200)
+        self.assertFalse([q for q in queries if 'main_customuser' in q['sql']])
+
+    def test_user_save_and_place_changes_clear_cached_context(self):
+        changes = [
+            ('save', lambda: CustomUser.objects.get(pk=self.doctor.pk).save()),
+            ('add', lambda: self.doctor.place.add(self.other)),
+            ('reverse remove', lambda: self.other.customuser_set.remove(self.doctor)),
+            ('clear', lambda: self.doctor.place.clear()),
+        ]
+        for name, change in changes:
+            with self.subTest(name):
+                self.place_status(self.place)
+                self.assertTrue(all(cache.get(key) is not None for key in self.keys))
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+                self.assertEqual(cache.get_many(self.keys), {})
+
+    def test_new_place_is_visible_on_the_next_request(self):
+        self.assertEqual(self.place_status(self.other), 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.place.add(self.other)
+        self.assertEqual(self.place_status(self.other), 200)
+
+
+class BulkTransferViewTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('bulk_transfer')
+        self.other = Place.objects.create(name='Xona 2')
+
+    def post(self, *rows):
+        medicines, sale_types, quantities, places = zip(*rows)
+        return self.client.post(self.url, {
+            'medicines': medicines, 'sale_types': sale_types, 'quantities': quantities, 'places': places,
+        }, follow=True)
+
+    def test_rows_go_to_their_places_in_one_transfer(self):
+        warehouse = self.stock('Paratsetamol', 40, warehouse=True)
+        syrup = self.stock('Sirop', 12, box_quantity=6, warehouse=True)
+        self.login()
+        response = self.post(
+            (warehouse.pk, 'box', 2, self.place.pk),
+            (warehouse.pk, 'unit', 5, self.other.pk),
+            (syrup.pk, 'unit', 4, self.place.pk),
+        )
+        self.assertContains(response, "3 ta qator ko‘chirildi.")
+        self.assertEqual(self.total_units(warehouse), 15)
+        self.assertEqual(self.total_units(syrup), 8)
+        placed = {
+            (medicine.name, medicine.place_id): medicine.total_units
+            for medicine in Medicine.objects.filter(place__isnull=False)
+        }
+        self.assertEqual(placed, {('Paratsetamol', self.place.pk): 20, ('Paratsetamol', self.other.pk): 5,
+                                  ('Sirop', self.place.pk): 4})
+        history = MedicineHistory.objects.filter(to_place__isnull=False).order_by('pk')
+        self.assertEqual(
+            [(h.medicine_id, h.to_place_id, h.quantity, h.action) for h in history],
+            [(warehouse.pk, self.place.pk, 20, '2 quti ko‘chirildi'), (warehouse.pk, self.other.pk, 5, '5 dona ko‘chirildi'),
+             (syrup.pk, self.place.pk, 4, '4 dona ko‘chirildi')],
+        )
+
+    def test_invalid_row_is_reported_by_number(self):
+        warehouse = self.stock('Paratsetamol', 40, warehouse=True)
+        self.login()
+        response = self.post((warehouse.pk, 'box', 1, self.place.pk), (warehouse.pk, 'box', 'x', self.place.pk))
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ["2-qator noto‘g‘ri to‘ldirilgan."])
+        self.assertEqual(self.total_units(warehouse), 40)
+
+    def test_one_short_row_rejects_the_whole_list(self):
+        warehouse = self.stock('Paratsetamol', 40, warehouse=True)
+        syrup = self.stock('Sirop', 3, warehouse=True)
+        self.login()
+        response = self.post((warehouse.pk, 'box', 2, self.place.pk), (syrup.pk, 'unit', 5, self.place.pk))
+        self.assertContains(response, "Sirop uchun yetarli miqdor mavjud emas (5 dona so‘raldi).")
+        self.assertEqual((self.total_units(warehouse), self.total_units(syrup)), (40, 3))
+        self.assertFalse(Medicine.objects.filter(place=self.place).exists())
+        self.assertFalse(MedicineHistory.objects.filter(to_place__isnull=False).exists())
+
+    def test_staff_sends_only_from_own_sklad_to_own_places(self):
+        sklad = Place.objects.create(name='Asosiy_sklad')
+        own = self.stock('Paratsetamol', 20, place=sklad)
+        warehouse = self.stock('Ibuprofen', 20, warehouse=True)
+        self.login('staff', [sklad, self.place])
+        response = self.post((own.pk, 'box', 1, self.other.pk))
+        self.assertContains(response, "1-qator noto‘g‘ri to‘ldirilgan.")
+        response = self.post((warehouse.pk, 'box', 1, self.place.pk))
+        self.assertContains(response, "Dori topilmadi.")
+        response = self.post((own.pk, 'box', 1, self.place.pk))
+        self.assertContains(response, "1 ta qator ko‘chirildi.")
+        self.assertEqual((self.total_units(own), self.total_units(warehouse)), (10, 20))
+
+    def test_oldest_same_name_medicine_is_credited(self):
+        warehouse = self.stock('Paratsetamol', 20, warehouse=True)
+        oldest = self.stock('paratsetamol', 0)
+        newest = self.stock('PARATSETAMOL', 0)
+        self.login()
+        self.post((warehouse.pk, 'unit', 3, self.place.pk), (warehouse.pk, 'box', 1, self.place.pk))
+        self.assertEqual((self.total_units(oldest), self.total_units(newest)), (13, 0))
+        self.assertEqual(Medicine.objects.filter(place=self.place).count(), 2)
+
+    def test_doctors_cannot_transfer(self):
+        self.login('doctor', [self.place])
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('listmedicine'))
+
+
+class ReconciliationTests(StockTestCase):
+    def test_consistent_movements_have_no_discrepancies(self):
+        warehouse = self.stock('Paratsetamol', 40, warehouse=True)
+        medicine = self.stock('Ibuprofen', 25)
+        transfer_stock(self.user, warehouse, self.place, 15, '15 dona ko‘chirildi')
+        bulk_transfer(self.user, Medicine.objects.filter(place=None), [(warehouse.pk, self.place, 1, 'box')])
+        dispense_to_patient(self.user, self.patient, self.place, [(medicine.pk, 7)])
+        self.assertEqual(list(reconcile_stock(batch_size=1)), [])
+
+    def test_manual_edit_is_found_and_corrected(self):
+        medicine = self.stock('Paratsetamol', 20)
+        Medicine.objects.filter(pk=medicine.pk).update(extra_units=3)
+        [item] = reconcile_stock()
+        self.assertEqual((item.medicine_id, item.stock, item.expected, item.difference), (medicine.pk, 23, 20, 3))
+        self.assertEqual(write_corrections(self.user, [item]), 1)
+        self.assertEqual(self.total_units(medicine), 23)
+        self.assertEqual(list(reconcile_stock(batch_size=1)), [])
+
+    def test_place_filter_limits_the_check(self):
+        medicine = self.stock('Paratsetamol', 20)
+        warehouse = self.stock('Ibuprofen', 20, warehouse=True)
+        Medicine.objects.filter(pk__in=[medicine.pk, warehouse.pk]).update(extra_units=5)
+        self.assertEqual([item.medicine_id for item in reconcile_stock([None])], [warehouse.pk])
+        self.assertEqual([item.medicine_id for item in reconcile_stock([self.place.pk])], [medicine.pk])
+
+    def test_command_reports_and_fixes(self):
+        medicine = self.stock('Paratsetamol', 20)
+        Medicine.objects.filter(pk=medicine.pk).update(extra_units=3)
+        out = io.StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn(f"Xona 1 / Paratsetamol (#{medicine.pk}): qoldiq 23, kutilgan 20, farq +3 dona", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('reconcile_stock', '--fix', stdout=io.StringIO())
+        call_command('reconcile_stock', '--fix', '--user', 'admin', stdout=io.StringIO())
+        self.assertEqual(MedicineHistory.objects.get(action='adjusted', medicine=medicine).quantity, 3)
+        out = io.StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn("0 ta mos kelmaslik", out.getvalue())
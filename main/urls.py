@@ -1,9 +1,12 @@
 from django.urls import path
 from .views import (add_staff, allplaces_medicine_list_view, employeeview, give_medicine_to_patient_view, 
                     list_invoices, medicine_by_place_view, medicine_update, patient_invoice_view, 
-                    patient_invoice_view_by_date, transfer_medicine_view, employee_list,login_view,stats_view, 
+                    patient_invoice_view_by_date, transfer_medicine_view, bulk_transfer_view, employee_list,login_view,stats_view, 
                     doctorview,add_medicine_view,medicine_list_view,logout_view,list_patients, add_patient,
-                    medicine_history_view, place_medicine_list_view,delete_patient
+                    medicine_history_view, place_medicine_list_view,delete_patient, invoice_detail_view,
+                    import_medicines_view, export_history_view, export_stock_view, export_sales_view,
+                    patient_search_view, medicine_search_view, place_stock_api, patient_invoices_api,
+                    start_job_view, job_detail_view, job_status_api, job_download_view, stats_chart_api
                     )
 
 urlpatterns = [
@@ -13,7 +16,13 @@ urlpatterns = [
     path('doctorview/', doctorview, name='doctor'),
     path('medicine/add/', add_medicine_view, name='addmedicine'),
     path('medicine/list/', medicine_list_view, name='listmedicine'),
+    path('medicine/import/', import_medicines_view, name='import_medicines'),
     path('medicine/transfer/', transfer_medicine_view, name='givemedicine'),
+    path('medicine/transfer/bulk/', bulk_transfer_view, name='bulk_transfer'),
+    path('medicine/search/', medicine_search_view, name='medicine_search'),
+    path('api/places/<int:place_id>/stock/', place_stock_api, name='api_place_stock'),
+    path('api/patients/<int:patient_id>/invoices/', patient_invoices_api, name='api_patient_invoices'),
+    path('api/stats/chart/', stats_chart_api, name='api_stats_chart'),
     path('medicine/<int:pk>/edit/', medicine_update, name='medicine_update'),
     path('add-staff/', add_staff, name='add_staff'),
     path('employee/', employee_list, name='employee_list'),
@@ -21,6 +30,7 @@ urlpatterns = [
     path('place/<int:place_id>/medicines/',place_medicine_list_view, name='place_medicines'),
     path('patients/add/', add_patient, name='addpatient'),
     path('patients/', list_patients, name='list_patients'),
+    path('patients/search/', patient_search_view, name='patient_search'),
     path('medicine/history/', medicine_history_view, name='medicine_history'),
     path('give-medicine-to-patient/', give_medicine_to_patient_view, name='give_medicine_to_patient'),
     path('invoice/<int:patient_id>/', patient_invoice_view, name='patient_invoice'),
@@ -29,4 +39,12 @@ urlpatterns = [
     path('places/medicines/', allplaces_medicine_list_view, name='all_places_medicines'),
     path('patient/<int:patient_id>/invoices/', list_invoices, name='list_invoices'),
     path('patient/<int:patient_id>/invoice/<str:date_str>/', patient_invoice_view_by_date, name='patient_invoice_view_by_date'),
+    path('invoices/<int:pk>/', invoice_detail_view, name='invoice_detail'),
+    path('export/history/', export_history_view, name='export_history'),
+    path('export/stock/', export_stock_view, name='export_stock'),
+    path('export/sales/', export_sales_view, name='export_sales'),
+    path('jobs/start/', start_job_view, name='start_job'),
+    path('jobs/<int:pk>/', job_detail_view, name='job_detail'),
+    path('jobs/<int:pk>/status/', job_status_api, name='job_status'),
+    path('jobs/<int:pk>/download/', job_download_view, name='job_download'),
 ]
\ No newline at end of file
@@ -0,0 +1,92 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+from main.models import CustomUser, Place
+
+USER_CACHE_TIMEOUT = 5 * 60  # o‘zgarishlar signal bilan tozalanadi; bu faqat yuqori chegara
+# Keshga faqat shu maydonlar yoziladi — parol xeshi va ruxsatlar keshga tushmaydi
+USER_CACHE_FIELDS = (
+    'id', 'username', 'first_name', 'last_name', 'email',
+    'role', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def _context_key(user_id):
+    return f'user_context:{user_id}'
+
+
+def _user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+class UserContext:
+    """
+    Foydalanuvchining roli va joylari (id tartibida): hammasi, `_sklad` joylari va qolganlari.
+    So‘rov davomida bir marta olinadi; joylar ro‘yxati keshda saqlanadi.
+    """
+
+    def __init__(self, role, places):
+        self.role = role
+        self.places = places
+        self.place_ids = [place.pk for place in places]
+        self.sklads = [place for place in places if '_sklad' in place.name.lower()]
+        self.sklad_ids = [place.pk for place in self.sklads]
+        self.others = [place for place in places if place.pk not in self.sklad_ids]
+
+
+def user_context(request):
+    """Joriy foydalanuvchi konteksti (request ga yoziladi — qayta chaqirilsa so‘rov yo‘q)"""
+    context = getattr(request, '_user_context', None)
+    if context is None:
+        user = request.user
+        key = _context_key(user.pk)
+        rows = cache.get(key)
+        if rows is None:
+            rows = list(user.place.order_by('pk').values_list('pk', 'name'))
+            cache.set(key, rows, USER_CACHE_TIMEOUT)
+        context = request._user_context = UserContext(user.role, [Place(pk=pk, name=name) for pk, name in rows])
+    return context
+
+
+def forget_users(user_ids):
+    """Foydalanuvchi yoki uning joylari o‘zgardi — keshdagi konteksti va obyekti tranzaksiyadan keyin o‘chadi"""
+    keys = [key for user_id in set(user_ids) for key in (_context_key(user_id), _user_key(user_id))]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _cached_user(row):
+    """Keshdagi maydonlardan foydalanuvchi (qolgan maydonlar deferred — kerak bo‘lsa bazadan olinadi)"""
+    session_hash = row.pop('session_hash')
+    # from_db qiymatlarni modeldagi maydonlar tartibida kutadi
+    names = [field.attname for field in CustomUser._meta.concrete_fields if field.attname in row]
+    user = CustomUser.from_db('default', names, [row[name] for name in names])
+    # sessiya tekshiruvi parol xeshini so‘ramasin — HMAC ning o‘zi keshda
+    user.get_session_auth_hash = lambda: session_hash
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, lekin sessiyadagi foydalanuvchi keshdan olinadi — har so‘rovdagi
+    foydalanuvchi SELECT i bo‘lmaydi. Keshda faqat USER_CACHE_FIELDS va sessiya
+    HMAC i turadi. CustomUser yoki uning joylari o‘zgarsa kesh tozalanadi.
+    """
+
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        row = cache.get(key)
+        if row is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            row = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+            row['session_hash'] = user.get_session_auth_hash()
+            cache.set(key, row, USER_CACHE_TIMEOUT)
+        return _cached_user(dict(row))
+
+    async def aget_user(self, user_id):
+        # ModelBackend.aget_user keshni chetlab o‘tadi (request.auser() uchun)
+        return await sync_to_async(self.get_user)(user_id)
@@ -1,15 +1,52 @@
-from django.http import HttpResponseForbidden
+import os
+from collections import defaultdict
+
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from main.models import Medicine, CustomUser, MedicineHistory, Patient, PatientMedicine, Place
+from main.models import BackgroundJob, Invoice, Medicine, CustomUser, MedicineHistory, Patient, PatientMedicine, Place, StockLot
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib import messages
 from django.utils import timezone
 from decimal import Decimal
 from datetime import timedelta,datetime
-from django.db.models import Sum,Count,DecimalField,ExpressionWrapper, IntegerField,F
-from django.db.models.functions import TruncMinute
-from django.db import transaction
+from django.db.models import Sum,Count,Max,Prefetch
+from django.views.decorators.http import condition, require_safe
+from main.exports import export_response, export_rows, filter_history, int_param, parse_date
+from main.importer import StockImportError, import_medicines
+from main.jobs import enqueue, job_title
+from main.pagination import keyset_paginate
+from main.services import (StockError, bulk_transfer, dispense_to_patient, sync_lots, transfer_action,
+                           transfer_stock)
+from main.user_context import user_context
+from main.stats import CHART_BUCKETS, chart_bucket, chart_series, patients_count, period_totals
+from main.stock_cache import place_stock_fragments, place_version
+
+HISTORY_PAGE_SIZE = 50
+
+# Dashboarddan fonda ishga tushiriladigan hisobotlar: forma qiymati -> (vazifa turi, parametrlar)
+BACKGROUND_REPORTS = {
+    'history': ('export', {'report': 'history'}),
+    'stock': ('export', {'report': 'stock'}),
+    'sales': ('export', {'report': 'sales'}),
+    'daily_stats': ('rebuild_daily_stats', {}),
+}
+BACKGROUND_REPORT_TITLES = [
+    ('history', "Dori tarixi"),
+    ('sales', "Sotuvlar"),
+    ('stock', "Qoldiq"),
+    ('daily_stats', "Statistikani qayta qurish"),
+]
+
+def _recent_jobs(user):
+    if user.role != 'admin':
+        return []
+    titles = dict(BACKGROUND_REPORT_TITLES)
+    jobs = list(BackgroundJob.objects.filter(created_by=user)[:5])
+    for job in jobs:
+        job.title = titles.get(job.params.get('report'), job_title(job.kind))
+    return jobs
 
 @login_required
 def stats_view(request):
@@ -39,41 +76,24 @@ def stats_view(request):
         # 🔹 Default 30 kun
         start_date = today - timedelta(days=30)
         end_date = today
-    # 🔹 Statistikalar
-    incoming = Medicine.objects.filter(
-        created_at__date__range=(start_date, end_date)
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    used = PatientMedicine.objects.filter(
-        date__date__range=(start_date, end_date)
-    ).annotate(
-        total_quantity=ExpressionWrapper(
-            F('boxes_given') * F('medicine__box_quantity') + F('units_given'),
-            output_field=IntegerField()
-        )
-    ).aggregate(total=Sum('total_quantity'))['total'] or 0
-    transferred = MedicineHistory.objects.filter(
-        action='transferred',
-        created_at__date__range=(start_date, end_date)
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    remaining = Medicine.objects.aggregate(
-        total=Sum('quantity')
-    )['total'] or 0
-    new_patients = Patient.objects.filter(
-        created_at__date__range=(start_date, end_date)
-    ).count()
-    history = MedicineHistory.objects.filter(
-        created_at__date__range=(start_date, end_date)
-    ).select_related('medicine', 'user', 'to_user', 'to_place').order_by('-created_at')
+    # 🔹 Yig'ma statistika (DailyStat) — davr uzunligidan qat'i nazar bitta so'rov.
+    # Xom tarix jadvali o'rniga grafik ixcham qatorlarni api_stats_chart dan oladi
+    # (to‘liq tarix kursorli sahifada)
+    totals = period_totals(start_date, end_date)
+    remaining = Medicine.objects.aggregate(total=Sum('quantity'))['total'] or 0
     context = {
-        'incoming': incoming,
-        'used': used,
-        'transferred': transferred,
+        'incoming': totals['incoming'],
+        'used': totals['used'],
+        'transferred': totals['transferred'],
         'remaining': remaining,
-        'new_patients': new_patients,
+        'new_patients': totals['new_patients'],
         'start_date': start_date,
         'end_date': end_date,
         'period': period,
-        'history': history
+        'places': Place.objects.only('id', 'name'),
+        # Fonda tayyorlanayotgan/tayyor hisobotlar (faqat admin uchun)
+        'jobs': _recent_jobs(request.user),
+        'background_reports': BACKGROUND_REPORT_TITLES,
     }
     return render(request, 'admindashboard.html', context)
 
@@ -81,19 +101,13 @@ def stats_view(request):
 def doctorview(request):
     user = request.user
     if user.role == "doctor":
-        # faqat o'z joylari
-        places = user.place.all()
+        # faqat o'z joylari (so'rov/kesh bo'yicha bir marta olinadi)
+        places = user_context(request).places
     else:
         # admin yoki boshqa rollar hamma joylarni ko'radi
         places = Place.objects.all()
-    # Har bir place uchun tegishli dorilarni yig'amiz
-    place_medicines = []
-    for place in places:
-        medicines = Medicine.objects.filter(place=place)
-        place_medicines.append({
-            'place': place,
-            'medicines': medicines
-        })
+    # Joylar jadvallari keshdan; o'zgargan joylar dorilari bitta so'rovda olinadi
+    place_medicines = place_stock_fragments(places, 'partials/stock_doctor.html')
     return render(request, 'doctor.html', {'place_medicines': place_medicines})
 
 @login_required
@@ -131,6 +145,13 @@ def add_medicine_view(request):
             expiry_date=expiry_date,
             owner=request.user,
         )
+        # Kelgan qoldiq — bitta partiya (seriya raqami ixtiyoriy)
+        StockLot.objects.create(
+            medicine=medicine,
+            batch=request.POST.get('batch', '').strip()[:50],
+            expiry_date=expiry_date,
+            units=quantity * box_quantity,
+        )
         # Tarixga yozamiz
         MedicineHistory.objects.create(
             medicine=medicine,
@@ -141,52 +162,100 @@ def add_medicine_view(request):
         return redirect('listmedicine')
     return render(request, 'addmedicine.html')
 
+@login_required
+def import_medicines_view(request):
+    if request.user.role != 'admin':
+        return HttpResponseForbidden("Faqat admin foydalanuvchilar kirishi mumkin.")
+    places = Place.objects.all()
+    context = {'places': places}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        place_id = request.POST.get('place')
+        place = get_object_or_404(Place, id=place_id) if place_id else None
+        if not upload:
+            context['error'] = "Fayl tanlanmagan!"
+            return render(request, 'import_medicines.html', context)
+        try:
+            context['result'] = import_medicines(upload.file, upload.name, request.user, place)
+        except StockImportError as exc:
+            context['error'] = str(exc)
+    return render(request, 'import_medicines.html', context)
+
 @login_required
 def medicine_list_view(request):
-    medicines = Medicine.objects.filter(place__isnull=True).order_by('-created_at')
+    medicines = Medicine.objects.filter(place__isnull=True).with_pricing().order_by('-created_at')
     return render(request, 'listmedicine.html', {'medicines': medicines})
 
 @login_required
 def place_medicine_list_view(request, place_id):
     place = get_object_or_404(Place, id=place_id)
-    medicines = Medicine.objects.filter(place=place).order_by('-created_at')
-    return render(request, 'place_medicine_list.html', {'place': place, 'medicines': medicines})
+    [block] = place_stock_fragments([place], 'partials/stock_place_list.html')
+    return render(request, 'place_medicine_list.html', {'place': place, 'stock_html': block['html']})
+
+NEAR_EXPIRY_DAYS = 30
 
 @login_required
 def allplaces_medicine_list_view(request):
     if request.user.role != 'admin':
         return HttpResponseForbidden("Faqat admin foydalanuvchilar kirishi mumkin.")
-    # Barcha joylar va har bir joy uchun dorilarni ajratib chiqaramiz
-    places = Place.objects.all().prefetch_related('medicine_set')
+    places = list(Place.objects.only('id', 'name'))
+    expiring_before = timezone.localdate() + timedelta(days=NEAR_EXPIRY_DAYS)
+    # Joylar jadvallari keshdan (versiyasi o'zgarganlari faqat kerakli ustunlar bilan qayta render qilinadi),
+    # yig'ma qatorlar esa bitta guruhlangan so'rovdan
+    blocks = place_stock_fragments(places, 'partials/stock_all_places.html')
+    summaries = Medicine.objects.place_summaries(places, expiring_before)
+    empty = {'skus': 0, 'total_units': 0, 'stock_value': 0, 'expiring': 0}
+    for block in blocks:
+        block['summary'] = summaries.get(block['place'].pk, empty)
+    totals = {field: sum(block['summary'][field] for block in blocks) for field in empty}
     return render(request, 'all_place_medicines.html', {
-        'places': places
+        'places': blocks,
+        'totals': totals,
+        'near_expiry_days': NEAR_EXPIRY_DAYS,
     })
 
-@login_required
-def transfer_medicine_view(request):
-    user_role = request.user.role
-    if user_role == "admin":
-        # Admin umumiy skladdan (place=None) chiqaradi
-        source_medicines = Medicine.objects.filter(place__isnull=True)
-        destinations = Place.objects.all()  # Admin istalgan joyga chiqaradi
+MEDICINE_SEARCH_LIMIT = 20
 
-    elif user_role == "staff":
-        # Staffning barcha joylari
-        user_places = request.user.place.all()
+def _transfer_scope(request):
+    """Foydalanuvchi chiqara oladigan dorilar va qabul qiluvchi joylar (ruxsat bo‘lmasa None)"""
+    context = user_context(request)
+    if context.role == "admin":
+        # Admin umumiy skladdan (place=None) chiqaradi, istalgan joyga
+        return Medicine.objects.filter(place__isnull=True), Place.objects.all()
+    if context.role == "staff":
+        # Staff faqat skladdagi joylaridan chiqaradi, qolgan joylariga
+        return Medicine.objects.filter(place_id__in=context.sklad_ids), context.others
+    return None
 
-        # Staff faqat skladdagi joylaridan dori chiqarishi mumkin
-        staff_sklads = user_places.filter(name__icontains="_sklad")
-        source_medicines = Medicine.objects.filter(place__in=staff_sklads)
-
-        # Joy tanlashda esa staffning boshqa joylari chiqadi (sklad emas)
-        destinations = user_places.exclude(name__icontains="_sklad")
+@login_required
+def medicine_search_view(request):
+    """Transfer formasi uchun typeahead: foydalanuvchi manba joylaridagi dorilar, id va qoldiq bilan"""
+    scope = _transfer_scope(request)
+    query = request.GET.get('q', '').strip()
+    if scope is None or not query:
+        return JsonResponse({'results': []})
+    medicines = scope[0].search(query).with_stock().order_by('name_key').values(
+        'id', 'name', 'category', 'box_quantity', 'quantity', 'extra_units', 'total_units'
+    )[:MEDICINE_SEARCH_LIMIT]
+    results = [
+        {
+            **medicine,
+            'text': f"{medicine['name']} ({medicine['category']}) - {medicine['quantity']} quti "
+                    f"({medicine['total_units']} dona)",
+        }
+        for medicine in medicines
+    ]
+    return JsonResponse({'results': results})
 
-    else:
+@login_required
+def transfer_medicine_view(request):
+    scope = _transfer_scope(request)
+    if scope is None:
         messages.error(request, "Sizda dori chiqarishga ruxsat yo‘q.")
         return redirect('listmedicine')
+    source_medicines, destinations = scope
 
     if request.method == 'POST':
-        medicine_name = request.POST.get('name', '').strip()
         sale_type = request.POST.get('sale_type')
 
         try:
@@ -200,13 +269,12 @@ def transfer_medicine_view(request):
         dest_id = request.POST.get('place')
         destination_place = get_object_or_404(Place, id=dest_id)
 
-        # Manbadan dorini topamiz
-        source_medicine = source_medicines.filter(
-            name__iexact=medicine_name
-        ).first()
+        # Manbadagi dori id bo‘yicha (faqat foydalanuvchi ruxsat etilgan joylardan)
+        medicine_id = int_param(request.POST, 'medicine')
+        source_medicine = source_medicines.filter(pk=medicine_id).first() if medicine_id else None
 
         if not source_medicine:
-            messages.error(request, f"{medicine_name} dorisi topilmadi.")
+            messages.error(request, "Dori topilmadi.")
             return redirect('givemedicine')
 
         # Transferni hisoblaymiz
@@ -220,63 +288,160 @@ def transfer_medicine_view(request):
         if source_medicine.total_units < transfer_units:
             return redirect('givemedicine')
 
-        with transaction.atomic():
-            # Manbadan ayiramiz
-            new_src_total = source_medicine.total_units - transfer_units
-            source_medicine.quantity = new_src_total // source_medicine.box_quantity
-            source_medicine.extra_units = new_src_total % source_medicine.box_quantity
-            source_medicine.save()
-
-            # Qabul qiluvchiga qo‘shamiz
-            dest_medicine = Medicine.objects.filter(
-                name__iexact=medicine_name,
-                place=destination_place
-            ).first()
-
-            if dest_medicine:
-                new_total = dest_medicine.total_units + transfer_units
-                dest_medicine.quantity = new_total // dest_medicine.box_quantity
-                dest_medicine.extra_units = new_total % dest_medicine.box_quantity
-                dest_medicine.save()
-            else:
-                dest_qty = transfer_units // source_medicine.box_quantity
-                dest_extra = transfer_units % source_medicine.box_quantity
-                Medicine.objects.create(
-                    name=source_medicine.name,
-                    category=source_medicine.category,
-                    generic_name=source_medicine.generic_name,
-                    weight=source_medicine.weight,
-                    price=source_medicine.price,
-                    quantity=dest_qty,
-                    extra_units=dest_extra,
-                    box_quantity=source_medicine.box_quantity,
-                    expiry_date=source_medicine.expiry_date,
-                    place=destination_place,
-                )
-
-            # Tarixga yozamiz
-            action_text = f"{quantity} {'quti' if sale_type == 'box' else 'dona'} ko‘chirildi"
-            MedicineHistory.objects.create(
-                medicine=source_medicine,
-                user=request.user,
-                to_place=destination_place,
-                quantity=transfer_units,
-                action=action_text
-            )
-        if user_role == "staff":
+        # Ombor bazada F() orqali shartli yangilanadi (parallel so'rovlarda yo'qotishsiz)
+        try:
+            transfer_stock(request.user, source_medicine, destination_place, transfer_units,
+                           transfer_action(quantity, sale_type))
+        except StockError:
+            messages.error(request, f"{source_medicine.name} uchun yetarli miqdor mavjud emas.")
+            return redirect('givemedicine')
+        if request.user.role == "staff":
             return redirect('employee')
         return redirect('listmedicine')
 
     return render(request, 'givemedicine.html', {
-        'medicines': source_medicines,
         'places': destinations,
     })
 
 
+@login_required
+def bulk_transfer_view(request):
+    """Terma ro‘yxat: bir nechta dori, har biri o‘z joyiga — bitta tranzaksiyada ko‘chiriladi"""
+    scope = _transfer_scope(request)
+    if scope is None:
+        messages.error(request, "Sizda dori chiqarishga ruxsat yo‘q.")
+        return redirect('listmedicine')
+    source_medicines, destinations = scope
+    places = {place.pk: place for place in destinations}
+
+    if request.method == 'POST':
+        rows = zip(
+            request.POST.getlist('medicines'),
+            request.POST.getlist('sale_types'),
+            request.POST.getlist('quantities'),
+            request.POST.getlist('places'),
+        )
+        lines = []
+        for number, (med_id, sale_type, quantity, place_id) in enumerate(rows, 1):
+            try:
+                med_id, quantity, place_id = int(med_id), int(quantity), int(place_id)
+            except (ValueError, TypeError):
+                med_id = None
+            if med_id is None or quantity <= 0 or sale_type not in ('box', 'unit') or place_id not in places:
+                messages.error(request, f"{number}-qator noto‘g‘ri to‘ldirilgan.")
+                return redirect('bulk_transfer')
+            lines.append((med_id, places[place_id], quantity, sale_type))
+        if not lines:
+            return redirect('bulk_transfer')
+        try:
+            history = bulk_transfer(request.user, source_medicines, lines)
+        except StockError as error:
+            for medicine, units in error.rejected:
+                if isinstance(medicine, Medicine):
+                    messages.error(request, f"{medicine.name} uchun yetarli miqdor mavjud emas ({units} dona so‘raldi).")
+                else:
+                    messages.error(request, "Dori topilmadi.")
+            if not error.rejected:
+                messages.error(request, "Dori qoldig‘i o‘zgardi, qaytadan urinib ko‘ring.")
+            return redirect('bulk_transfer')
+        messages.success(request, f"{len(history)} ta qator ko‘chirildi.")
+        return redirect('bulk_transfer')
+
+    return render(request, 'bulk_transfer.html', {
+        'places': places.values(),
+    })
+
+
 @login_required
 def medicine_history_view(request):
-    history = MedicineHistory.objects.select_related('medicine', 'user', 'to_user').order_by('-created_at')
-    return render(request, 'medicine_history.html', {'history': history})
+    history, filters = filter_history(request.GET)
+    page = keyset_paginate(
+        history,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=HISTORY_PAGE_SIZE,
+    )
+    return render(request, 'medicine_history.html', {
+        'history': page,
+        'filters': filters,
+        'places': Place.objects.all(),
+        'users': CustomUser.objects.only('id', 'username', 'first_name', 'last_name'),
+    })
+
+def _export_view(request, report):
+    if request.user.role != 'admin':
+        return HttpResponseForbidden("Faqat admin foydalanuvchilar kirishi mumkin.")
+    filename, header, rows = export_rows(report, request.GET)
+    # Sinxron faqat CSV oqimi; Excel start_job_view orqali fonda tayyorlanadi
+    return export_response(filename, header, rows)
+
+@login_required
+def export_history_view(request):
+    return _export_view(request, 'history')
+
+@login_required
+def export_stock_view(request):
+    return _export_view(request, 'stock')
+
+@login_required
+def export_sales_view(request):
+    return _export_view(request, 'sales')
+
+
+@login_required
+def start_job_view(request):
+    if request.user.role != 'admin':
+        return HttpResponseForbidden("Faqat admin foydalanuvchilar kirishi mumkin.")
+    if request.method != 'POST' or request.POST.get('report') not in BACKGROUND_REPORTS:
+        return redirect('dashboard_stats')
+    kind, params = BACKGROUND_REPORTS[request.POST['report']]
+    if kind == 'export':
+        params = {
+            **params,
+            'format': request.POST.get('format') or 'csv',
+            'filters': {key: value for key, value in request.POST.items()
+                        if key not in ('csrfmiddlewaretoken', 'report', 'format') and value},
+        }
+    job = enqueue(kind, params, user=request.user)
+    messages.success(request, f"Vazifa #{job.pk} navbatga qo‘yildi. Tayyor bo‘lgach yuklab olishingiz mumkin.")
+    return redirect('job_detail', pk=job.pk)
+
+def _job_for(request, pk):
+    if request.user.role != 'admin':
+        raise Http404
+    return get_object_or_404(BackgroundJob, pk=pk)
+
+def _job_payload(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'title': job_title(job.kind),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+        'download_url': reverse('job_download', args=[job.pk]) if job.result_file else None,
+    }
+
+@login_required
+def job_detail_view(request, pk):
+    job = _job_for(request, pk)
+    return render(request, 'job_detail.html', {'job': job, 'payload': _job_payload(job)})
+
+@require_safe
+@login_required
+def job_status_api(request, pk):
+    # Sahifa shu manzilni so‘rab turadi (polling), vazifa tugaguncha
+    return JsonResponse(_job_payload(_job_for(request, pk)))
+
+@login_required
+def job_download_view(request, pk):
+    job = _job_for(request, pk)
+    if job.status != 'done' or not job.result_file:
+        raise Http404
+    return FileResponse(job.result_file.open('rb'), as_attachment=True,
+                        filename=os.path.basename(job.result_file.name))
 
 User = get_user_model()
 
@@ -322,21 +487,15 @@ def employee_list(request):
 def employeeview(request):
     user = request.user
     if user.role == "staff":
-        places = list(user.place.all())  # Queryset → list
+        places = list(user_context(request).places)
     else:
         places = list(Place.objects.all())
 
     # "Zulayho_sklad"ni birinchi qilish
     places.sort(key=lambda p: (not p.name.endswith("_sklad"), p.name))
 
-    # Har bir place uchun tegishli dorilarni yig'amiz
-    place_medicines = []
-    for place in places:
-        medicines = Medicine.objects.filter(place=place)
-        place_medicines.append({
-            'place': place,
-            'medicines': medicines
-        })
+    # Joylar jadvallari keshdan; o'zgargan joylar dorilari bitta so'rovda olinadi
+    place_medicines = place_stock_fragments(places, 'partials/stock_employee.html')
 
     return render(request, 'employee.html', {
         'place_medicines': place_medicines
@@ -359,10 +518,42 @@ def add_patient(request):
         return redirect('list_patients')  
     return render(request, 'addpatient.html')
 
+PATIENT_PAGE_SIZE = 50
+PATIENT_SEARCH_LIMIT = 20
+
 @login_required
 def list_patients(request):
-    patients = Patient.objects.all()
-    return render(request, 'listpatient.html', {'patients': patients})
+    query = request.GET.get('q', '').strip()
+    if query:
+        patients = list(Patient.objects.search(query).order_by('name_key', 'surname_key')[:PATIENT_PAGE_SIZE])
+        next_after = None
+    else:
+        # Eng yangi bemorlar, id bo'yicha kursorli sahifalash
+        patients = Patient.objects.order_by('-id')
+        after = int_param(request.GET, 'after')
+        if after:
+            patients = patients.filter(id__lt=after)
+        patients = list(patients[:PATIENT_PAGE_SIZE + 1])
+        next_after = patients[PATIENT_PAGE_SIZE - 1].id if len(patients) > PATIENT_PAGE_SIZE else None
+        patients = patients[:PATIENT_PAGE_SIZE]
+    return render(request, 'listpatient.html', {
+        'patients': patients,
+        'patients_count': patients_count(),
+        'query': query,
+        'next_after': next_after,
+    })
+
+@login_required
+def patient_search_view(request):
+    """Typeahead uchun JSON: ?q=ism/familiya/telefon boshlanishi"""
+    query = request.GET.get('q', '').strip()
+    patients = Patient.objects.search(query).order_by('name_key', 'surname_key').values(
+        'id', 'name', 'surname', 'phone'
+    )[:PATIENT_SEARCH_LIMIT] if query else []
+    return JsonResponse({'results': [
+        {**patient, 'text': f"{patient['name']} {patient['surname']} ({patient['phone']})"}
+        for patient in patients
+    ]})
 
 def login_view(request):
     if request.method == 'POST':
@@ -391,79 +582,53 @@ def logout_view(request):
 def give_medicine_to_patient_view(request):
     if request.user.role != 'doctor':
         messages.error(request, "Sizda dori yozishga ruxsat yo'q.")
-        return redirect('home')
-    user_places = request.user.place.all()
-    selected_place = user_places.first()
-    patients = Patient.objects.all()
+        return redirect('listmedicine')
+    user_places = user_context(request).places
+    selected_place = user_places[0] if user_places else None
+    if selected_place is None:
+        # Joysiz shifokor uchun place=None umumiy sklad bo‘lib qoladi — forma qabul qilinmaydi
+        return render(request, 'give_medicine_to_patient.html', {
+            'medicines': [],
+            'error': "Sizga joy biriktirilmagan, dori yozib bo‘lmaydi. Administratorga murojaat qiling.",
+        })
     if request.method == 'POST':
         patient_id = request.POST.get('patient')
         medicine_ids = request.POST.getlist('medicines')
         quantities = request.POST.getlist('quantities')
         patient = get_object_or_404(Patient, id=patient_id)
-        now_time = timezone.localtime(timezone.now())
-        for i, med_id in enumerate(medicine_ids):
-            quantity = int(quantities[i])  # jami so‘ralgan dona
-            medicine = get_object_or_404(Medicine, id=med_id, place=selected_place)
-            # Yetarli umumiy dona borligini tekshirish
-            if medicine.total_units < quantity:
-                messages.error(request, f"{medicine.name} uchun yetarli miqdor mavjud emas.")
+        lines = []
+        for med_id, quantity in zip(medicine_ids, quantities):
+            try:
+                med_id, quantity = int(med_id), int(quantity)  # jami so‘ralgan dona
+            except (ValueError, TypeError):
                 continue
-            # Quti va dona bo‘yicha hisoblash
-            boxes_to_deduct, remainder_units = divmod(quantity, medicine.box_quantity)
-            # Agar qutidan yechib bo‘lsa
-            if boxes_to_deduct > medicine.quantity:
-                boxes_to_deduct = medicine.quantity
-                remainder_units = quantity - boxes_to_deduct * medicine.box_quantity
-            # ➤ Bemor uchun yozib qo‘yish
-            PatientMedicine.objects.create(
-                patient=patient,
-                medicine=medicine,
-                boxes_given=boxes_to_deduct,
-                units_given=remainder_units,
-                prescribed_by=request.user,
-                date=now_time
-            )
-            # ➤ Omborni yangilash
-            medicine.quantity -= boxes_to_deduct
-            if remainder_units > 0:
-                if remainder_units <= medicine.extra_units:
-                    # faqat qoldiq donalardan kamaytirish
-                    medicine.extra_units -= remainder_units
-                else:
-                    # qoldiq yetmasa -> 1 quti ochib, qoldiqni yangilash
-                    if medicine.quantity > 0:
-                        medicine.quantity -= 1
-                        needed_from_new_box = remainder_units - medicine.extra_units
-                        medicine.extra_units = medicine.box_quantity - needed_from_new_box
-                    else:
-                        messages.error(request, f"{medicine.name} uchun yetarli dona mavjud emas.")
-                        continue
-            medicine.save()
-            # ➤ Tarixga yozish
-            MedicineHistory.objects.create(
-                medicine=medicine,
-                user=request.user,
-                to_patient=patient,
-                quantity=quantity,
-                action='Bemorga chiqarildi',
-            )
-        return redirect(
-            'patient_invoice_view_by_date',
-            patient_id=patient.id,
-            date_str=now_time.strftime("%Y-%m-%d_%H-%M")
-        )
+            if quantity > 0:
+                lines.append((med_id, quantity))
+        # Butun retsept bitta tranzaksiyada: qulflash, bitta UPDATE va bulk_create
+        try:
+            invoice, rejected = dispense_to_patient(request.user, patient, selected_place, lines)
+        except StockError:
+            messages.error(request, "Dori qoldig‘i o‘zgardi, qaytadan urinib ko‘ring.")
+            return redirect('give_medicine_to_patient')
+        for medicine, _ in rejected:
+            if isinstance(medicine, Medicine):
+                messages.error(request, f"{medicine.name} uchun yetarli miqdor mavjud emas.")
+            else:
+                messages.error(request, "Dori topilmadi.")
+        if invoice is None:
+            return redirect('list_invoices', patient_id=patient.id)
+        return redirect('invoice_detail', pk=invoice.pk)
     medicines = Medicine.objects.filter(place=selected_place)
     return render(request, 'give_medicine_to_patient.html', {
-        'patients': patients,
         'medicines': medicines
     })
 
 @login_required
 def patient_invoice_view(request, patient_id):
     patient = get_object_or_404(Patient, id=patient_id)
-    prescriptions = PatientMedicine.objects.filter(patient=patient)
-    # jami narx
-    subtotal = sum(p.total_price for p in prescriptions)
+    prescriptions = PatientMedicine.objects.filter(patient=patient).with_pricing().select_related('prescribed_by')
+    # jami narx (chiqarilgan paytdagi saqlangan narxlar bo'yicha)
+    subtotal = prescriptions.aggregate(total=Sum('total_price'))['total'] or Decimal("0")
     processing_fee = Decimal("10.00")
     tax = subtotal * Decimal("0.10")
     total = subtotal #+ processing_fee + tax
@@ -490,79 +655,153 @@ def delete_patient(request, pk):
 
 @login_required
 def medicine_by_place_view(request):
-    places = Place.objects.all()
-    data = []
-    for place in places:
-        # Ushbu joyga biriktirilgan foydalanuvchilar (rahbarlar)
-        leaders = CustomUser.objects.filter(place=place)
-        # Ushbu joy uchun dorilarni topamiz
-        medicines = Medicine.objects.filter(owner__place=place)
-        data.append({
-            'place': place,
-            'leaders': leaders,
-            'medicines': medicines,
-        })
+    # Joylar soni qancha bo'lmasin, so'rovlar soni o'zgarmas: joylar, rahbarlar (bitta M2M prefetch)
+    # va joy bo'yicha guruhlangan dori jamlari (bitta GROUP BY)
+    places = Place.objects.order_by('name').prefetch_related(Prefetch(
+        'customuser_set',
+        queryset=CustomUser.objects.only('id', 'username', 'first_name', 'last_name').order_by('username'),
+        to_attr='leaders',
+    ))
+    categories = dict(Medicine.CATEGORY_CHOICES)
+    medicines = defaultdict(list)
+    for row in Medicine.objects.totals_by_place():
+        row['category_display'] = categories.get(row['category'], row['category'] or '—')
+        medicines[row['place_id']].append(row)
+    data = [
+        {'place': place, 'leaders': place.leaders, 'medicines': medicines.get(place.pk, [])}
+        for place in places
+    ]
     return render(request, 'medicine_by_place.html', {'data': data})
 
 @login_required
 def list_invoices(request, patient_id):
     patient = get_object_or_404(Patient, id=patient_id)
-    invoices = (
-        PatientMedicine.objects
-        .filter(patient=patient)
-        .annotate(chek_sana=TruncMinute('date'))
-        .values('chek_sana')
-        .annotate(
-            total=Sum(
-                ExpressionWrapper(
-                    # Umumiy narx: (quti * qutidagi dona + dona) * (quti narxi / qutidagi dona)
-                    (F('boxes_given') * F('medicine__box_quantity') + F('units_given'))
-                    * (F('medicine__price') / F('medicine__box_quantity')),
-                    output_field=DecimalField(max_digits=12, decimal_places=2)
-                )
-            ),
-            items_count=Count('id')
-        )
-        .order_by('-chek_sana')
-    )
-    # datetime → string formatlash
-    for inv in invoices:
-        inv['date_str'] = inv['chek_sana'].strftime('%Y-%m-%d_%H-%M')
+    # Summalar Invoice ichida saqlangan, (patient, created_at) indeksi bo'yicha o'qiladi
+    invoices = patient.invoices.annotate(items_count=Count('lines'))
     return render(request, 'invoice_list.html', {
         'patient': patient,
         'invoices': invoices
     })
 
+def _stock_etag(request, place_id):
+    # Joy versiyasi keshda — 304 javobi uchun bazaga so'rov yuborilmaydi
+    return f"stock-{place_id}-{place_version(place_id)}"
+
+@condition(etag_func=_stock_etag)
+def _place_stock_json(request, place_id):
+    medicines = Medicine.objects.filter(place_id=place_id).order_by('name_key').values(
+        'id', 'name', 'category', 'price', 'box_quantity', 'quantity', 'extra_units', 'expiry_date'
+    )
+    results = []
+    for med in medicines:
+        box_quantity = med['box_quantity'] or 1
+        results.append({
+            **med,
+            'total_units': med['quantity'] * med['box_quantity'] + med['extra_units'],
+            'unit_price': (med['price'] / box_quantity).quantize(Decimal('0.01')),
+        })
+    return JsonResponse({'place': place_id, 'results': results})
+
+@require_safe
 @login_required
-def patient_invoice_view_by_date(request, patient_id, date_str):
+def place_stock_api(request, place_id):
+    """Joy qoldig'i JSON ko'rinishida; ETag bilan shartli GET (o'zgarmagan bo'lsa 304)"""
+    if request.user.role != 'admin' and place_id not in user_context(request).place_ids:
+        return HttpResponseForbidden("Bu joyga ruxsat yo‘q.")
+    return _place_stock_json(request, place_id)
+
+def _invoices_marker(request, patient_id):
+    # ETag va Last-Modified bitta agregat so'rovdan (so'rov davomida bir marta)
+    if not hasattr(request, '_invoices_marker'):
+        request._invoices_marker = Invoice.objects.filter(patient_id=patient_id).aggregate(
+            count=Count('id'), last=Max('id'), latest=Max('created_at')
+        )
+    return request._invoices_marker
+
+def _invoices_etag(request, patient_id):
+    marker = _invoices_marker(request, patient_id)
+    return f"invoices-{patient_id}-{marker['count']}-{marker['last'] or 0}"
+
+def _invoices_latest(request, patient_id):
+    # Chek yaratilgach o'zgarmaydi — eng oxirgi chek vaqti ro'yxatning o'zgarish vaqti
+    return _invoices_marker(request, patient_id)['latest']
+
+@require_safe
+@login_required
+@condition(etag_func=_invoices_etag, last_modified_func=_invoices_latest)
+def patient_invoices_api(request, patient_id):
+    """Bemor cheklari JSON ko'rinishida; ETag/Last-Modified bilan shartli GET"""
     patient = get_object_or_404(Patient, id=patient_id)
-    invoice_datetime = datetime.strptime(date_str, "%Y-%m-%d_%H-%M")
-    start_time = invoice_datetime
-    end_time = invoice_datetime + timedelta(minutes=1)
-    prescriptions = PatientMedicine.objects.filter(
-        patient=patient,
-        date__gte=start_time,
-        date__lt=end_time
+    invoices = patient.invoices.annotate(items_count=Count('lines')).values(
+        'id', 'number', 'created_at', 'subtotal', 'place__name', 'items_count'
+    )
+    return JsonResponse({'patient': patient.id, 'results': list(invoices)})
+
+@require_safe
+@login_required
+def stats_chart_api(request):
+    """
+    Dashboard grafigi uchun davrlar bo‘yicha qatorlar (kelgan/chiqarilgan/o‘tkazilgan dona va summa).
+    Parametrlar: start_date, end_date, bucket (day/week/month), place, medicine.
+    """
+    if request.user.role != 'admin':
+        return HttpResponseForbidden("Faqat admin foydalanuvchilar kirishi mumkin.")
+    today = timezone.localdate()
+    end_date = parse_date(request.GET.get('end_date')) or today
+    start_date = parse_date(request.GET.get('start_date')) or end_date - timedelta(days=30)
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    bucket = request.GET.get('bucket')
+    if bucket not in CHART_BUCKETS:
+        bucket = chart_bucket(start_date, end_date)
+    series = chart_series(
+        start_date, end_date, bucket,
+        place_id=int_param(request.GET, 'place'), medicine_id=int_param(request.GET, 'medicine'),
     )
-    subtotal = sum(p.total_price for p in prescriptions)
+    return JsonResponse({
+        'start_date': start_date, 'end_date': end_date, 'bucket': bucket, 'series': series,
+    })
+
+@login_required
+def invoice_detail_view(request, pk):
+    invoice = get_object_or_404(Invoice.objects.select_related('patient', 'doctor', 'place'), pk=pk)
+    prescriptions = invoice.lines.with_pricing()
     processing_fee = Decimal("10.00")
-    tax = subtotal * Decimal("0.10")
-    total = subtotal
-    first_prescription = prescriptions.first()
-    prescribed_by = first_prescription.prescribed_by if first_prescription else None
+    tax = invoice.subtotal * Decimal("0.10")
+    total = invoice.subtotal
     context = {
-        'patient': patient,
+        'invoice': invoice,
+        'patient': invoice.patient,
         'prescriptions': prescriptions,
-        'created_at': invoice_datetime,
-        'invoice_number': f"INV{patient.id:06d}",
-        'subtotal': f"{subtotal:.2f}",
+        'created_at': invoice.created_at,
+        'invoice_number': invoice.number,
+        'subtotal': f"{invoice.subtotal:.2f}",
         'processing_fee': f"{processing_fee:.2f}",
         'tax': f"{tax:.2f}",
         'total': f"{total:.2f}",
-        'prescribed_by': prescribed_by,
+        'prescribed_by': invoice.doctor,
+        'place': invoice.place,
     }
     return render(request, 'patient_detail.html', context)
 
+@login_required
+def patient_invoice_view_by_date(request, patient_id, date_str):
+    # Eski havolalar uchun: shu daqiqadagi chekka yo'naltiramiz
+    try:
+        invoice_datetime = timezone.make_aware(datetime.strptime(date_str, "%Y-%m-%d_%H-%M"))
+    except ValueError:
+        raise Http404
+    invoice = (
+        Invoice.objects
+        .filter(patient_id=patient_id, created_at__gte=invoice_datetime,
+                created_at__lt=invoice_datetime + timedelta(minutes=1))
+        .order_by('created_at')
+        .first()
+    )
+    if invoice is None:
+        raise Http404
+    return redirect('invoice_detail', pk=invoice.pk)
+
 @login_required
 def medicine_update(request, pk):
     medicine = get_object_or_404(Medicine, pk=pk)
@@ -571,6 +810,15 @@ def medicine_update(request, pk):
         messages.error(request, "Sizda dorini o‘zgartirish huquqi yo‘q.")
         return redirect('listmedicine')
     if request.method == 'POST':
+        # Muddat saqlashdan oldin sana sifatida tekshiriladi (sync_lots uni partiyaga yozadi)
+        expiry_str = request.POST.get('expiry_date')
+        expiry_date = parse_date(expiry_str) if expiry_str else None
+        if expiry_str and expiry_date is None:
+            return render(request, 'medicine_edit.html', {
+                'medicine': medicine,
+                'categories': Medicine.CATEGORY_CHOICES,
+                'error': "Yaroqlilik muddati noto‘g‘ri kiritildi.",
+            })
         medicine.name = request.POST.get('name', medicine.name)
         medicine.generic_name = request.POST.get('generic_name', medicine.generic_name)
         medicine.weight = request.POST.get('weight', medicine.weight)
@@ -588,9 +836,10 @@ def medicine_update(request, pk):
             medicine.quantity = int(request.POST.get('quantity', medicine.quantity))
         except (ValueError, TypeError):
             medicine.quantity = medicine.quantity
-        expiry_date = request.POST.get('expiry_date')
-        medicine.expiry_date = expiry_date if expiry_date else None
+        medicine.expiry_date = expiry_date
         medicine.save()
+        # Qo'lda o'zgartirilgan qoldiq partiyalarga ham tushadi
+        sync_lots(medicine)
         messages.success(request, f"{medicine.name} muvaffaqiyatli yangilandi.")
         return redirect('listmedicine')
     return render(request, 'medicine_edit.html', {
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Birinchi turadi — boshqa middleware lar (sessiya, auth) so‘rovlari ham o‘lchanadi
+    'main.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,11 +52,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# So‘rovlar o‘lchovi (Server-Timing sarlavhasi va sekin so‘rovlar logi), faqat yoqilganda ulanadi
+REQUEST_TIMING_ENABLED = False
+REQUEST_TIMING_SLOW_MS = 500      # shundan sekin so‘rovlar logga yoziladi
+REQUEST_TIMING_TOP_QUERIES = 5    # logdagi eng ko‘p takrorlangan SQL shakllari soni
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + render vaqti (RequestTimingMiddleware uchun, o‘lchov yo‘q bo‘lsa oddiy render)
+        'BACKEND': 'main.middleware.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,10 +81,37 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Joylar dorilar jadvali keshi (main/stock_cache.py). Fayl keshi bir nechta worker
+# jarayonlari va management buyruqlari orasida umumiy bo‘ladi.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# SQLite bir nechta WSGI worker bilan: WAL rejimida o‘quvchilar yozuvchini kutmaydi,
+# yozish tranzaksiyalari BEGIN IMMEDIATE bilan boshlanadi (o‘qishdan yozishga o‘tishdagi
+# "database is locked" bo‘lmaydi), band bo‘lsa `timeout` soniyagacha kutiladi.
+# Har bir yangi ulanishda bajariladi (manage.py sqlite_stress bilan tekshiriladi).
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',   # WAL da xavfsiz, har commitda fsync qilinmaydi
+    'PRAGMA cache_size=-65536',    # 64 MB sahifa keshi
+    'PRAGMA mmap_size=268435456',  # 256 MB memory-mapped I/O
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+        },
     }
 }
 
@@ -106,6 +141,24 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+# collectstatic natijasi: xeshli nomlar (dashlite.<xesh>.css) va yonida .gz/.br nusxalar
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# DEBUG=False da statikani Django o‘zi beradi (oldida nginx bo‘lsa False qiling)
+STATIC_SERVE = True
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'main.static_assets.CompressedManifestStaticFilesStorage',
+    },
+    # Fondagi hisobot fayllari (bemorlar, sotuvlar): MEDIA_ROOT dan tashqarida, URL orqali berilmaydi —
+    # faqat admin uchun job_download view i orqali yuklab olinadi
+    'private': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'private'},
+    },
+}
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -115,3 +168,22 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'main.CustomUser'  
+
+# Sessiyadagi foydalanuvchi keshdan olinadi (har so‘rovdagi foydalanuvchi SELECT i yo‘q).
+# ModelBackend avval ochilgan sessiyalar bekor bo‘lmasligi uchun qoldirilgan.
+AUTHENTICATION_BACKENDS = [
+    'main.user_context.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Sessiya profili:
+#   'db'             — Django standarti, har so‘rovda bazadan o‘qiladi;
+#   'cached_db'      — keshdan o‘qiladi, bazaga faqat o‘zgarganda yoziladi (kesh tozalansa ham yo‘qolmaydi);
+#   'signed_cookies' — sessiya imzolangan cookie da, baza umuman ishlatilmaydi
+#                      (chiqishda server tomonda bekor qilib bo‘lmaydi, cookie hajmi cheklangan).
+SESSION_PROFILE = 'cached_db'
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_PROFILE]
@@ -1 +0,0 @@
-!function(NioApp,$){var ipdIncome={labels:["12AM - 02AM","02AM - 04AM","04AM - 06AM","06AM - 08AM","08AM - 10AM","10AM - 12PM","12PM - 02PM","02PM - 04PM","04PM - 06PM","06PM - 08PM","08PM - 10PM","10PM - 12PM"],dataUnit:"USD",lineTension:.3,datasets:[{label:"USD",color:"#0fac81",background:"transparent",data:[920,1005,1250,850,1100,1006,1310,1050,1100,1310,1050,1100]}]},opdIncome={labels:["12AM - 02AM","02AM - 04AM","04AM - 06AM","06AM - 08AM","08AM - 10AM","10AM - 12PM","12PM - 02PM","02PM - 04PM","04PM - 06PM","06PM - 08PM","08PM - 10PM","10PM - 12PM"],dataUnit:"USD",lineTension:.3,datasets:[{label:"USD",color:"#816bff",background:"transparent",data:[920,1050,1250,850,1100,1006,1310,1050,1100,1310,1050,1100]}]},labIncome={labels:["12AM - 02AM","02AM - 04AM","04AM - 06AM","06AM - 08AM","08AM - 10AM","10AM - 12PM","12PM - 02PM","02PM - 04PM","04PM - 06PM","06PM - 08PM","08PM - 10PM","10PM - 12PM"],dataUnit:"USD",lineTension:.3,datasets:[{label:"USD",color:"#ffa353",background:"transparent",data:[920,1050,1250,850,1100,1060,1310,1050,1100,1310,1050,1100]}]},todayExpense={labels:["12AM - 02AM","02AM - 04AM","04AM - 06AM","06AM - 08AM","08AM - 10AM","10AM - 12PM","12PM - 02PM","02PM - 04PM","04PM - 06PM","06PM - 08PM","08PM - 10PM","10PM - 12PM"],dataUnit:"USD",lineTension:.3,datasets:[{label:"USD",color:"#ff63a5",background:"transparent",data:[920,1050,1250,850,1100,1060,1310,1050,1100,1310,1050,1100]}]};function ecommerceLineS3(selector,set_data){var $selector=$(selector||".ecommerce-line-chart-s3");$selector.each(function(){for(var $self=$(this),_self_id=$self.attr("id"),_get_data=void 0===set_data?eval(_self_id):set_data,selectCanvas=document.getElementById(_self_id).getContext("2d"),chart_data=[],i=0;i<_get_data.datasets.length;i++)chart_data.push({label:_get_data.datasets[i].label,tension:_get_data.lineTension,backgroundColor:_get_data.datasets[i].background,fill:!0,borderWidth:2,borderColor:_get_data.datasets[i].color,pointBorderColor:"transparent",pointBackgroundColor:"transparent",pointHoverBackgroundColor:"#fff",pointHoverBorderColor:_get_data.datasets[i].color,pointBorderWidth:2,pointHoverRadius:4,pointHoverBorderWidth:2,pointRadius:4,pointHitRadius:4,data:_get_data.datasets[i].data});var chart=new Chart(selectCanvas,{type:"line",data:{labels:_get_data.labels,datasets:chart_data},options:{plugins:{legend:{display:_get_data.legend||!1,rtl:NioApp.State.isRTL,labels:{boxWidth:12,padding:20,color:"#6783b8"}},tooltip:{enabled:!0,rtl:NioApp.State.isRTL,callbacks:{title:function(){return!1},label:function(a){return"".concat(a.parsed.y," ").concat(_get_data.dataUnit)}},backgroundColor:"#1c2b46",titleFont:{size:8},titleColor:"#fff",titleMarginBottom:4,bodyColor:"#fff",bodyFont:{size:8},bodySpacing:4,padding:6,footerMarginTop:0,displayColors:!1}},maintainAspectRatio:!1,scales:{y:{display:!1,ticks:{beginAtZero:!1,font:{size:12},color:"#9eaecf",padding:0},grid:{color:NioApp.hexRGB("#526484",.2),tickLength:0,zeroLineColor:NioApp.hexRGB("#526484",.2),drawTicks:!1}},x:{display:!1,ticks:{font:{size:12},color:"#9eaecf",source:"auto",padding:0},reverse:NioApp.State.isRTL,grid:{color:"transparent",tickLength:0,zeroLineColor:NioApp.hexRGB("#526484",.2),offset:!0,drawTicks:!1}}}}})})}NioApp.coms.docReady.push(function(){ecommerceLineS3()});var totalSales={labels:["01 Jan","02 Jan","03 Jan","04 Jan","05 Jan","06 Jan","07 Jan","08 Jan","09 Jan","10 Jan","11 Jan","12 Jan","13 Jan","14 Jan","15 Jan","16 Jan","17 Jan","18 Jan","19 Jan","20 Jan","21 Jan","22 Jan","23 Jan","24 Jan","25 Jan","26 Jan","27 Jan","28 Jan","29 Jan","30 Jan"],dataUnit:"Sales",lineTension:.3,datasets:[{label:"Sales",color:"#0fac81",background:NioApp.hexRGB("#0fac81",.25),data:[130,105,125,115,110,95,131,110,115,120,111,97,113,107,122,100,85,110,130,107,90,105,123,115,100,117,125,95,137,101]}]},totalOrders={labels:["01 Jan","02 Jan","03 Jan","04 Jan","05 Jan","06 Jan","07 Jan","08 Jan","09 Jan","10 Jan","11 Jan","12 Jan","13 Jan","14 Jan","15 Jan","16 Jan","17 Jan","18 Jan","19 Jan","20 Jan","21 Jan","22 Jan","23 Jan","24 Jan","25 Jan","26 Jan","27 Jan","28 Jan","29 Jan","30 Jan"],dataUnit:"Orders",lineTension:.3,datasets:[{label:"Orders",color:"#3fbd9a",background:NioApp.hexRGB("#3fbd9a",.25),data:[85,125,105,115,130,106,141,110,95,120,111,105,113,107,122,100,95,110,120,107,100,105,123,115,110,117,125,75,95,101]}]},totalCustomers={labels:["01 Jan","02 Jan","03 Jan","04 Jan","05 Jan","06 Jan","07 Jan","08 Jan","09 Jan","10 Jan","11 Jan","12 Jan","13 Jan","14 Jan","15 Jan","16 Jan","17 Jan","18 Jan","19 Jan","20 Jan","21 Jan","22 Jan","23 Jan","24 Jan","25 Jan","26 Jan","27 Jan","28 Jan","29 Jan","30 Jan"],dataUnit:"Customers",lineTension:.3,datasets:[{label:"Customers",color:"#008080",background:NioApp.hexRGB("#008080",.25),data:[92,105,125,85,110,106,131,105,110,115,135,105,120,85,122,100,125,110,120,125,85,105,123,115,90,117,125,100,95,65]}]};function ecommerceLineS1(selector,set_data){var $selector=$(selector||".ecommerce-line-chart-s1");$selector.each(function(){for(var $self=$(this),_self_id=$self.attr("id"),_get_data=void 0===set_data?eval(_self_id):set_data,selectCanvas=document.getElementById(_self_id).getContext("2d"),chart_data=[],i=0;i<_get_data.datasets.length;i++)chart_data.push({label:_get_data.datasets[i].label,tension:_get_data.lineTension,backgroundColor:_get_data.datasets[i].background,fill:!0,borderWidth:2,borderColor:_get_data.datasets[i].color,pointBorderColor:"transparent",pointBackgroundColor:"transparent",pointHoverBackgroundColor:"#fff",pointHoverBorderColor:_get_data.datasets[i].color,pointBorderWidth:2,pointHoverRadius:4,pointHoverBorderWidth:2,pointRadius:4,pointHitRadius:4,data:_get_data.datasets[i].data});var chart=new Chart(selectCanvas,{type:"line",data:{labels:_get_data.labels,datasets:chart_data},options:{plugins:{legend:{display:_get_data.legend||!1,rtl:NioApp.State.isRTL,labels:{boxWidth:12,padding:20,color:"#6783b8"}},tooltip:{enabled:!0,rtl:NioApp.State.isRTL,callbacks:{label:function(a){return"".concat(a.parsed.y," ").concat(_get_data.dataUnit)}},backgroundColor:"#1c2b46",titleFont:{size:10},titleColor:"#fff",titleMarginBottom:4,bodyColor:"#fff",bodyFont:{size:10},bodySpacing:4,padding:6,footerMarginTop:0,displayColors:!1}},maintainAspectRatio:!1,scales:{y:{display:!1,ticks:{beginAtZero:!0,font:{size:12},color:"#9eaecf",padding:0},grid:{color:NioApp.hexRGB("#526484",.2),tickLength:0,zeroLineColor:NioApp.hexRGB("#526484",.2),drawTicks:!1}},x:{display:!1,ticks:{font:{size:12},color:"#9eaecf",source:"auto",padding:0},reverse:NioApp.State.isRTL,grid:{color:"transparent",tickLength:0,zeroLineColor:NioApp.hexRGB("#526484",.2),offset:!0,drawTicks:!1}}}}})})}NioApp.coms.docReady.push(function(){ecommerceLineS1()});var salesStatistics={labels:["01 Jan","02 Jan","03 Jan","04 Jan","05 Jan","06 Jan","07 Jan","08 Jan","09 Jan","10 Jan","11 Jan","12 Jan","13 Jan","14 Jan","15 Jan","16 Jan","17 Jan","18 Jan","19 Jan","20 Jan","21 Jan","22 Jan","23 Jan","24 Jan","25 Jan","26 Jan","27 Jan","28 Jan","29 Jan","30 Jan"],dataUnit:"Customer",lineTension:.4,datasets:[{label:"Total orders",color:"#0fac81",dash:[0,0],background:NioApp.hexRGB("#0fac81",.15),data:[3710,4820,4810,5480,5300,5670,6660,4830,5590,5730,4790,4950,5100,5800,5950,5850,5950,4450,4900,8e3,7200,7250,7900,8950,6300,7200,7250,7650,6950,4750]},{label:"Canceled orders",color:"#eb6459",dash:[5,5],background:"transparent",data:[110,220,810,480,600,670,660,830,590,730,790,950,100,800,950,850,950,450,900,0,200,250,900,950,300,200,250,650,950,750]}]};function ecommerceLineS4(selector,set_data){var $selector=$(selector||".ecommerce-line-chart-s4");$selector.each(function(){for(var $self=$(this),_self_id=$self.attr("id"),_get_data=void 0===set_data?eval(_self_id):set_data,selectCanvas=document.getElementById(_self_id).getContext("2d"),chart_data=[],i=0;i<_get_data.datasets.length;i++)chart_data.push({label:_get_data.datasets[i].label,tension:_get_data.lineTension,backgroundColor:_get_data.datasets[i].background,fill:!0,borderWidth:2,borderDash:_get_data.datasets[i].dash,borderColor:_get_data.datasets[i].color,pointBorderColor:"transparent",pointBackgroundColor:"transparent",pointHoverBackgroundColor:"#fff",pointHoverBorderColor:_get_data.datasets[i].color,pointBorderWidth:2,pointHoverRadius:4,pointHoverBorderWidth:2,pointRadius:4,pointHitRadius:4,data:_get_data.datasets[i].data});var chart=new Chart(selectCanvas,{type:"line",data:{labels:_get_data.labels,datasets:chart_data},options:{plugins:{legend:{display:_get_data.legend||!1,rtl:NioApp.State.isRTL,labels:{boxWidth:12,padding:20,color:"#6783b8"}},tooltip:{enabled:!0,rtl:NioApp.State.isRTL,callbacks:{label:function(a){return"".concat(a.parsed.y," ").concat(_get_data.dataUnit)}},backgroundColor:"#1c2b46",titleFont:{size:13},titleColor:"#fff",titleMarginBottom:6,bodyColor:"#fff",bodyFont:{size:12},bodySpacing:4,padding:10,footerMarginTop:0,displayColors:!1}},maintainAspectRatio:!1,scales:{y:{display:!0,stacked:_get_data.stacked||!1,position:NioApp.State.isRTL?"right":"left",ticks:{beginAtZero:!0,font:{size:11},color:"#9eaecf",padding:10,callback:function(a,t,e){return"$ "+a},min:0,stepSize:3e3},grid:{color:NioApp.hexRGB("#526484",.2),tickLength:0,zeroLineColor:NioApp.hexRGB("#526484",.2),drawTicks:!1}},x:{display:!1,stacked:_get_data.stacked||!1,ticks:{font:{size:9},color:"#9eaecf",source:"auto",padding:10},reverse:NioApp.State.isRTL,grid:{color:"transparent",tickLength:0,zeroLineColor:"transparent",drawTicks:!1}}}}})})}NioApp.coms.docReady.push(function(){ecommerceLineS4()})}(NioApp,jQuery);
\ No newline at end of file
@@ -0,0 +1,104 @@
+/*
+ * Dashboard harakat grafigi: bir nechta chiziqli qator, SVG da chiziladi.
+ * Tashqi kutubxonasiz (CDN skripti yo‘q) — fayl statik pipeline orqali xeshli nom bilan beriladi.
+ *
+ *   var chart = new MovementChart(element);
+ *   chart.update(["2026-10-01", ...], [{label: "Kelgan", color: "#0fac81", data: [1, 2, ...]}, ...]);
+ */
+(function (window) {
+  "use strict";
+
+  var SVG = "http://www.w3.org/2000/svg";
+  var PAD = {top: 32, right: 16, bottom: 28, left: 56};
+  var Y_TICKS = 5;
+  var MAX_X_LABELS = 12;
+
+  function node(name, attrs, parent) {
+    var element = document.createElementNS(SVG, name);
+    Object.keys(attrs).forEach(function (key) { element.setAttribute(key, attrs[key]); });
+    if (parent) parent.appendChild(element);
+    return element;
+  }
+
+  function text(value, attrs, parent) {
+    var element = node("text", attrs, parent);
+    element.textContent = value;
+    return element;
+  }
+
+  // 0..max oralig‘i uchun "yumaloq" qadam (1, 2, 5 × 10^n)
+  function niceStep(max) {
+    var raw = max / Y_TICKS;
+    var power = Math.pow(10, Math.floor(Math.log10(raw)));
+    var steps = [1, 2, 5, 10];
+    for (var i = 0; i < steps.length; i++) {
+      if (steps[i] * power >= raw) return steps[i] * power;
+    }
+    return 10 * power;
+  }
+
+  function MovementChart(container) {
+    this.container = container;
+    this.labels = [];
+    this.datasets = [];
+    this.svg = node("svg", {width: "100%", height: "100%", role: "img"}, container);
+    var chart = this;
+    window.addEventListener("resize", function () { chart.render(); });
+  }
+
+  MovementChart.prototype.update = function (labels, datasets) {
+    this.labels = labels;
+    this.datasets = datasets;
+    this.render();
+  };
+
+  MovementChart.prototype.render = function () {
+    var svg = this.svg;
+    var labels = this.labels;
+    var datasets = this.datasets;
+    var width = this.container.clientWidth;
+    var height = this.container.clientHeight;
+    while (svg.firstChild) svg.removeChild(svg.firstChild);
+    svg.setAttribute("viewBox", "0 0 " + width + " " + height);
+
+    var plotWidth = width - PAD.left - PAD.right;
+    var plotHeight = height - PAD.top - PAD.bottom;
+    var max = 0;
+    datasets.forEach(function (set) {
+      set.data.forEach(function (value) { max = Math.max(max, Number(value) || 0); });
+    });
+    var step = max > 0 ? niceStep(max) : 1;
+    var top = step * Math.max(1, Math.ceil(max / step));
+    var x = function (i) { return PAD.left + (labels.length > 1 ? plotWidth * i / (labels.length - 1) : plotWidth / 2); };
+    var y = function (value) { return PAD.top + plotHeight * (1 - (Number(value) || 0) / top); };
+
+    // Gorizontal chiziqlar va Y qiymatlari
+    for (var n = 0; n * step <= top; n++) {
+      var tick = n * step;
+      node("line", {x1: PAD.left, x2: width - PAD.right, y1: y(tick), y2: y(tick), stroke: "#e5e9f2"}, svg);
+      text(tick.toLocaleString(), {x: PAD.left - 8, y: y(tick) + 4, "text-anchor": "end", "font-size": 11, fill: "#8094ae"}, svg);
+    }
+    // X belgilar: juda ko‘p davr bo‘lsa har n-chisi
+    var every = Math.max(1, Math.ceil(labels.length / MAX_X_LABELS));
+    labels.forEach(function (label, i) {
+      if (i % every === 0) {
+        text(label, {x: x(i), y: height - 8, "text-anchor": "middle", "font-size": 11, fill: "#8094ae"}, svg);
+      }
+    });
+
+    datasets.forEach(function (set, index) {
+      var points = set.data.map(function (value, i) { return x(i) + "," + y(value); });
+      node("polyline", {points: points.join(" "), fill: "none", stroke: set.color, "stroke-width": 2}, svg);
+      set.data.forEach(function (value, i) {
+        var dot = node("circle", {cx: x(i), cy: y(value), r: 3, fill: set.color}, svg);
+        node("title", {}, dot).textContent = set.label + " — " + labels[i] + ": " + (Number(value) || 0).toLocaleString();
+      });
+      // Izoh (legend) yuqorida
+      var legendX = PAD.left + index * 190;
+      node("rect", {x: legendX, y: 8, width: 12, height: 12, fill: set.color}, svg);
+      text(set.label, {x: legendX + 18, y: 18, "font-size": 12, fill: "#364a63"}, svg);
+    });
+  };
+
+  window.MovementChart = MovementChart;
+})(window);